@@ -1,100 +1,216 @@
 from langchain_anthropic import ChatAnthropic
-from langchain.prompts import PromptTemplate
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from fastapi import HTTPException
-from langchain.chains import LLMChain
 from langchain.output_parsers import PydanticOutputParser, OutputFixingParser
 from app.routes.agent.model import AgentOutputSchema, ParameterRequestSchema, AgentOutputSchemaWithParameterRequest, AgentInteractRequest
-from typing import List, Optional, Dict, Any
+from typing import Awaitable, Callable, List, Optional, Dict, Any
+from pydantic import ValidationError
+from app.routes.agent.registry import resolve_route
+from app.sessions import SessionStore, Turn, turn_text
+import time
 import logging
-import httpx
+from app.settings import ANTHROPIC_MODEL
 
 # Set up logging
 logger = logging.getLogger("rika_agent")
 logging.basicConfig(level=logging.INFO)
 
-# Base URL of your FastAPI application
-FASTAPI_BASE_URL = "http://localhost:8000"
+# Instructions and route catalogue, identical on every call so Anthropic can cache them
+SYSTEM_PROMPT = (
+    "You are Rika, a helpful Blockchain AI assistant specializing in guiding users to interact effortlessly with Payroll Smart Contracts. "
+    "When a user initiates a conversation, warmly greet them, introduce yourself, and ask how you can help with their payroll needs. "
+    "First engage in conversation and understand the user's needs before taking any actions. "
+    "Remember: Only execute blockchain transactions when the user explicitly requests it.\n\n"
+    "Your primary task is to understand user prompts and determine the correct FastAPI API route to call to manage payroll operations. "
+    "If the user requests a blockchain transaction, you should guide them through the process. "
+    "You must identify and extract all necessary parameters for each API route. When parameters are missing, you should clearly indicate them to the user in a loving persuasive tone.\n\n"
+    "Each message gives you the **Conversation History** and a **New User Prompt**.\n\n"
+    "**Task:** Analyze the conversation and the new user prompt to:\n"
+    "1. **Determine the User's Intent:** Identify the user's goal related to payroll smart contracts.\n"
+    "2. **Match to API Route:** Find the most appropriate FastAPI API route from the list below that matches the user's intent.\n"
+    "3. **Parameter Extraction:** Extract all required parameters for the chosen API route from the conversation and new prompt.\n"
+    "4. **Handle Missing Parameters:** If any required parameters are missing, identify them.\n"
+    "5. **Handle Unclear Intent:** If the user's intent is unclear or doesn't match any API route, recognize this.\n\n"
+    "**Available FastAPI API Routes and Required Parameters:**\n"
+    "These are the ONLY API routes you can use. Ensure you use the exact route paths and parameter names as listed.\n\n"
+    "**Factory Contract Routes (POST Requests - JSON Body):**\n"
+    "- `/payroll-contracts` (POST) - **Required:** `employer_address` (e.g., '0x123...')\n\n"
+    "**Payroll Contract Routes (POST Requests - JSON Body):**\n"
+    "- `/employees` (POST) - **Required:** `name` (e.g., 'John Doe'), `employee_address` (e.g., '0x456...'), `salary` (e.g., 5000), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
+    "- `/funds` (POST) - **Required:** `amount` (e.g., 1000), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
+    "- `/schedules` (POST) - **Required:** `employee_address` (e.g., '0x456...'), `start_date` (e.g., 1672531200), `end_date` (e.g., 1675123200), `interval` (e.g., 0), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
+    "- `/employees/deactivate` (POST) - **Required:** `employee_address` (e.g., '0x456...'), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
+    "- `/employees/reactivate` (POST) - **Required:** `employee_address` (e.g., '0x456...'), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
+    "- `/salaries/update` (POST) - **Required:** `employee_address` (e.g., '0x456...'), `new_salary` (e.g., 6000), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
+    "- `/payrolls/process` (POST) - **Required:** `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n\n"
+    "**Payroll Contract Routes (GET Requests - Query Parameters):**\n"
+    "- `/employees/details` (GET) - **Required:** `employee_address` (e.g., '0x456...'), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
+    "- `/employees/all` (GET) - **Required:** `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
+    "- `/balance` (GET) - **Required:** `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
+    "- `/liability` (GET) - **Required:** `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
+    "- `/payrolls/next-date` (GET) - **Required:** `employee_address` (e.g., '0x456...'), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n\n"
+    "**Response Instructions:**\n"
+    "You MUST respond in JSON format, following these guidelines:\n"
+    "1. **Missing Parameters:** If you identify missing parameters, respond with the route they are for, if you know it:\n"
+    '   `{ "api_route": "/route-path", "parameters": {}, "error": "Missing parameters: [list of missing parameters, comma-separated]" }`\n'
+    "2. **Unclear Intent:** If the user intent is unclear or doesn't match any allowed API route, respond with:\n"
+    '   `{ "api_route": null, "parameters": {}, "error": "Could not understand your intent. Please clarify your request related to payroll management." }`\n'
+    "3. **Successful Route and Parameter Extraction:** If you successfully determine the API route and have all parameters, set 'api_route' to the chosen route path exactly as listed above, put ONLY the transaction payload in the 'parameters' field, and set 'error' to null.\n"
+    '   `{ "api_route": "/route-path", "parameters": { ...transaction payload... }, "error": null }`\n'
+    "4. **Personality:** Maintain a helpful and clear tone.\n\n"
+    "Focus on payroll contract and employee management operations. Do not handle requests outside of these functionalities."
+)
+
+
+# Folds older conversation turns into the running summary of a session
+SUMMARY_PROMPT = (
+    "Update the summary of a conversation between a user and Rika, a payroll smart contract assistant. "
+    "Keep every address, contract index, amount, date and action the user asked for or that was carried out, "
+    "and anything still pending. Reply with the new summary only, in a few sentences.\n\n"
+    "**Current Summary:**\n{summary}\n\n"
+    "**New Turns:**\n{transcript}"
+)
+
+# Receives the frames streamed while a prompt is processed
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def message_text(message: BaseMessage) -> str:
+    """Joins the text of a message whose content is a string or a list of content blocks."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in message.content)
+
 
 # --- Rika Agent Class ---
 class RikaAgent:
-    def __init__(self, anthropic_api_key: str):
-        self.llm = ChatAnthropic(
-            model_name="claude-3-sonnet-20240229",
+    """Routes natural language payroll requests to API calls.
+
+    The system prompt and the output parsers are built once per agent. The system
+    prompt is sent as an Anthropic prompt-cache block, so after the first call only
+    the conversation history and the new prompt are processed uncached. llm can be
+    any chat model, e.g. a stub for measuring latency.
+    """
+
+    def __init__(self, anthropic_api_key: str, llm: Optional[BaseChatModel] = None):
+        self.llm = llm or ChatAnthropic(
+            model_name=ANTHROPIC_MODEL,
             anthropic_api_key=anthropic_api_key
         )
-        self.conversation_store: Dict[str, List[Dict[str, str]]] = {}
+        self.conversation_store = SessionStore(summarize=self.summarize_turns)
+        parser = PydanticOutputParser(pydantic_object=AgentOutputSchema)
+        # The output schema goes in the cached block as well, keeping it clear of the 1024-token caching minimum
+        self.system_message = SystemMessage(content=[{
+            "type": "text",
+            "text": f"{SYSTEM_PROMPT}\n\n{parser.get_format_instructions()}",
+            "cache_control": {"type": "ephemeral"}
+        }])
+        self.output_parser = OutputFixingParser.from_llm(llm=self.llm, parser=parser)
+        self._metrics: Dict[str, Dict[str, float]] = {
+            "cached": {"calls": 0, "ttft_total": 0.0, "latency_total": 0.0},
+            "uncached": {"calls": 0, "ttft_total": 0.0, "latency_total": 0.0}
+        }
+        # Time from a streamed prompt arriving to its first frame
+        self._ttfb = {"calls": 0, "total": 0.0}
+
+    def build_messages(self, conversation_context: str, user_prompt: str) -> List[BaseMessage]:
+        return [
+            self.system_message,
+            HumanMessage(content=(
+                f"**Conversation History:**\n{conversation_context}\n\n"
+                f"**New User Prompt:**\n{user_prompt}"
+            ))
+        ]
+
+    def _emitter(self, on_event: Optional[EventHandler], started: float) -> EventHandler:
+        """Wraps on_event so the first frame sent records time to first byte."""
+        first = True
+
+        async def emit(frame: Dict[str, Any]) -> None:
+            nonlocal first
+            if on_event is None:
+                return
+            if first:
+                first = False
+                self._ttfb["calls"] += 1
+                self._ttfb["total"] += time.perf_counter() - started
+            await on_event(frame)
+
+        return emit
+
+    async def complete(self, messages: List[BaseMessage], emit: Optional[EventHandler] = None) -> str:
+        """Streams a completion, emitting each token and recording time to first token and whether the prompt cache was read."""
+        started = time.perf_counter()
+        first_token_at = None
+        message = None
+        async for chunk in self.llm.astream(messages):
+            text = message_text(chunk)
+            if text:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                if emit is not None:
+                    await emit({"type": "token", "text": text})
+            message = chunk if message is None else message + chunk
+        finished = time.perf_counter()
 
-    async def process_prompt(self, user_prompt: str, session_id: str, employer_address: Optional[str] = None) -> Dict[str, Any]:
-        """Processes the user prompt, calls the appropriate API, and returns the API response."""
-        conversation_history = self.conversation_store.get(session_id, [])
-        conversation_context = "\n".join([f"{turn['role']}: {turn['content']}" for turn in conversation_history]) if conversation_history else "No previous conversation."
+        usage = getattr(message, "usage_metadata", None) or {}
+        cache_read = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        metrics = self._metrics["cached" if cache_read else "uncached"]
+        metrics["calls"] += 1
+        metrics["ttft_total"] += (first_token_at or finished) - started
+        metrics["latency_total"] += finished - started
+        return message_text(message) if message is not None else ""
+
+    async def summarize_turns(self, summary: str, turns: List[Turn]) -> str:
+        """Asks the LLM to fold turns into a session's rolling summary."""
+        message = await self.llm.ainvoke([HumanMessage(content=SUMMARY_PROMPT.format(
+            summary=summary or "None",
+            transcript="\n".join(turn_text(turn) for turn in turns)
+        ))])
+        return message_text(message)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Average time to first token and completion latency, split by prompt cache hits and misses, and streaming time to first byte."""
+        metrics: Dict[str, Any] = {
+            name: {
+                "calls": int(values["calls"]),
+                "avg_ttft_ms": round(1000 * values["ttft_total"] / values["calls"], 1) if values["calls"] else None,
+                "avg_latency_ms": round(1000 * values["latency_total"] / values["calls"], 1) if values["calls"] else None
+            }
+            for name, values in self._metrics.items()
+        }
+        calls = self._ttfb["calls"]
+        metrics["streaming"] = {
+            "calls": calls,
+            "avg_ttfb_ms": round(1000 * self._ttfb["total"] / calls, 1) if calls else None
+        }
+        metrics["sessions"] = self.conversation_store.stats()
+        return metrics
+
+    async def process_prompt(self, user_prompt: str, session_id: str, employer_address: Optional[str] = None,
+                             on_event: Optional[EventHandler] = None) -> Dict[str, Any]:
+        """Processes the user prompt, calls the appropriate API, and returns the API response.
+
+        If on_event is given it receives the LLM tokens as they arrive ({"type": "token"})
+        and a {"type": "status"} frame before parsing and before the API call.
+        """
+        emit = self._emitter(on_event, time.perf_counter())
+        conversation_context = self.conversation_store.context(session_id)
 
         # Include the employer_address in the user prompt if provided
         if employer_address:
             user_prompt += f"\nEmployer Address: {employer_address}"
 
-        # Define the prompt template
-        prompt_template = PromptTemplate(
-            input_variables=["conversation_context", "user_prompt"],
-            template=(
-                "You are Rika, a helpful Blockchain AI assistant specializing in guiding users to interact effortlessly with Payroll Smart Contracts. "
-                "When a user initiates a conversation, warmly greet them, introduce yourself, and ask how you can help with their payroll needs. "
-                "First engage in conversation and understand the user's needs before taking any actions. "
-                "Remember: Only execute blockchain transactions when the user explicitly requests it.\n\n"
-                "Your primary task is to understand user prompts and determine the correct FastAPI API route to call to manage payroll operations. "
-                "If the user requests a blockchain transaction, you should guide them through the process. "
-                "You must identify and extract all necessary parameters for each API route. When parameters are missing, you should clearly indicate them to the user in a loving persuasive tone.\n\n"
-                "**Conversation History:**\n{conversation_context}\n\n"
-                "**New User Prompt:**\n{user_prompt}\n\n"
-                "**Task:** Analyze the conversation and the new user prompt to:\n"
-                "1. **Determine the User's Intent:** Identify the user's goal related to payroll smart contracts.\n"
-                "2. **Match to API Route:** Find the most appropriate FastAPI API route from the list below that matches the user's intent.\n"
-                "3. **Parameter Extraction:** Extract all required parameters for the chosen API route from the conversation and new prompt.\n"
-                "4. **Handle Missing Parameters:** If any required parameters are missing, identify them.\n"
-                "5. **Handle Unclear Intent:** If the user's intent is unclear or doesn't match any API route, recognize this.\n\n"
-                "**Available FastAPI API Routes and Required Parameters:**\n"
-                "These are the ONLY API routes you can use. Ensure you use the exact route paths and parameter names as listed.\n\n"
-                "**Factory Contract Routes (POST Requests - JSON Body):**\n"
-                "- `/payroll-contracts` (POST) - **Required:** `employer_address` (e.g., '0x123...')\n\n"
-                "**Payroll Contract Routes (POST Requests - JSON Body):**\n"
-                "- `/employees` (POST) - **Required:** `name` (e.g., 'John Doe'), `employee_address` (e.g., '0x456...'), `salary` (e.g., 5000), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
-                "- `/funds` (POST) - **Required:** `amount` (e.g., 1000), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
-                "- `/schedules` (POST) - **Required:** `employee_address` (e.g., '0x456...'), `start_date` (e.g., 1672531200), `end_date` (e.g., 1675123200), `interval` (e.g., 0), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
-                "- `/employees/deactivate` (POST) - **Required:** `employee_address` (e.g., '0x456...'), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
-                "- `/employees/reactivate` (POST) - **Required:** `employee_address` (e.g., '0x456...'), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
-                "- `/salaries/update` (POST) - **Required:** `employee_address` (e.g., '0x456...'), `new_salary` (e.g., 6000), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
-                "- `/payrolls/process` (POST) - **Required:** `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n\n"
-                "**Payroll Contract Routes (GET Requests - Query Parameters):**\n"
-                "- `/employees/details` (GET) - **Required:** `employee_address` (e.g., '0x456...'), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
-                "- `/employees/all` (GET) - **Required:** `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
-                "- `/balance` (GET) - **Required:** `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
-                "- `/liability` (GET) - **Required:** `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n"
-                "- `/payrolls/next-date` (GET) - **Required:** `employee_address` (e.g., '0x456...'), `employer_address` (e.g., '0x123...'), `contract_index` (e.g., 0)\n\n"
-                "**Response Instructions:**\n"
-                "You MUST respond in JSON format, following these guidelines:\n"
-                "1. **Missing Parameters:** If you identify missing parameters, respond with:\n"
-                '   `{{ "parameters": {{}}, "error": "Missing parameters: [list of missing parameters, comma-separated]" }}`\n'
-                "2. **Unclear Intent:** If the user intent is unclear or doesn't match any allowed API route, respond with:\n"
-                '   `{{ "parameters": {{}}, "error": "Could not understand your intent. Please clarify your request related to payroll management." }}`\n'
-                "3. **Successful Route and Parameter Extraction:** If you successfully determine the API route and have all parameters, respond with ONLY the transaction payload in the 'parameters' field. Set 'api_route' and 'error' to null.\n"
-                '   `{{ "parameters": {{ ...transaction payload... }}, "error": null }}`\n'
-                "4. **Personality:** Maintain a helpful and clear tone.\n\n"
-                "Focus on payroll contract and employee management operations. Do not handle requests outside of these functionalities."
-            )
-        )
-
-        # Initialize the LLM chain
-        chain = LLMChain(llm=self.llm, prompt=prompt_template)
-
         try:
-            # Run the chain
-            raw_response = await chain.arun(conversation_context=conversation_context, user_prompt=user_prompt)
+            raw_response = await self.complete(self.build_messages(conversation_context, user_prompt), emit)
             logger.info(f"Raw LLM response: {raw_response}")
+            self.conversation_store.append(session_id, "user", user_prompt)
+            self.conversation_store.append(session_id, "assistant", raw_response)
+            await emit({"type": "status", "stage": "parsing"})
 
-            # Parse the response
-            base_parser = PydanticOutputParser(pydantic_object=AgentOutputSchema)
-            output_parser = OutputFixingParser.from_llm(llm=self.llm, parser=base_parser)
-            parsed_response = output_parser.parse(raw_response)
+            # Parse the response, asking the LLM to repair it if it is not valid JSON
+            parsed_response = await self.output_parser.aparse(raw_response)
 
             if parsed_response.error:
                 # Handle missing parameters or unclear intent
@@ -130,7 +246,9 @@ class RikaAgent:
                     }
             else:
                 # Successful route and parameter extraction
+                await emit({"type": "status", "stage": "calling_api", "api_route": parsed_response.api_route})
                 api_response = await self.call_api(parsed_response.api_route, parsed_response.parameters)
+                self.conversation_store.append(session_id, "api", api_response.get("message") if api_response.get("success") else f"Failed: {api_response.get('error')}")
                 return {
                     "api_route": parsed_response.api_route,
                     "parameters": parsed_response.parameters,
@@ -178,49 +296,20 @@ class RikaAgent:
         return buttons
 
     async def call_api(self, api_route: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
-        """Calls the appropriate FastAPI route with the extracted parameters."""
-        try:
-            # Add the API prefix to the route
-            prefixed_route = f"/api/v1/payroll{api_route}"
-            
-            async with httpx.AsyncClient() as client:
-                # POST requests
-                if any(api_route.startswith(route) for route in [
-                    "/payroll-contracts",
-                    "/employees",
-                    "/funds",
-                    "/schedules",
-                    "/employees/deactivate",
-                    "/employees/reactivate",
-                    "/salaries/update",
-                    "/payrolls/process"
-                ]):
-                    response = await client.post(f"{FASTAPI_BASE_URL}{prefixed_route}", json=parameters)
-                
-                # GET requests
-                elif any(api_route.startswith(route) for route in [
-                    "/employees/details",
-                    "/employees/all",
-                    "/balance",
-                    "/liability",
-                    "/payrolls/next-date"
-                ]):
-                    response = await client.get(f"{FASTAPI_BASE_URL}{prefixed_route}", params=parameters)
-                
-                else:
-                    raise HTTPException(status_code=400, detail=f"Unsupported API route: {api_route}")
+        """Validates the parameters against the route's request model and calls its handler in-process."""
+        route = resolve_route(api_route or "")
+        if route is None:
+            raise HTTPException(status_code=400, detail=f"Unsupported API route: {api_route}")
 
-                response.raise_for_status()
-                return response.json()
+        try:
+            request = route.request_model(**(parameters or {}))
+        except ValidationError as e:
+            logger.error(f"Invalid parameters for {api_route}: {e}")
+            raise HTTPException(status_code=422, detail=f"Invalid parameters for {api_route}: {e}")
 
-        except httpx.HTTPError as e:
-            logger.error(f"API call failed: {str(e)}")
-            raise HTTPException(
-                status_code=e.response.status_code if hasattr(e, 'response') else 500,
-                detail=f"API call failed: {str(e)}"
-            )
+        try:
+            response = await route.handler(request)
+            return response.dict()
         except Exception as e:
             logger.error(f"Unexpected error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-
-       
\ No newline at end of file
@@ -2095,4 +2095,66 @@ RIKA_MANAGEMENT_ABI = [
       "stateMutability": "nonpayable",
       "type": "function"
     }
-  ]
\ No newline at end of file
+  ]
+
+# Subset of IMulticall3 used to aggregate view calls into a single eth_call
+MULTICALL3_ABI = [
+    {
+      "type": "function",
+      "name": "tryBlockAndAggregate",
+      "inputs": [
+        {
+          "name": "requireSuccess",
+          "type": "bool",
+          "internalType": "bool"
+        },
+        {
+          "name": "calls",
+          "type": "tuple[]",
+          "internalType": "struct IMulticall3.Call[]",
+          "components": [
+            {
+              "name": "target",
+              "type": "address",
+              "internalType": "address"
+            },
+            {
+              "name": "callData",
+              "type": "bytes",
+              "internalType": "bytes"
+            }
+          ]
+        }
+      ],
+      "outputs": [
+        {
+          "name": "blockNumber",
+          "type": "uint256",
+          "internalType": "uint256"
+        },
+        {
+          "name": "blockHash",
+          "type": "bytes32",
+          "internalType": "bytes32"
+        },
+        {
+          "name": "returnData",
+          "type": "tuple[]",
+          "internalType": "struct IMulticall3.Result[]",
+          "components": [
+            {
+              "name": "success",
+              "type": "bool",
+              "internalType": "bool"
+            },
+            {
+              "name": "returnData",
+              "type": "bytes",
+              "internalType": "bytes"
+            }
+          ]
+        }
+      ],
+      "stateMutability": "payable"
+    }
+  ]
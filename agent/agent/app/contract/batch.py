@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import Any, List, Optional, Set, Tuple
+from web3 import AsyncHTTPProvider
+from web3.types import RPCEndpoint, RPCResponse
+from app.settings import RPC_BATCH_WINDOW, RPC_MAX_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingAsyncHTTPProvider(AsyncHTTPProvider):
+    """AsyncHTTPProvider that packs requests issued close together into one JSON-RPC batch.
+
+    Requests are queued for batch_window seconds, or until max_batch_size are waiting,
+    and then sent as a single HTTP POST. Concurrent awaits such as
+    asyncio.gather(nonce, resolution) therefore cost one round trip. Nodes that reject
+    batches get the queued requests sent one by one instead.
+    """
+
+    def __init__(self, *args, batch_window: float = RPC_BATCH_WINDOW,
+                 max_batch_size: int = RPC_MAX_BATCH_SIZE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._queue: List[Tuple[RPCEndpoint, Any, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Flushes in flight; the event loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop = None
+        self.batches_sent = 0
+        self.requests_batched = 0
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # The queue's futures and flush timer belong to the loop that made them; Celery runs a fresh loop per task
+            self._loop = loop
+            self._queue = []
+            self._flush_handle = None
+            self._tasks = set()
+        future = loop.create_future()
+        self._queue.append((method, params, future))
+
+        if len(self._queue) >= self.max_batch_size:
+            self._schedule_flush(loop, 0)
+        elif self._flush_handle is None:
+            self._schedule_flush(loop, self.batch_window)
+        return await future
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop, delay: float) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = loop.call_later(delay, self._start_flush, loop)
+
+    def _start_flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        task = loop.create_task(self._flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self) -> None:
+        queue, self._queue = self._queue, []
+        self._flush_handle = None
+        if not queue:
+            return
+
+        if len(queue) == 1:
+            method, params, future = queue[0]
+            await self._send_one(method, params, future)
+            return
+
+        try:
+            responses = await self.make_batch_request([(method, params) for method, params, _ in queue])
+        except Exception as e:
+            for _, _, future in queue:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if not isinstance(responses, list) or len(responses) != len(queue):
+            # The node answered the whole batch with one error, so it likely does not support batching
+            logger.warning("JSON-RPC batch rejected, sending requests individually")
+            await asyncio.gather(*(self._send_one(method, params, future) for method, params, future in queue))
+            return
+
+        self.batches_sent += 1
+        self.requests_batched += len(queue)
+        for (_, _, future), response in zip(queue, responses):
+            if not future.done():
+                future.set_result(response)
+
+    async def _send_one(self, method: RPCEndpoint, params: Any, future: asyncio.Future) -> None:
+        try:
+            response = await super().make_request(method, params)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(response)
@@ -0,0 +1,199 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from app.settings import (
+    PAYROLL_CACHE_SIZE, PAYROLL_CACHE_TTL, PAYROLL_CREATION_PENDING_TTL, CONTRACT_REGISTRY_SIZE, VIEW_CACHE_SIZE,
+    VIEW_CACHE_MAX_AGE
+)
+
+
+class PayrollContractCache:
+    """Caches employer -> payroll contract lists resolved from RikaFactory.getEmployerPayrolls.
+
+    Empty lists are cached too, so "No payroll contracts found" costs no RPC either.
+    Entries are dropped when a PayrollContractCreated/Updated log for the employer is
+    seen, and bypassed while a createPayrollContract transaction we built is in flight.
+    """
+
+    def __init__(self, max_size: int = PAYROLL_CACHE_SIZE, ttl: float = PAYROLL_CACHE_TTL,
+                 pending_ttl: float = PAYROLL_CREATION_PENDING_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self._entries: "OrderedDict[str, Tuple[List[str], float]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._pending: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(employer_address: str) -> str:
+        return employer_address.lower()
+
+    def version(self, employer_address: str) -> int:
+        """Returns the invalidation counter to pass back to set()."""
+        return self._versions.get(self._key(employer_address), 0)
+
+    def get(self, employer_address: str) -> Optional[List[str]]:
+        """Returns the cached contract list, or None if it must be fetched."""
+        key = self._key(employer_address)
+        now = time.monotonic()
+
+        pending_since = self._pending.get(key)
+        if pending_since is not None:
+            if now - pending_since < self.pending_ttl:
+                self.misses += 1
+                return None
+            del self._pending[key]
+
+        entry = self._entries.get(key)
+        if entry is None or now - entry[1] >= self.ttl:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry[0])
+
+    def set(self, employer_address: str, contracts: List[str], version: int) -> None:
+        """Stores a fetched list unless the employer was invalidated while it was in flight."""
+        key = self._key(employer_address)
+        if self._versions.get(key, 0) != version or key in self._pending:
+            return
+        self._entries[key] = (list(contracts), time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, employer_address: str) -> None:
+        """Drops the employer's entry and ends any pending-creation bypass."""
+        key = self._key(employer_address)
+        self._entries.pop(key, None)
+        self._pending.pop(key, None)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def is_pending(self, employer_address: str) -> bool:
+        """Whether a createPayrollContract we built for the employer may still be in flight."""
+        pending_since = self._pending.get(self._key(employer_address))
+        return pending_since is not None and time.monotonic() - pending_since < self.pending_ttl
+
+    def mark_pending(self, employer_address: str) -> None:
+        """Bypasses the cache until the employer's new contract is observed on-chain."""
+        key = self._key(employer_address)
+        self._entries.pop(key, None)
+        self._pending[key] = time.monotonic()
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._pending.clear()
+        self._versions.clear()
+
+
+payroll_contract_cache = PayrollContractCache()
+
+
+class ContractRegistry:
+    """Keeps one contract object per address so the ABI is only processed once per clone."""
+
+    def __init__(self, factory: Callable[[str], Any], max_size: int = CONTRACT_REGISTRY_SIZE):
+        self.factory = factory
+        self.max_size = max_size
+        self._contracts: "OrderedDict[str, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, address: str) -> Any:
+        """Returns the contract object for address, constructing it on first use."""
+        key = address.lower()
+        contract = self._contracts.get(key)
+        if contract is not None:
+            self._contracts.move_to_end(key)
+            self.hits += 1
+            return contract
+
+        self.misses += 1
+        contract = self.factory(address)
+        self._contracts[key] = contract
+        while len(self._contracts) > self.max_size:
+            self._contracts.popitem(last=False)
+        return contract
+
+    def __len__(self) -> int:
+        return len(self._contracts)
+
+
+class ViewCache:
+    """Read-through cache for view calls, keyed by (contract, function, args).
+
+    Values are read pinned to the head block reported by the event watcher. When
+    the head advances, entries carry over unless a RikaManagement event for their
+    employer appeared in the new blocks, since every state change the views expose
+    emits such an event. If the head has not been refreshed for max_age seconds,
+    the cache steps aside and reads go to 'latest'.
+    """
+
+    def __init__(self, max_size: int = VIEW_CACHE_SIZE, max_age: float = VIEW_CACHE_MAX_AGE):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries: "OrderedDict[Hashable, Tuple[Any, str]]" = OrderedDict()
+        self._by_employer: Dict[str, Set[Hashable]] = {}
+        self._versions: Dict[str, int] = {}
+        self._head: Optional[int] = None
+        self._head_seen_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def head(self) -> Optional[int]:
+        """Returns the block reads should be pinned to, or None when the head is unknown or stale."""
+        if self._head is None or time.monotonic() - self._head_seen_at > self.max_age:
+            return None
+        return self._head
+
+    def on_new_head(self, block_number: int) -> None:
+        """Advances the head once the logs up to block_number have been applied."""
+        if self._head is None or block_number >= self._head:
+            self._head = block_number
+            self._head_seen_at = time.monotonic()
+
+    def version(self, employer_address: str) -> int:
+        return self._versions.get(employer_address.lower(), 0)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Returns (hit, value)."""
+        if self.head() is None or key not in self._entries:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, self._entries[key][0]
+
+    def set(self, key: Hashable, value: Any, employer_address: str, block_number: Optional[int], version: int) -> None:
+        """Stores a value read at block_number, unless the head or employer moved on meanwhile."""
+        employer = employer_address.lower()
+        if block_number is None or block_number != self.head() or self._versions.get(employer, 0) != version:
+            return
+        self._entries[key] = (value, employer)
+        self._entries.move_to_end(key)
+        self._by_employer.setdefault(employer, set()).add(key)
+        while len(self._entries) > self.max_size:
+            old_key, (_, old_employer) = self._entries.popitem(last=False)
+            self._by_employer.get(old_employer, set()).discard(old_key)
+
+    def invalidate_employer(self, employer_address: str) -> None:
+        """Drops every cached view for the employer."""
+        employer = employer_address.lower()
+        self._versions[employer] = self._versions.get(employer, 0) + 1
+        for key in self._by_employer.pop(employer, set()):
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_employer.clear()
+        self._head = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "head": self._head}
+
+
+view_cache = ViewCache()
@@ -1,9 +1,22 @@
-import os
-from dotenv import load_dotenv
-from web3 import Web3
+import asyncio
+import logging
+import aiohttp
+from collections import OrderedDict
+from web3 import AsyncWeb3
 from web3.exceptions import ContractLogicError
-from typing import List, Dict, Any
-from app.contract.abi import RIKA_FACTORY_ABI, RIKA_MANAGEMENT_ABI
+from typing import List, Dict, Any, Optional, Tuple
+from app.contract.abi import RIKA_FACTORY_ABI, RIKA_MANAGEMENT_ABI, MULTICALL3_ABI
+from app.contract.cache import payroll_contract_cache, view_cache, ContractRegistry
+from app.contract.nonce import NonceManager
+from app.contract.fees import FeeOracle
+from app.contract.gas import GasModel
+from app.contract.batch import BatchingAsyncHTTPProvider
+from app.contract.registry import PayrollRegistry
+from app.indexer.store import event_store
+from app.contract.mirror import PayrollMirror, MirrorState
+from app.contract.multicall import ViewCall, aggregate_view_calls
+from app.contract.preflight import preflight_payrolls
+from app.contract.receipts import ReceiptTracker
 from app.contract.models import (
     CreatePayrollContractInput, AddEmployeeInput, AddEmployeesBatchInput, AddFundsInput,
     CreateScheduleInput, DeactivateEmployeeInput, ReactivateEmployeeInput,
@@ -11,15 +24,19 @@ from app.contract.models import (
     GetAllEmployeesWithDetailsInput, GetEmployerBalanceInput, GetTotalPayrollLiabilityInput,
     HasSufficientBalanceForPayrollInput, GetNextPayrollDateInput
 )
+from app.settings import (
+    WEB3_PROVIDER_URI, RPC_POOL_SIZE, RPC_TIMEOUT, AGENT_WALLET_ADDRESS, RIKA_FACTORY_CONTRACT_ADDRESS,
+    RIKA_MANAGEMENT_CONTRACT_ADDRESS, MULTICALL3_ADDRESS, MIRROR_TRACK_ALL, MIRROR_RECONCILE_INTERVAL,
+    RECEIPT_TABLE_SIZE
+)
 
-load_dotenv()
-
-# Connect to EVM node
-w3 = Web3(Web3.HTTPProvider(os.getenv('WEB3_PROVIDER_URI')))
+logger = logging.getLogger(__name__)
 
-# Contract addresses
-RIKA_FACTORY_CONTRACT_ADDRESS = os.getenv('RIKA_FACTORY_CONTRACT_ADDRESS')
-RIKA_MANAGEMENT_CONTRACT_ADDRESS = os.getenv('RIKA_MANAGEMENT_CONTRACT_ADDRESS')
+# Connect to EVM node; concurrent requests share JSON-RPC batches
+w3 = AsyncWeb3(BatchingAsyncHTTPProvider(
+    WEB3_PROVIDER_URI,
+    request_kwargs={'timeout': aiohttp.ClientTimeout(total=RPC_TIMEOUT)}
+))
 
 # Initialize contracts
 rika_factory = w3.eth.contract(
@@ -32,43 +49,244 @@ rika_management = w3.eth.contract(
     abi=RIKA_MANAGEMENT_ABI
 )
 
-def build_transaction_params(employer_address: str) -> Dict[str, Any]:
-    """Build transaction parameters."""
+multicall = w3.eth.contract(
+    address=MULTICALL3_ADDRESS,
+    abi=MULTICALL3_ABI
+)
+
+# One reusable contract object per RikaManagement clone
+RikaManagementContract = w3.eth.contract(abi=RIKA_MANAGEMENT_ABI)
+management_contracts = ContractRegistry(lambda address: RikaManagementContract(address=address))
+
+# Local nonces for the agent wallet
+nonce_manager = NonceManager(w3, managed_senders=[AGENT_WALLET_ADDRESS])
+
+# Cached EIP-1559 fees
+fee_oracle = FeeOracle(w3)
+
+# Gas limits learned from mined receipts
+gas_model = GasModel()
+
+# Employer -> payroll contracts, synced from factory logs
+payroll_registry = PayrollRegistry(event_store)
+
+# Employees and schedules mirrored in memory, kept current by the event watcher
+payroll_mirror = PayrollMirror(w3, multicall, management_contracts)
+
+# Status of broadcast transactions, polled together once per block
+receipt_tracker = ReceiptTracker(w3)
+
+# Read consistency modes: answer from the mirror, or from the chain
+MIRROR = 'mirror'
+LIVE = 'live'
+
+# Calls this client built, by (sender, nonce), as (to, data)
+built_transactions: "OrderedDict[Tuple[str, int], Tuple[str, str]]" = OrderedDict()
+
+# Functions whose gas grows with the length of their first argument
+BATCH_FUNCTIONS = {'addEmployeesBatch', 'updateSalariesBatch'}
+
+async def connect() -> None:
+    """Opens the pooled HTTP session used by the provider."""
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=RPC_POOL_SIZE, ttl_dns_cache=300)
+    )
+    await w3.provider.cache_async_session(session)
+
+async def disconnect() -> None:
+    """Closes the pooled HTTP session."""
+    await w3.provider.disconnect()
+
+async def get_nonce(sender_address: str) -> int:
+    """Reserves a local nonce for managed senders; asks the node for everyone else."""
+    if nonce_manager.is_managed(sender_address):
+        return await nonce_manager.reserve(sender_address)
+    # Employer transactions are signed elsewhere and may never be broadcast
+    return await w3.eth.get_transaction_count(sender_address, 'pending')
+
+async def build_transaction_params(employer_address: str) -> Dict[str, Any]:
+    """Build transaction parameters; a nonce reserved alongside a failed fee lookup is handed back."""
+    nonce, fees = await asyncio.gather(
+        get_nonce(employer_address),
+        fee_oracle.get_fee_params(),
+        return_exceptions=True
+    )
+    if isinstance(nonce, BaseException):
+        raise nonce
+    if isinstance(fees, BaseException):
+        nonce_manager.release(employer_address, nonce)
+        raise fees
     params = {
         'from': employer_address,
-        'nonce': w3.eth.get_transaction_count(employer_address),
-        'gasPrice': w3.eth.gas_price
+        'nonce': nonce,
+        **fees
     }
     return params
 
+def gas_shape(function_name: str, args: List[Any], contract_address: str) -> Any:
+    """Returns the argument shape that drives a function's gas cost, or None when no shape predicts it."""
+    if function_name in BATCH_FUNCTIONS:
+        return len(args[0])
+    if function_name == 'processAllPayrolls':
+        # Cost grows with the schedules due at the time of the call, which the arguments do not show
+        return None
+    return 0
+
+async def estimate_gas_limit(function, params: Dict[str, Any]) -> int:
+    """Calls estimate_gas, so a call that would revert fails here rather than once mined.
+
+    The model's prediction from mined receipts only caps the headroom added to the
+    estimate; the limit never drops below the node's estimate itself.
+    """
+    estimated = await function.estimate_gas(params)
+    limit = int(estimated * gas_model.headroom)
+    shape = gas_shape(function.fn_name, list(function.args), function.address)
+    if shape is not None:
+        predicted = gas_model.predict(function.fn_name, shape)
+        if predicted is not None:
+            limit = max(estimated, min(limit, predicted))
+    return limit
+
+async def build_transaction(function, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds an unsigned transaction and remembers it, so its receipt may later train the gas model."""
+    tx = await function.build_transaction(params)
+    key = (tx['from'].lower(), tx['nonce'])
+    built_transactions[key] = (tx['to'].lower(), tx['data'].lower())
+    built_transactions.move_to_end(key)
+    while len(built_transactions) > RECEIPT_TABLE_SIZE:
+        built_transactions.popitem(last=False)
+    return tx
+
+def was_built(tx: Dict[str, Any]) -> bool:
+    """Whether a transaction fetched from the chain is one this client built, to the same call."""
+    built = built_transactions.get((tx['from'].lower(), tx['nonce']))
+    return tx['to'] is not None and built == (tx['to'].lower(), AsyncWeb3.to_hex(tx['input']).lower())
+
+def record_transaction_gas(tx: Dict[str, Any], receipt: Dict[str, Any]) -> None:
+    """Feeds the gasUsed of a mined transaction built by this client into the gas model."""
+    if receipt.get('status') != 1:
+        return
+    if tx['to'].lower() == rika_factory.address.lower():
+        contract = rika_factory
+    else:
+        contract = management_contracts.get(tx['to'])
+    function, args = contract.decode_function_input(tx['data'])
+    shape = gas_shape(function.fn_name, list(args.values()), tx['to'])
+    if shape is not None:
+        gas_model.record(function.fn_name, shape, receipt['gasUsed'])
+
+async def on_tracked_transaction(entry: Dict[str, Any], receipt: Optional[Dict[str, Any]]) -> None:
+    """Feeds a mined transaction built by this client back into the gas model and the payroll contract cache.
+
+    Any hash can be submitted for tracking, so a transaction this client did not build
+    is ignored; otherwise look-alike calls could drag the predicted gas limits down.
+    """
+    if receipt is None:
+        return
+    tx = await w3.eth.get_transaction(entry['tx_hash'])
+    if not was_built(tx):
+        logger.debug(f"Not learning from {entry['tx_hash']}: not built by this client")
+        return
+    if tx['to'].lower() == rika_factory.address.lower():
+        # Mined or reverted, the employer's contract creation is no longer in flight
+        payroll_contract_cache.invalidate(tx['from'])
+        payroll_registry.note_change(tx['from'], receipt['blockNumber'])
+    try:
+        record_transaction_gas({'to': tx['to'], 'data': tx['input']}, receipt)
+    except Exception as e:
+        logger.debug(f"Not recording gas for {entry['tx_hash']}: {e}")
+
+async def track_transactions(tx_hashes: List[str]) -> Dict[str, Any]:
+    """Tracks broadcast transactions until they are mined, dropped or time out."""
+    try:
+        transactions = [receipt_tracker.track(tx_hash, callback=on_tracked_transaction) for tx_hash in tx_hashes]
+        return {"transactions": transactions, "message": f"Tracking {len(transactions)} transactions"}
+    except Exception as e:
+        return {"error": str(e)}
+
+async def get_transaction_statuses(tx_hashes: List[str]) -> Dict[str, Any]:
+    """Looks up tracked transactions in the receipt tracker's status table."""
+    try:
+        transactions = [
+            receipt_tracker.status(tx_hash) or {"tx_hash": tx_hash.lower(), "status": "unknown"}
+            for tx_hash in tx_hashes
+        ]
+        return {"transactions": transactions, "message": "Successfully retrieved transaction statuses"}
+    except Exception as e:
+        return {"error": str(e)}
+
+async def cached_call(contract, function_name: str, args: tuple, employer_address: str) -> Any:
+    """Read-through view call, pinned to the head block the event watcher last saw."""
+    key = (contract.address.lower(), function_name, tuple(str(arg).lower() for arg in args))
+    hit, value = view_cache.get(key)
+    if hit:
+        return value
+
+    block_number = view_cache.head()
+    version = view_cache.version(employer_address)
+    value = await getattr(contract.functions, function_name)(*args).call(
+        {'from': employer_address},
+        block_identifier=block_number if block_number is not None else 'latest'
+    )
+    view_cache.set(key, value, employer_address, block_number, version)
+    return value
+
 # Rika Factory Functions
-def create_payroll_contract(employer_address: str) -> Dict[str, Any]:
+async def mirrored_state(contract, employer_address: str, consistency: str) -> Optional[MirrorState]:
+    """Returns the mirrored state for a read, or None when it should go to the chain."""
+    if consistency != MIRROR or not payroll_mirror.is_live(view_cache.head()):
+        return None
+    try:
+        return await payroll_mirror.get(contract, employer_address)
+    except Exception as e:
+        # No Multicall3 on this chain, or the bootstrap read failed: answer from the contract instead
+        logger.warning(f"Mirror unavailable for {contract.address}, reading live: {e}")
+        return None
+
+def consistency_info(state: Optional[MirrorState]) -> Dict[str, Any]:
+    if state is None:
+        return {"consistency": LIVE}
+    return {"consistency": MIRROR, "block_number": state.block, "lag_blocks": payroll_mirror.lag(state)}
+
+async def create_payroll_contract(employer_address: str) -> Dict[str, Any]:
     """Creates a new payroll contract. Returns unsigned transaction."""
     try:
-        params = build_transaction_params(employer_address)
+        params = await build_transaction_params(employer_address)
+        function = rika_factory.functions.createPayrollContract()
+        gas_estimation = "dynamic"
         try:
-            # Try estimation first
-            estimated_gas = rika_factory.functions.createPayrollContract().estimate_gas(params)
-            params['gas'] = estimated_gas + 150000  # Buffer for safety
-        except:
-            # Fall back to fixed gas if estimation fails
-            params['gas'] = 300000
+            params['gas'] = await estimate_gas_limit(function, params)
+        except ContractLogicError:
+            # The transaction would revert; report that rather than build it
+            raise
+        except Exception:
+            # The node could not estimate; fall back to the largest usage seen on-chain, if any
+            params['gas'] = gas_model.best_effort('createPayrollContract')
+            if params['gas'] is None:
+                raise
+            gas_estimation = "observed"
             
-        tx = rika_factory.functions.createPayrollContract().build_transaction(params)
+        tx = await build_transaction(function, params)
+        # The employer's contract list changes once this is mined
+        payroll_contract_cache.mark_pending(employer_address)
         return {
             "transaction": tx,
             "message": "Transaction built successfully",
-            "gas_estimation": "dynamic" if 'estimated_gas' in locals() else "fixed"
+            "gas_estimation": gas_estimation
         }
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def get_all_payroll_contracts_with_employers() -> Dict[str, Any]:
-    """Gets all payroll contracts with their respective employers."""
+async def get_all_payroll_contracts_with_employers() -> Dict[str, Any]:
+    """Gets all payroll contracts with their respective employers from the event index."""
     try:
-        employers, contracts = rika_factory.functions.getAllPayrollContractsWithEmployers().call()
+        await payroll_registry.sync()
+        employers, contracts = [], []
+        for employer, employer_contracts in (await asyncio.to_thread(payroll_registry.get_all_contracts)).items():
+            employers.extend([employer] * len(employer_contracts))
+            contracts.extend(employer_contracts)
         return {
             "employers": employers,
             "contracts": contracts,
@@ -79,10 +297,23 @@ def get_all_payroll_contracts_with_employers() -> Dict[str, Any]:
     except Exception as e:
         return {"error": str(e)}
 
-def get_employer_payroll_contract(employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
+async def get_employer_payrolls(employer_address: str) -> List[str]:
+    """Resolves the employer's payroll contract addresses from the cache, then the registry, then the factory."""
+    contracts = payroll_contract_cache.get(employer_address)
+    if contracts is None:
+        version = payroll_contract_cache.version(employer_address)
+        # The index trails the head; it answers once it holds every factory log seen for the employer
+        if payroll_registry.is_current(employer_address) and not payroll_contract_cache.is_pending(employer_address):
+            contracts = await asyncio.to_thread(payroll_registry.get_employer_contracts, employer_address)
+        else:
+            contracts = await rika_factory.functions.getEmployerPayrolls(employer_address).call({'from': employer_address})
+        payroll_contract_cache.set(employer_address, contracts, version)
+    return contracts
+
+async def get_employer_payroll_contract(employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
     """Gets specific payroll contract instance based on index."""
     try:
-        contracts = rika_factory.functions.getEmployerPayrolls(employer_address).call({'from': employer_address})
+        contracts = await get_employer_payrolls(employer_address)
         
         if not contracts:
             return {"error": "No payroll contracts found"}
@@ -90,10 +321,7 @@ def get_employer_payroll_contract(employer_address: str, contract_index: int = 0
         if contract_index >= len(contracts):
             return {"error": f"Invalid contract index. Max index is {len(contracts)-1}"}
             
-        selected_contract = w3.eth.contract(
-            address=contracts[contract_index],
-            abi=RIKA_MANAGEMENT_ABI
-        )
+        selected_contract = management_contracts.get(contracts[contract_index])
         
         return {
             "all_contracts": contracts,
@@ -108,270 +336,417 @@ def get_employer_payroll_contract(employer_address: str, contract_index: int = 0
         return {"error": str(e)}
 
 
-
 # Rika Management Functions
-def get_contract_instance(employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
+async def get_contract_instance(employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
     """Gets the appropriate contract instance."""
     try:
-        contracts = rika_factory.functions.getEmployerPayrolls(employer_address).call({'from': employer_address})
+        contracts = await get_employer_payrolls(employer_address)
         if not contracts:
             return {"error": "No payroll contracts found"}
         if contract_index >= len(contracts):
             return {"error": f"Invalid contract index. Max index is {len(contracts)-1}"}
             
-        return w3.eth.contract(address=contracts[contract_index], abi=RIKA_MANAGEMENT_ABI)
+        return management_contracts.get(contracts[contract_index])
     except Exception as e:
         return {"error": str(e)}
 
-def add_employee(name: str, employee_address: str, salary: int, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
+async def prepare_transaction(employer_address: str, contract_index: int = 0, sender_address: Optional[str] = None):
+    """Resolves the payroll contract and builds transaction params in one batched round trip.
+
+    The nonce is handed back if the contract cannot be resolved, so the sender is not left with a gap.
+    """
+    contract, params = await asyncio.gather(
+        get_contract_instance(employer_address, contract_index),
+        build_transaction_params(sender_address or employer_address),
+        return_exceptions=True
+    )
+    if isinstance(params, BaseException):
+        raise params
+    if isinstance(contract, (dict, BaseException)):
+        nonce_manager.release(params['from'], params['nonce'])
+    if isinstance(contract, BaseException):
+        raise contract
+    return contract, params
+
+async def add_employee(name: str, employee_address: str, salary: int, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
     """Adds a new employee. Returns unsigned transaction."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract, params = await prepare_transaction(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        params = build_transaction_params(employer_address)
-        params['gas'] = contract.functions.addEmployee(name, employee_address, salary).estimate_gas(params) + 100000
-        tx = contract.functions.addEmployee(name, employee_address, salary).build_transaction(params)
+        function = contract.functions.addEmployee(name, employee_address, salary)
+        params['gas'] = await estimate_gas_limit(function, params)
+        tx = await build_transaction(function, params)
         return {"transaction": tx, "message": "Transaction built successfully"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def add_employees_batch(names: List[str], employee_addresses: List[str], salaries: List[int], employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
+async def add_employees_batch(names: List[str], employee_addresses: List[str], salaries: List[int], employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
     """Adds multiple employees. Returns unsigned transaction."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract, params = await prepare_transaction(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        params = build_transaction_params(employer_address)
-        params['gas'] = contract.functions.addEmployeesBatch(names, employee_addresses, salaries).estimate_gas(params) + 200000
-        tx = contract.functions.addEmployeesBatch(names, employee_addresses, salaries).build_transaction(params)
+        function = contract.functions.addEmployeesBatch(names, employee_addresses, salaries)
+        params['gas'] = await estimate_gas_limit(function, params)
+        tx = await build_transaction(function, params)
         return {"transaction": tx, "message": "Transaction built successfully"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
-def add_funds(amount: int, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
+async def add_funds(amount: int, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
     """Adds funds to the payroll contract. Returns unsigned transaction."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract, params = await prepare_transaction(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        params = build_transaction_params(employer_address)
-        params['gas'] = contract.functions.addFunds(amount).estimate_gas(params) + 100000
-        tx = contract.functions.addFunds(amount).build_transaction(params)
+        function = contract.functions.addFunds(amount)
+        params['gas'] = await estimate_gas_limit(function, params)
+        tx = await build_transaction(function, params)
         return {"transaction": tx, "message": "Transaction built successfully"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def create_schedule(employee_address: str, start_date: int, end_date: int, interval: int, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
+async def create_schedule(employee_address: str, start_date: int, end_date: int, interval: int, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
     """Creates a payroll schedule. Returns unsigned transaction."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract, params = await prepare_transaction(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        params = build_transaction_params(employer_address)
-        params['gas'] = contract.functions.createSchedule(employee_address, start_date, end_date, interval).estimate_gas(params) + 150000
-        tx = contract.functions.createSchedule(employee_address, start_date, end_date, interval).build_transaction(params)
+        function = contract.functions.createSchedule(employee_address, start_date, end_date, interval)
+        params['gas'] = await estimate_gas_limit(function, params)
+        tx = await build_transaction(function, params)
         return {"transaction": tx, "message": "Transaction built successfully"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def deactivate_employee(employee_address: str, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
+async def deactivate_employee(employee_address: str, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
     """Deactivates an employee. Returns unsigned transaction."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract, params = await prepare_transaction(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        params = build_transaction_params(employer_address)
-        params['gas'] = contract.functions.deactivateEmployee(employee_address).estimate_gas(params) + 100000
-        tx = contract.functions.deactivateEmployee(employee_address).build_transaction(params)
+        function = contract.functions.deactivateEmployee(employee_address)
+        params['gas'] = await estimate_gas_limit(function, params)
+        tx = await build_transaction(function, params)
         return {"transaction": tx, "message": "Transaction built successfully"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def reactivate_employee(employee_address: str, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
+async def reactivate_employee(employee_address: str, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
     """Reactivates an employee. Returns unsigned transaction."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract, params = await prepare_transaction(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        params = build_transaction_params(employer_address)
-        params['gas'] = contract.functions.reactivateEmployee(employee_address).estimate_gas(params) + 100000
-        tx = contract.functions.reactivateEmployee(employee_address).build_transaction(params)
+        function = contract.functions.reactivateEmployee(employee_address)
+        params['gas'] = await estimate_gas_limit(function, params)
+        tx = await build_transaction(function, params)
         return {"transaction": tx, "message": "Transaction built successfully"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def update_employee_salary(employee_address: str, new_salary: int, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
+async def update_employee_salary(employee_address: str, new_salary: int, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
     """Updates an employee's salary. Returns unsigned transaction."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract, params = await prepare_transaction(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        params = build_transaction_params(employer_address)
-        params['gas'] = contract.functions.updateEmployeeSalary(employee_address, new_salary).estimate_gas(params) + 100000
-        tx = contract.functions.updateEmployeeSalary(employee_address, new_salary).build_transaction(params)
+        function = contract.functions.updateEmployeeSalary(employee_address, new_salary)
+        params['gas'] = await estimate_gas_limit(function, params)
+        tx = await build_transaction(function, params)
         return {"transaction": tx, "message": "Transaction built successfully"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def process_all_payrolls(employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
-    """Processes all payrolls. Returns unsigned transaction."""
+async def process_all_payrolls(employer_address: str, contract_index: int = 0, sender_address: Optional[str] = None) -> Dict[str, Any]:
+    """Processes all payrolls. Returns unsigned transaction, sent from sender_address if given."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract, params = await prepare_transaction(employer_address, contract_index, sender_address)
+        if isinstance(contract, dict):
             return contract
             
-        params = build_transaction_params(employer_address)
-        params['gas'] = contract.functions.processAllPayrolls().estimate_gas(params) + 200000
-        tx = contract.functions.processAllPayrolls().build_transaction(params)
+        try:
+            function = contract.functions.processAllPayrolls()
+            params['gas'] = await estimate_gas_limit(function, params)
+            tx = await build_transaction(function, params)
+        except Exception:
+            # Hand the nonce back so the agent wallet is not left with a gap
+            nonce_manager.release(params['from'], params['nonce'])
+            raise
         return {"transaction": tx, "message": "Transaction built successfully"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
-def get_contract_instance(employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
-    """Gets the appropriate contract instance."""
+async def get_employee_details(employee_address: str, employer_address: str, contract_index: int = 0, consistency: str = MIRROR) -> Dict[str, Any]:
+    """Retrieves detailed information about a specific employee."""
     try:
-        contracts = rika_factory.functions.getEmployerPayrolls(employer_address).call({'from': employer_address})
-        if not contracts:
-            return {"error": "No payroll contracts found"}
-        if contract_index >= len(contracts):
-            return {"error": f"Invalid contract index. Max index is {len(contracts)-1}"}
+        contract = await get_contract_instance(employer_address, contract_index)
+        if isinstance(contract, dict):
+            return contract
             
-        return w3.eth.contract(address=contracts[contract_index], abi=RIKA_MANAGEMENT_ABI)
+        state = await mirrored_state(contract, employer_address, consistency)
+        if state is not None:
+            details = list(state.employee(employee_address))
+        else:
+            details = await cached_call(contract, 'getEmployeeDetails', (employer_address, employee_address), employer_address)
+        return {"details": details, **consistency_info(state), "message": "Successfully retrieved employee details"}
+    except ContractLogicError as e:
+        return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def add_employee(name: str, employee_address: str, salary: int, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
-    """Adds a new employee. Returns unsigned transaction."""
+async def get_all_employees_with_details(employer_address: str, contract_index: int = 0, consistency: str = MIRROR) -> Dict[str, Any]:
+    """Retrieves detailed information for all employees."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract = await get_contract_instance(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        params = build_transaction_params(employer_address)
-        params['gas'] = contract.functions.addEmployee(name, employee_address, salary).estimate_gas(params) + 100000
-        tx = contract.functions.addEmployee(name, employee_address, salary).build_transaction(params)
-        return {"transaction": tx, "message": "Transaction built successfully"}
+        state = await mirrored_state(contract, employer_address, consistency)
+        if state is not None:
+            details = state.all_employees()
+        else:
+            details = await cached_call(contract, 'getAllEmployeesWithDetails', (employer_address,), employer_address)
+        return {"details": details, **consistency_info(state), "message": "Successfully retrieved all employees"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def add_employees_batch(names: List[str], employee_addresses: List[str], salaries: List[int], employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
-    """Adds multiple employees. Returns unsigned transaction."""
+async def get_employer_balance(employer_address: str, contract_index: int = 0, consistency: str = MIRROR) -> Dict[str, Any]:
+    """Retrieves the employer's payroll contract balance."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract = await get_contract_instance(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        params = build_transaction_params(employer_address)
-        params['gas'] = contract.functions.addEmployeesBatch(names, employee_addresses, salaries).estimate_gas(params) + 200000
-        tx = contract.functions.addEmployeesBatch(names, employee_addresses, salaries).build_transaction(params)
-        return {"transaction": tx, "message": "Transaction built successfully"}
+        state = await mirrored_state(contract, employer_address, consistency)
+        if state is not None:
+            balance = state.balance
+        else:
+            balance = await cached_call(contract, 'getEmployerBalance', (employer_address,), employer_address)
+        return {"balance": balance, **consistency_info(state), "message": "Successfully retrieved balance"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
-def get_employee_details(employee_address: str, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
-    """Retrieves detailed information about a specific employee."""
+
+async def get_total_payroll_liability(employer_address: str, contract_index: int = 0, consistency: str = MIRROR) -> Dict[str, Any]:
+    """Calculates and retrieves the total payroll liability."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract = await get_contract_instance(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        details = contract.functions.getEmployeeDetails(employer_address, employee_address).call({'from': employer_address})
-        return {"details": details, "message": "Successfully retrieved employee details"}
+        state = await mirrored_state(contract, employer_address, consistency)
+        if state is not None:
+            liability = state.total_liability()
+        else:
+            liability = await cached_call(contract, 'getTotalPayrollLiability', (employer_address,), employer_address)
+        return {"liability": liability, **consistency_info(state), "message": "Successfully retrieved liability"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def get_all_employees_with_details(employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
-    """Retrieves detailed information for all employees."""
+async def has_sufficient_balance_for_payroll(employer_address: str, contract_index: int = 0, consistency: str = MIRROR) -> Dict[str, Any]:
+    """Checks if the employer has sufficient balance for payroll."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract = await get_contract_instance(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        details = contract.functions.getAllEmployeesWithDetails(employer_address).call({'from': employer_address})
-        return {"details": details, "message": "Successfully retrieved all employees"}
+        state = await mirrored_state(contract, employer_address, consistency)
+        if state is not None:
+            result = not state.is_underfunded()
+        else:
+            result = await cached_call(contract, 'hasSufficientBalanceForPayroll', (employer_address,), employer_address)
+        return {"has_sufficient": result, **consistency_info(state), "message": "Successfully checked balance"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def get_employer_balance(employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
-    """Retrieves the employer's payroll contract balance."""
+async def get_next_payroll_date(employee_address: str, employer_address: str, contract_index: int = 0, consistency: str = MIRROR) -> Dict[str, Any]:
+    """Retrieves next payroll date."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract = await get_contract_instance(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
             
-        balance = contract.functions.getEmployerBalance(employer_address).call({'from': employer_address})
-        return {"balance": balance, "message": "Successfully retrieved balance"}
+        state = await mirrored_state(contract, employer_address, consistency)
+        if state is not None:
+            date = state.next_payroll_date(employee_address)
+        else:
+            date = await cached_call(contract, 'getNextPayrollDate', (employer_address, employee_address), employer_address)
+        return {"next_date": date, **consistency_info(state), "message": "Successfully retrieved next payroll date"}
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def get_total_payroll_liability(employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
-    """Calculates and retrieves the total payroll liability."""
+async def get_underfunded_employers() -> Dict[str, Any]:
+    """Lists mirrored payroll contracts whose balance is below their liability."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
-            return contract
-            
-        liability = contract.functions.getTotalPayrollLiability(employer_address).call({'from': employer_address})
-        return {"liability": liability, "message": "Successfully retrieved liability"}
-    except ContractLogicError as e:
+        if not payroll_mirror.is_live(view_cache.head()):
+            return {"error": "Payroll mirror is not being updated"}
+        underfunded = payroll_mirror.underfunded()
+        return {
+            "underfunded": underfunded,
+            "block_number": payroll_mirror.head,
+            "message": f"Found {len(underfunded)} underfunded payroll contracts"
+        }
+    except Exception as e:
         return {"error": str(e)}
+
+async def track_all_payrolls() -> int:
+    """Mirrors every payroll contract in the registry, so funding checks cover all employers."""
+    await payroll_registry.sync()
+    registry = await asyncio.to_thread(payroll_registry.get_all_contracts)
+    return await payroll_mirror.track(
+        (management_contracts.get(contract), employer)
+        for employer, contracts in registry.items() for contract in contracts
+    )
+
+async def read_unmirrored_payrolls() -> List[Tuple[Tuple[str, str], MirrorState]]:
+    """Reads every payroll contract in the registry that the mirror does not hold, without mirroring it."""
+    await payroll_registry.sync()
+    registry = await asyncio.to_thread(payroll_registry.get_all_contracts)
+    return await payroll_mirror.read_untracked(
+        (management_contracts.get(contract), employer)
+        for employer, contracts in registry.items() for contract in contracts
+    )
+
+async def reconcile_payroll_mirror() -> None:
+    """Periodically mirrors new payroll contracts and reconciles mirrored totals with the chain."""
+    while True:
+        await asyncio.sleep(MIRROR_RECONCILE_INTERVAL)
+        try:
+            if not payroll_mirror.is_live(view_cache.head()):
+                continue
+            if MIRROR_TRACK_ALL:
+                await track_all_payrolls()
+            await payroll_mirror.reconcile()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error reconciling payroll mirror: {e}")
+
+async def preflight_payroll_contracts(pairs: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Checks which (employer, contract address) pairs a processAllPayrolls from the agent wallet would pay out on."""
+    async def read_state(contract, employer_address: str, block_number: int) -> MirrorState:
+        if payroll_mirror.is_live(view_cache.head()):
+            return await payroll_mirror.get(contract, employer_address)
+        return await payroll_mirror.read_state(contract, employer_address, block_number)
+
+    try:
+        candidates = [(employer, management_contracts.get(contract)) for employer, contract in pairs]
+        return await preflight_payrolls(w3, multicall, candidates, AGENT_WALLET_ADDRESS, read_state)
     except Exception as e:
         return {"error": str(e)}
 
-def has_sufficient_balance_for_payroll(employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
-    """Checks if the employer has sufficient balance for payroll."""
+async def get_payroll_views(employer_address: str, contract_index: int = 0, employee_address: Optional[str] = None) -> Dict[str, Any]:
+    """Reads balance, liability, sufficiency, all employees and the next payroll date in one eth_call."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
+        contract = await get_contract_instance(employer_address, contract_index)
+        if isinstance(contract, dict):
             return contract
-            
-        result = contract.functions.hasSufficientBalanceForPayroll(employer_address).call({'from': employer_address})
-        return {"has_sufficient": result, "message": "Successfully checked balance"}
+
+        calls = {
+            "balance": ViewCall(contract, 'getEmployerBalance', (employer_address,)),
+            "liability": ViewCall(contract, 'getTotalPayrollLiability', (employer_address,)),
+            "has_sufficient": ViewCall(contract, 'hasSufficientBalanceForPayroll', (employer_address,)),
+            "details": ViewCall(contract, 'getAllEmployeesWithDetails', (employer_address,)),
+        }
+        if employee_address:
+            calls["next_date"] = ViewCall(contract, 'getNextPayrollDate', (employer_address, employee_address))
+
+        aggregated = await aggregate_view_calls(w3, multicall, list(calls.values()))
+        views: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        for key, (success, value) in zip(calls, aggregated["results"]):
+            views[key] = value
+            if not success:
+                errors[key] = "Call reverted"
+
+        return {
+            **views,
+            "errors": errors or None,
+            "block_number": aggregated["block_number"],
+            "message": "Successfully retrieved payroll views"
+        }
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
         return {"error": str(e)}
 
-def get_next_payroll_date(employee_address: str, employer_address: str, contract_index: int = 0) -> Dict[str, Any]:
-    """Retrieves next payroll date."""
+async def get_contract_summary(contract_address: str, employer_address: str, details: List[int]) -> Dict[str, Any]:
+    """Builds one contract's dashboard entry from its factory details and its employees' schedules."""
+    total_employees, total_liability, current_balance = details
+    contract = management_contracts.get(contract_address)
+
+    next_payroll_date = None
+    if total_employees:
+        # Earliest due date over the active employees' active schedules, as the scheduler sees it;
+        # getNextPayrollDate gives each employee's latest one and ignores whether they are active
+        block_number = view_cache.head()
+        state = await payroll_mirror.read_state(
+            contract, employer_address, block_number if block_number is not None else 'latest'
+        )
+        next_payroll_date = state.next_due()
+
+    return {
+        "contract_address": contract_address,
+        "balance": current_balance,
+        "liability": total_liability,
+        "employee_count": total_employees,
+        "has_sufficient": current_balance >= total_liability,
+        "next_payroll_date": next_payroll_date
+    }
+
+async def get_employer_summary(employer_address: str) -> Dict[str, Any]:
+    """Summarises every payroll contract of an employer, reading the contracts concurrently."""
     try:
-        contract = get_contract_instance(employer_address, contract_index)
-        if "error" in contract:
-            return contract
-            
-        date = contract.functions.getNextPayrollDate(employer_address, employee_address).call({'from': employer_address})
-        return {"next_date": date, "message": "Successfully retrieved next payroll date"}
+        version = payroll_contract_cache.version(employer_address)
+        contracts, details = await rika_factory.functions.getEmployerPayrollDetails(employer_address).call({'from': employer_address})
+        payroll_contract_cache.set(employer_address, contracts, version)
+        if not contracts:
+            return {"error": "No payroll contracts found"}
+
+        summaries = await asyncio.gather(*(
+            get_contract_summary(address, employer_address, contract_details)
+            for address, contract_details in zip(contracts, details)
+        ))
+        for index, summary in enumerate(summaries):
+            summary["contract_index"] = index
+
+        return {
+            "employer_address": employer_address,
+            "contracts": list(summaries),
+            "message": f"Successfully summarised {len(summaries)} payroll contracts"
+        }
     except ContractLogicError as e:
         return {"error": str(e)}
     except Exception as e:
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from eth_utils import event_abi_to_log_topic
+from web3 import AsyncWeb3
+from web3.exceptions import BlockNotFound
+from app.contract.abi import RIKA_FACTORY_ABI, RIKA_MANAGEMENT_ABI
+from app.contract.client import w3, rika_factory, payroll_mirror, payroll_registry
+from app.contract.cache import payroll_contract_cache, view_cache
+from app.settings import EVENT_POLL_INTERVAL, EVENT_MAX_ADDRESSES, MIRROR_REORG_DEPTH, INDEXER_MAX_CHUNK
+
+logger = logging.getLogger(__name__)
+
+
+def event_topics(abi: List[Dict[str, Any]]) -> Dict[bytes, str]:
+    """Maps topic0 to event name for every event in abi."""
+    return {event_abi_to_log_topic(entry): entry['name'] for entry in abi if entry['type'] == 'event'}
+
+
+# Factory events that change an employer's payroll contract list
+FACTORY_EVENT_TOPICS = {
+    topic: name for topic, name in event_topics(RIKA_FACTORY_ABI).items()
+    if name in ("PayrollContractCreated", "PayrollContractUpdated")
+}
+
+# RikaManagement events whose first indexed argument is the employer
+MANAGEMENT_EVENT_TOPICS = event_topics([
+    entry for entry in RIKA_MANAGEMENT_ABI
+    if entry['type'] == 'event' and entry['inputs'] and entry['inputs'][0]['name'] == 'employer'
+])
+
+
+FACTORY_TOPICS = [AsyncWeb3.to_hex(topic) for topic in FACTORY_EVENT_TOPICS]
+MANAGEMENT_TOPICS = [AsyncWeb3.to_hex(topic) for topic in MANAGEMENT_EVENT_TOPICS]
+
+
+def handle_factory_log(log) -> None:
+    """Invalidates cached state for the employer named in a factory log and tells the registry the index is behind."""
+    event_name = FACTORY_EVENT_TOPICS[bytes(log['topics'][0])]
+    event = getattr(rika_factory.events, event_name)().process_log(log)
+    employer = event['args']['employer']
+    payroll_contract_cache.invalidate(employer)
+    view_cache.invalidate_employer(employer)
+    payroll_registry.note_change(employer, log['blockNumber'])
+    logger.info(f"{event_name} for employer {employer}: {event['args']['payrollContract']}")
+
+
+def handle_management_log(log) -> None:
+    """Invalidates cached views for the employer named in a RikaManagement log."""
+    employer = AsyncWeb3.to_checksum_address(log['topics'][1][-20:])
+    view_cache.invalidate_employer(employer)
+
+
+def handle_log(log) -> None:
+    topic = bytes(log['topics'][0]) if log['topics'] else None
+    if topic in FACTORY_EVENT_TOPICS and log['address'].lower() == rika_factory.address.lower():
+        handle_factory_log(log)
+    elif topic in MANAGEMENT_EVENT_TOPICS and len(log['topics']) > 1:
+        handle_management_log(log)
+
+
+async def get_contract_logs(from_block: int, to_block: int, clones: Set[str]) -> List[Any]:
+    """Fetches the factory's logs, then those of every known payroll contract, in block order.
+
+    Only the factory and the clones it created are asked for, so another contract
+    emitting the same events cannot reach the caches or the mirror. Clones announced
+    in the range are added to clones before their own logs are fetched.
+    """
+    factory_logs = await w3.eth.get_logs({
+        'fromBlock': from_block,
+        'toBlock': to_block,
+        'address': rika_factory.address,
+        'topics': [FACTORY_TOPICS]
+    })
+    for log in factory_logs:
+        clones.add(AsyncWeb3.to_checksum_address(log['topics'][2][-20:]))
+    addresses = sorted(clones)
+    groups = await asyncio.gather(*(
+        w3.eth.get_logs({
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'address': addresses[i:i + EVENT_MAX_ADDRESSES],
+            'topics': [MANAGEMENT_TOPICS]
+        })
+        for i in range(0, len(addresses), EVENT_MAX_ADDRESSES)
+    ))
+    logs = list(factory_logs) + [log for group in groups for log in group]
+    return sorted(logs, key=lambda log: (log['blockNumber'], log['logIndex']))
+
+
+async def load_clones() -> Tuple[Set[str], int]:
+    """Returns every payroll contract created up to the head, and the head.
+
+    The clones come from the payroll registry's event index, and those created in
+    the blocks the index has not reached yet from the factory's logs, so the clone
+    list is never read from the factory contract. Raises while the index is more
+    than INDEXER_MAX_CHUNK blocks behind, rather than scanning the factory's history.
+    """
+    synced = await payroll_registry.sync()
+    latest = await w3.eth.block_number
+    if latest - synced > INDEXER_MAX_CHUNK:
+        raise Exception(f"The event indexer is {latest - synced} blocks behind the head")
+    registry = await asyncio.to_thread(payroll_registry.get_all_contracts)
+    clones = {contract for contracts in registry.values() for contract in contracts}
+    if latest > synced:
+        for log in await w3.eth.get_logs({
+            'fromBlock': synced + 1,
+            'toBlock': latest,
+            'address': rika_factory.address,
+            'topics': [FACTORY_TOPICS]
+        }):
+            clones.add(AsyncWeb3.to_checksum_address(log['topics'][2][-20:]))
+    return clones, latest
+
+
+async def canonical_hash(block_number: int) -> Optional[bytes]:
+    """Hash of the canonical block at block_number, or None if the chain is no longer that long."""
+    try:
+        return (await w3.eth.get_block(block_number))['hash']
+    except BlockNotFound:
+        return None
+
+
+async def find_fork(heads: "OrderedDict[int, bytes]") -> Optional[int]:
+    """Highest remembered head still on the canonical chain, or None if a reorg went deeper than all of them."""
+    hashes = await asyncio.gather(*(canonical_hash(number) for number in heads))
+    for (number, block_hash), canonical in reversed(list(zip(heads.items(), hashes))):
+        if canonical == block_hash:
+            return number
+    return None
+
+
+async def handle_reorg(heads: "OrderedDict[int, bytes]", latest: int) -> int:
+    """Rewinds the mirror to the fork point and returns the block to fetch logs from again."""
+    fork = await find_fork(heads)
+    for number in [number for number in heads if fork is None or number > fork]:
+        del heads[number]
+    # Cached reads may come from the orphaned blocks, whose logs are not replayed
+    view_cache.clear()
+    payroll_contract_cache.clear()
+    await payroll_mirror.rewind(fork, latest)
+    return (latest if fork is None else fork) + 1
+
+
+async def watch_contract_events() -> None:
+    """Polls factory and payroll contract logs, invalidating caches, updating the mirror and advancing the view cache head.
+
+    The hash of every polled head is remembered for MIRROR_REORG_DEPTH blocks. When
+    the last one is no longer canonical, the mirror is rewound to the fork point and
+    the replacement blocks' logs are fetched again.
+    """
+    from_block = None
+    clones: Optional[Set[str]] = None
+    heads: "OrderedDict[int, bytes]" = OrderedDict()
+    while True:
+        try:
+            if clones is None:
+                clones, seeded = await load_clones()
+                # Clones created after the seeding head are picked up from the factory logs polled next
+                from_block = seeded + 1
+                payroll_registry.watch(from_block)
+            head = await w3.eth.get_block('latest')
+            latest = head['number']
+            if heads:
+                last, last_hash = next(reversed(heads.items()))
+                if (head['hash'] if last == latest else await canonical_hash(last)) != last_hash:
+                    from_block = await handle_reorg(heads, latest)
+            logs = []
+            if latest >= from_block:
+                logs = await get_contract_logs(from_block, latest, clones)
+                for log in logs:
+                    handle_log(log)
+                from_block = latest + 1
+            await payroll_mirror.apply_logs(
+                [log for log in logs if bytes(log['topics'][0]) in MANAGEMENT_EVENT_TOPICS], latest
+            )
+            view_cache.on_new_head(latest)
+            heads[latest] = head['hash']
+            while heads and next(iter(heads)) <= latest - MIRROR_REORG_DEPTH:
+                heads.popitem(last=False)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error polling contract events: {e}")
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
@@ -0,0 +1,76 @@
+import time
+import asyncio
+import logging
+from statistics import median
+from typing import Any, Dict, Optional
+from app.settings import (
+    FEE_REFRESH_INTERVAL, FEE_MAX_AGE, FEE_HISTORY_BLOCKS, FEE_REWARD_PERCENTILE, FEE_BASE_FEE_MULTIPLIER
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FeeOracle:
+    """Serves cached fee parameters, refreshed from eth_feeHistory in the background.
+
+    Chains without EIP-1559 data fall back to eth_gasPrice. Callers read the cached
+    value and only hit the node themselves when it is older than max_age, which is
+    the case in processes that do not run the refresh loop.
+    """
+
+    def __init__(self, w3, refresh_interval: float = FEE_REFRESH_INTERVAL, max_age: float = FEE_MAX_AGE):
+        self.w3 = w3
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.max_fee_per_gas: Optional[int] = None
+        self.max_priority_fee_per_gas: Optional[int] = None
+        self.gas_price: Optional[int] = None
+        self.updated_at: Optional[float] = None
+
+    async def _refresh_eip1559(self) -> bool:
+        history = await self.w3.eth.fee_history(FEE_HISTORY_BLOCKS, 'latest', [FEE_REWARD_PERCENTILE])
+        # The last entry is the base fee of the next block
+        base_fee = history['baseFeePerGas'][-1] if history.get('baseFeePerGas') else 0
+        if not base_fee:
+            return False
+        rewards = [reward[0] for reward in history.get('reward') or [] if reward]
+        priority_fee = int(median(rewards)) if rewards else await self.w3.eth.max_priority_fee
+        self.max_priority_fee_per_gas = priority_fee
+        self.max_fee_per_gas = int(base_fee * FEE_BASE_FEE_MULTIPLIER) + priority_fee
+        self.gas_price = None
+        return True
+
+    async def refresh(self) -> None:
+        """Reloads fees from the node."""
+        try:
+            supported = await self._refresh_eip1559()
+        except Exception as e:
+            logger.warning(f"eth_feeHistory unavailable, using legacy gas price: {e}")
+            supported = False
+        if not supported:
+            self.gas_price = await self.w3.eth.gas_price
+            self.max_fee_per_gas = None
+            self.max_priority_fee_per_gas = None
+        self.updated_at = time.monotonic()
+
+    async def run(self) -> None:
+        """Refreshes fees every refresh_interval seconds until cancelled."""
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error refreshing fees: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def get_fee_params(self) -> Dict[str, Any]:
+        """Returns maxFeePerGas/maxPriorityFeePerGas, or gasPrice on legacy chains."""
+        if self.updated_at is None or time.monotonic() - self.updated_at > self.max_age:
+            await self.refresh()
+        if self.max_fee_per_gas is not None:
+            return {
+                'maxFeePerGas': self.max_fee_per_gas,
+                'maxPriorityFeePerGas': self.max_priority_fee_per_gas
+            }
+        return {'gasPrice': self.gas_price}
@@ -0,0 +1,79 @@
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional, Tuple
+from app.settings import GAS_MODEL_MIN_SAMPLES, GAS_MODEL_WINDOW, GAS_MODEL_HEADROOM, GAS_MODEL_MAX_SPREAD
+
+
+class GasModel:
+    """Predicts gas limits from the gasUsed of mined transactions.
+
+    Samples are kept per (function, shape), where shape is whatever drives the
+    cost, such as a batch length. A prediction
+    is only made when the samples agree within max_spread. Integer shapes that
+    have no samples of their own are predicted by a linear fit over the function's
+    other shapes. Otherwise predict() returns None and the caller should fall back
+    to eth_estimateGas.
+    """
+
+    def __init__(self, min_samples: int = GAS_MODEL_MIN_SAMPLES, window: int = GAS_MODEL_WINDOW,
+                 headroom: float = GAS_MODEL_HEADROOM, max_spread: float = GAS_MODEL_MAX_SPREAD):
+        self.min_samples = min_samples
+        self.window = window
+        self.headroom = headroom
+        self.max_spread = max_spread
+        self._samples: Dict[Tuple[str, Hashable], Deque[int]] = {}
+        self.predictions = 0
+        self.fallbacks = 0
+
+    def record(self, function_name: str, shape: Hashable, gas_used: int) -> None:
+        """Adds the gasUsed of a mined transaction."""
+        key = (function_name, shape)
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=self.window)
+        self._samples[key].append(gas_used)
+
+    def _from_bucket(self, samples: Deque[int]) -> Optional[int]:
+        if len(samples) < self.min_samples:
+            return None
+        high = max(samples)
+        if (high - min(samples)) / high > self.max_spread:
+            return None
+        return high
+
+    def _from_fit(self, function_name: str, shape: int) -> Optional[int]:
+        points: List[Tuple[int, int]] = [
+            (key[1], used)
+            for key, samples in self._samples.items()
+            if key[0] == function_name and isinstance(key[1], int)
+            for used in samples
+        ]
+        if len(points) < self.min_samples or len({x for x, _ in points}) < 2:
+            return None
+
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, _ in points)
+        intercept = mean_y - slope * mean_x
+        if any(abs(y - (intercept + slope * x)) / y > self.max_spread for x, y in points):
+            return None
+        return int(intercept + slope * shape)
+
+    def predict(self, function_name: str, shape: Hashable = 0) -> Optional[int]:
+        """Returns a gas limit, or None when the model is not confident."""
+        gas = None
+        samples = self._samples.get((function_name, shape))
+        if samples:
+            gas = self._from_bucket(samples)
+        elif isinstance(shape, int):
+            gas = self._from_fit(function_name, shape)
+
+        if gas is None or gas <= 0:
+            self.fallbacks += 1
+            return None
+        self.predictions += 1
+        return int(gas * self.headroom)
+
+    def best_effort(self, function_name: str, shape: Hashable = 0) -> Optional[int]:
+        """Returns the largest gasUsed seen for this shape, trusted or not."""
+        samples = self._samples.get((function_name, shape))
+        return int(max(samples) * self.headroom) if samples else None
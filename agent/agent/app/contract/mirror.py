@@ -0,0 +1,487 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from eth_utils import event_abi_to_log_topic
+from web3 import AsyncWeb3
+from app.contract.multicall import ViewCall, aggregate_view_calls
+from app.settings import MIRROR_MAX_CONTRACTS, MIRROR_BATCH_SIZE, MIRROR_TRACK_CONCURRENCY, MIRROR_REORG_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds per RikaManagement.Interval, as in getIntervalDuration
+INTERVAL_DURATIONS = {0: 7 * 24 * 3600, 1: 14 * 24 * 3600, 2: 30 * 24 * 3600}
+
+EMPTY_EMPLOYEE = ("0x0000000000000000000000000000000000000000", "", 0, 0, False)
+
+# Events that add employees, and those naming a list of employees in their data
+ADDED_EVENTS = {"EmployeeAdded", "EmployeesAddedBatch"}
+BATCH_EVENTS = {"EmployeesAddedBatch", "SalariesUpdatedBatch"}
+# Events that move the employer balance, and in which direction
+BALANCE_EVENTS = {"FundsAdded": 1, "FundsWithdrawn": -1, "SalaryPaid": -1}
+
+
+def next_payment_date(schedule: Tuple) -> int:
+    """lastProcessedDate plus the schedule's interval."""
+    return schedule[4] + INTERVAL_DURATIONS[schedule[3]]
+
+
+def liability_of(employee: Optional[Tuple]) -> int:
+    """An employee's share of getTotalPayrollLiability."""
+    return employee[2] if employee and employee[4] else 0
+
+
+class MirrorState:
+    """Employees and schedules of one employer on one RikaManagement clone, as of block.
+
+    Balance and liability are running totals: the balance moves with fund and
+    salary events, and the liability with every change to an employee record.
+    """
+
+    def __init__(self, block: int, balance: int = 0):
+        self.block = block
+        self.balance = balance
+        self.liability = 0
+        # employee -> (employeeAddress, name, salary, joiningDate, isActive), in getEmployeeList order
+        self.employees: "OrderedDict[str, Tuple]" = OrderedDict()
+        # employee -> [(scheduleId, startDate, endDate, interval, lastProcessedDate, isProcessed, isActive)]
+        self.schedules: Dict[str, List[Tuple]] = {}
+        self.dirty: Set[str] = set()
+        # Recent blocks whose logs were applied, undone by re-reading the pair if they are orphaned
+        self.log_blocks: Set[int] = set()
+
+    def set_employee(self, employee_address: str, details: Tuple, schedules: List[Tuple]) -> None:
+        key = employee_address.lower()
+        self.liability += liability_of(details) - liability_of(self.employees.get(key))
+        self.employees[key] = details
+        self.schedules[key] = schedules
+
+    def recount_liability(self) -> None:
+        self.liability = sum(liability_of(employee) for employee in self.employees.values())
+
+    def is_underfunded(self) -> bool:
+        return self.balance < self.liability
+
+    def next_due(self) -> Optional[int]:
+        """Earliest time processAllPayrolls would pay someone, or None if nobody is scheduled."""
+        dates = [
+            next_payment_date(schedule)
+            for employee, schedules in self.schedules.items() if liability_of(self.employees.get(employee))
+            for schedule in schedules if schedule[6]
+        ]
+        return min(dates, default=None)
+
+    def due_payout(self, timestamp: int) -> int:
+        """What processAllPayrolls would pay at timestamp: one salary per due active schedule of an active employee."""
+        return sum(
+            self.employees[employee][2]
+            for employee, schedules in self.schedules.items() if liability_of(self.employees.get(employee))
+            for schedule in schedules if schedule[6] and next_payment_date(schedule) <= timestamp
+        )
+
+    def all_employees(self) -> List[Tuple]:
+        return list(self.employees.values())
+
+    def employee(self, employee_address: str) -> Tuple:
+        return self.employees.get(employee_address.lower(), EMPTY_EMPLOYEE)
+
+    def total_liability(self) -> int:
+        return self.liability
+
+    def next_payroll_date(self, employee_address: str) -> int:
+        """Latest next payment date over the employee's active schedules, as getNextPayrollDate."""
+        dates = [next_payment_date(s) for s in self.schedules.get(employee_address.lower(), []) if s[6]]
+        return max(dates, default=0)
+
+
+class PayrollMirror:
+    """In-memory mirror of employee and schedule state for RikaManagement clones.
+
+    A (contract, employer) pair is bootstrapped on first use from getEmployeeList,
+    getEmployee and getSchedules, read through Multicall3 at the event watcher's
+    head. From then on the watcher passes every RikaManagement log to apply_logs,
+    and only the employees those logs name are re-read, pinned to the new head.
+    Reads are answered from memory; they are as fresh as the watcher, and report
+    how many blocks a pair is behind when a refresh has failed.
+
+    Every pair also carries its balance and liability as running totals, and the
+    underfunded pairs are kept in a set, so a funding check is a lookup. Since the
+    watcher follows the unconfirmed head, a reorg is handed to rewind(), which
+    re-reads every pair that had logs in the orphaned blocks; reconcile() also
+    periodically compares the totals with getEmployerBalance and
+    getTotalPayrollLiability and repairs drift.
+    """
+
+    def __init__(self, w3, multicall, contracts, max_contracts: int = MIRROR_MAX_CONTRACTS):
+        self.w3 = w3
+        self.multicall = multicall
+        self.contracts = contracts
+        self.max_contracts = max_contracts
+        self.head: Optional[int] = None
+        self._states: "OrderedDict[Tuple[str, str], MirrorState]" = OrderedDict()
+        # Logs seen for pairs whose bootstrap is in flight, replayed once it lands
+        self._bootstrapping: Dict[Tuple[str, str], List[Any]] = {}
+        self._topics: Dict[bytes, str] = {}
+        self._underfunded: Set[Tuple[str, str]] = set()
+        # Called with (key, state) whenever a pair's employees, schedules or totals change
+        self.listeners: List[Callable[[Tuple[str, str], MirrorState], None]] = []
+        # Called with the key of every pair evicted to stay within max_contracts
+        self.eviction_listeners: List[Callable[[Tuple[str, str]], None]] = []
+        self._loop = None
+        self._lock_instance: Optional[asyncio.Lock] = None
+        self.bootstraps = 0
+        self.refreshes = 0
+        self.reconciliations = 0
+        self.drift = 0
+        self.rewinds = 0
+
+    def _lock(self) -> asyncio.Lock:
+        # Locks are bound to the loop that created them; Celery runs a fresh loop per task
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._lock_instance = asyncio.Lock()
+        return self._lock_instance
+
+    @staticmethod
+    def _key(contract_address: str, employer_address: str) -> Tuple[str, str]:
+        return contract_address.lower(), employer_address.lower()
+
+    def _event_name(self, contract, log) -> Optional[str]:
+        if not self._topics:
+            self._topics = {
+                event_abi_to_log_topic(entry): entry['name'] for entry in contract.abi if entry.get('type') == 'event'
+            }
+        return self._topics.get(bytes(log['topics'][0])) if log['topics'] else None
+
+    def _apply_log(self, state: MirrorState, log) -> None:
+        """Marks the employees a log names for refresh, appending any new ones in order."""
+        contract = self.contracts.get(log['address'])
+        name = self._event_name(contract, log)
+        if name is None or len(log['topics']) < 2:
+            return
+        state.log_blocks.add(log['blockNumber'])
+        # Logs at or below state.block are already part of the state (bootstrap replay)
+        if name in BALANCE_EVENTS and log['blockNumber'] > state.block:
+            amount = getattr(contract.events, name)().process_log(log)['args']['amount']
+            state.balance += BALANCE_EVENTS[name] * amount
+        if name in BATCH_EVENTS:
+            employees = getattr(contract.events, name)().process_log(log)['args']['employeeAddresses']
+        elif len(log['topics']) > 2:
+            employees = [AsyncWeb3.to_checksum_address(log['topics'][2][-20:])]
+        else:
+            return
+        for employee in employees:
+            key = employee.lower()
+            if name in ADDED_EVENTS and key not in state.employees:
+                state.employees[key] = EMPTY_EMPLOYEE
+            state.dirty.add(key)
+
+    async def _read_employees(self, contract, employer_address: str, employees: List[str],
+                              block_number: int) -> Dict[str, Tuple[Tuple, List[Tuple]]]:
+        """Reads getEmployee and getSchedules for employees at block_number."""
+        employees = [AsyncWeb3.to_checksum_address(employee) for employee in employees]
+        batches = [employees[i:i + MIRROR_BATCH_SIZE] for i in range(0, len(employees), MIRROR_BATCH_SIZE)]
+        aggregated = await asyncio.gather(*(
+            aggregate_view_calls(self.w3, self.multicall, [
+                call for employee in batch for call in (
+                    ViewCall(contract, 'getEmployee', (employer_address, employee)),
+                    ViewCall(contract, 'getSchedules', (employer_address, employee)),
+                )
+            ], block_identifier=block_number)
+            for batch in batches
+        ))
+
+        results = {}
+        for batch, result in zip(batches, aggregated):
+            pairs = result["results"]
+            for index, employee in enumerate(batch):
+                (employee_ok, details), (schedules_ok, schedules) = pairs[2 * index], pairs[2 * index + 1]
+                if not (employee_ok and schedules_ok):
+                    raise Exception(f"Mirror read failed for employee {employee}")
+                results[employee.lower()] = (tuple(details), [tuple(schedule) for schedule in schedules])
+        return results
+
+    async def _refresh(self, key: Tuple[str, str], state: MirrorState, block_number: int) -> None:
+        if state.dirty:
+            dirty = list(state.dirty)
+            contract = self.contracts.get(AsyncWeb3.to_checksum_address(key[0]))
+            employer = AsyncWeb3.to_checksum_address(key[1])
+            for employee, (details, schedules) in (await self._read_employees(contract, employer, dirty, block_number)).items():
+                state.set_employee(employee, details, schedules)
+            state.dirty.difference_update(dirty)
+            self.refreshes += 1
+        state.block = block_number
+
+    async def apply_logs(self, logs: Iterable[Any], block_number: int) -> None:
+        """Applies the RikaManagement logs up to block_number to every mirrored pair."""
+        async with self._lock():
+            changed = set()
+            for log in logs:
+                if len(log['topics']) < 2:
+                    continue
+                key = self._key(log['address'], AsyncWeb3.to_checksum_address(log['topics'][1][-20:]))
+                if key in self._bootstrapping:
+                    self._bootstrapping[key].append(log)
+                elif key in self._states:
+                    self._apply_log(self._states[key], log)
+                    changed.add(key)
+
+            self.head = block_number
+            for key, state in self._states.items():
+                if state.dirty:
+                    try:
+                        await self._refresh(key, state, block_number)
+                        changed.add(key)
+                    except Exception as e:
+                        # Stays dirty and behind; the next head retries it
+                        logger.error(f"Error refreshing mirror for {key}: {e}")
+                else:
+                    state.block = block_number
+                state.log_blocks = {number for number in state.log_blocks if number > block_number - MIRROR_REORG_DEPTH}
+                if key in changed:
+                    self._on_change(key, state)
+
+    async def rewind(self, block_number: Optional[int], head: int) -> List[Tuple[str, str]]:
+        """Undoes the blocks above block_number, orphaned by a reorg; None means the fork point is unknown.
+
+        Pairs with logs in the orphaned blocks are re-read at head, and dropped if that
+        fails so their next use bootstraps them again. The others had nothing orphaned
+        and are moved back to block_number, so the replacement logs the watcher fetches
+        next are applied to them. Returns the pairs that were re-read or dropped.
+        """
+        async with self._lock():
+            affected = []
+            for key, state in self._states.items():
+                if block_number is None or any(number > block_number for number in state.log_blocks):
+                    affected.append(key)
+                else:
+                    state.block = min(state.block, block_number)
+
+            semaphore = asyncio.Semaphore(MIRROR_TRACK_CONCURRENCY)
+
+            async def reread(key: Tuple[str, str]) -> MirrorState:
+                contract = self.contracts.get(AsyncWeb3.to_checksum_address(key[0]))
+                async with semaphore:
+                    return await self.read_state(contract, AsyncWeb3.to_checksum_address(key[1]), head)
+
+            states = await asyncio.gather(*(reread(key) for key in affected), return_exceptions=True)
+            for key, state in zip(affected, states):
+                if isinstance(state, Exception):
+                    logger.error(f"Error re-reading mirror for {key} after reorg, dropping it: {state}")
+                    self._states.pop(key, None)
+                    self._underfunded.discard(key)
+                    for listener in self.eviction_listeners:
+                        listener(key)
+                    continue
+                self._states[key] = state
+                self._on_change(key, state)
+
+            self.head = head
+            self.rewinds += 1
+            logger.warning(f"Reorg above block {block_number}, re-read {len(affected)} mirrored payroll contracts at {head}")
+            return affected
+
+    def _on_change(self, key: Tuple[str, str], state: MirrorState) -> None:
+        if state.is_underfunded():
+            self._underfunded.add(key)
+        else:
+            self._underfunded.discard(key)
+        for listener in self.listeners:
+            listener(key, state)
+
+    async def read_state(self, contract, employer_address: str, block_number: int) -> MirrorState:
+        """Reads the pair's balance, employees and schedules at block_number, without mirroring it."""
+        aggregated = await aggregate_view_calls(self.w3, self.multicall, [
+            ViewCall(contract, 'getEmployeeList', (employer_address,)),
+            ViewCall(contract, 'getEmployerBalance', (employer_address,)),
+        ], block_identifier=block_number)
+        (list_ok, employees), (balance_ok, balance) = aggregated["results"]
+        if not (list_ok and balance_ok):
+            raise Exception(f"Mirror read failed for {contract.address}")
+        state = MirrorState(block_number, balance)
+        for employee, (details, schedules) in (
+            await self._read_employees(contract, employer_address, employees, block_number)
+        ).items():
+            state.set_employee(employee, details, schedules)
+        return state
+
+    async def bootstrap(self, contract, employer_address: str) -> MirrorState:
+        """Loads every employee and schedule of the pair at the current head."""
+        key = self._key(contract.address, employer_address)
+        self._bootstrapping.setdefault(key, [])
+        try:
+            block_number = self.head
+            state = await self.read_state(contract, employer_address, block_number)
+
+            async with self._lock():
+                if key in self._states:
+                    # A concurrent bootstrap of the same pair landed first
+                    return self._states[key]
+                # Catch up with logs the watcher applied while we were reading
+                for log in self._bootstrapping.pop(key, []):
+                    self._apply_log(state, log)
+                if state.dirty or self.head != block_number:
+                    await self._refresh(key, state, self.head)
+                self._states[key] = state
+                self._on_change(key, state)
+                while len(self._states) > self.max_contracts:
+                    evicted, _ = self._states.popitem(last=False)
+                    self._underfunded.discard(evicted)
+                    logger.warning(f"Mirror is full ({self.max_contracts} contracts), evicted {evicted}")
+                    for listener in self.eviction_listeners:
+                        listener(evicted)
+                self.bootstraps += 1
+            return state
+        finally:
+            self._bootstrapping.pop(key, None)
+
+    async def track(self, pairs: Iterable[Tuple[Any, str]]) -> int:
+        """Bootstraps every (contract, employer) pair that is not mirrored yet; returns how many were added."""
+        semaphore = asyncio.Semaphore(MIRROR_TRACK_CONCURRENCY)
+
+        async def bootstrap(contract, employer_address: str) -> bool:
+            async with semaphore:
+                try:
+                    await self.bootstrap(contract, employer_address)
+                    return True
+                except Exception as e:
+                    logger.error(f"Error mirroring {contract.address} for {employer_address}: {e}")
+                    return False
+
+        pending = [
+            (contract, employer) for contract, employer in pairs
+            if self._key(contract.address, employer) not in self._states
+        ]
+        return sum(await asyncio.gather(*(bootstrap(contract, employer) for contract, employer in pending)))
+
+    async def read_untracked(self, pairs: Iterable[Tuple[Any, str]]) -> List[Tuple[Tuple[str, str], MirrorState]]:
+        """Reads every (contract, employer) pair that is not mirrored at the head, without mirroring it.
+
+        Returns (key, state) for the pairs read, leaving out those that failed or were
+        mirrored meanwhile, since the mirror reports those itself.
+        """
+        semaphore = asyncio.Semaphore(MIRROR_TRACK_CONCURRENCY)
+        block_number = self.head
+
+        async def read(contract, employer_address: str) -> Optional[MirrorState]:
+            async with semaphore:
+                try:
+                    return await self.read_state(contract, employer_address, block_number)
+                except Exception as e:
+                    logger.error(f"Error reading {contract.address} for {employer_address}: {e}")
+                    return None
+
+        pending = [
+            (contract, employer) for contract, employer in pairs
+            if self._key(contract.address, employer) not in self._states
+        ]
+        states = await asyncio.gather(*(read(contract, employer) for contract, employer in pending))
+        results = []
+        for (contract, employer), state in zip(pending, states):
+            key = self._key(contract.address, employer)
+            if state is not None and key not in self._states:
+                results.append((key, state))
+        return results
+
+    async def reconcile(self) -> List[Dict[str, Any]]:
+        """Checks every pair's balance and liability against the chain at the head, repairing drift.
+
+        Returns the pairs that had drifted, with the tracked and on-chain values.
+        """
+        async with self._lock():
+            block_number = self.head
+            keys = [key for key, state in self._states.items() if state.block == block_number]
+            contracts = {key: self.contracts.get(AsyncWeb3.to_checksum_address(key[0])) for key in keys}
+            batches = [keys[i:i + MIRROR_BATCH_SIZE] for i in range(0, len(keys), MIRROR_BATCH_SIZE)]
+            aggregated = await asyncio.gather(*(
+                aggregate_view_calls(self.w3, self.multicall, [
+                    call for key in batch for call in (
+                        ViewCall(contracts[key], 'getEmployerBalance', (AsyncWeb3.to_checksum_address(key[1]),)),
+                        ViewCall(contracts[key], 'getTotalPayrollLiability', (AsyncWeb3.to_checksum_address(key[1]),)),
+                    )
+                ], block_identifier=block_number)
+                for batch in batches
+            ))
+
+            drifted = []
+            for batch, result in zip(batches, aggregated):
+                pairs = result["results"]
+                for index, key in enumerate(batch):
+                    (balance_ok, balance), (liability_ok, liability) = pairs[2 * index], pairs[2 * index + 1]
+                    state = self._states.get(key)
+                    if state is None or not (balance_ok and liability_ok):
+                        continue
+                    if state.balance == balance and state.liability == liability:
+                        continue
+                    drifted.append({
+                        "contract_address": key[0], "employer_address": key[1],
+                        "tracked_balance": state.balance, "balance": balance,
+                        "tracked_liability": state.liability, "liability": liability,
+                    })
+                    state.balance = balance
+                    if state.liability != liability:
+                        # Re-read every employee rather than trusting the running total
+                        state.dirty.update(state.employees)
+                        await self._refresh(key, state, block_number)
+                        state.recount_liability()
+                    self._on_change(key, state)
+
+            self.reconciliations += 1
+            self.drift += len(drifted)
+            if drifted:
+                logger.warning(f"Reconciled {len(drifted)} drifted payroll totals at block {block_number}")
+            return drifted
+
+    def is_underfunded(self, contract_address: str, employer_address: str) -> Optional[bool]:
+        """Whether the pair's balance is below its liability, or None if it is not mirrored."""
+        key = self._key(contract_address, employer_address)
+        if key not in self._states:
+            return None
+        return key in self._underfunded
+
+    def underfunded(self) -> List[Dict[str, Any]]:
+        """Every mirrored pair whose balance is below its liability."""
+        return [
+            {
+                "contract_address": contract, "employer_address": employer,
+                "balance": self._states[(contract, employer)].balance,
+                "liability": self._states[(contract, employer)].liability,
+            }
+            for contract, employer in self._underfunded
+        ]
+
+    def is_live(self, head: Optional[int]) -> bool:
+        """Whether the watcher is feeding the mirror; head is the view cache head, None when stale."""
+        return head is not None and self.head is not None
+
+    async def get(self, contract, employer_address: str) -> MirrorState:
+        """Returns the mirrored state of the pair, bootstrapping it on first use."""
+        key = self._key(contract.address, employer_address)
+        state = self._states.get(key)
+        if state is None:
+            return await self.bootstrap(contract, employer_address)
+        self._states.move_to_end(key)
+        return state
+
+    def states(self) -> List[Tuple[Tuple[str, str], MirrorState]]:
+        """Every mirrored (key, state) pair, least recently used first."""
+        return list(self._states.items())
+
+    def lag(self, state: MirrorState) -> int:
+        """Blocks the pair is behind the last head the watcher applied."""
+        return max(0, (self.head or state.block) - state.block)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "contracts": len(self._states),
+            "head": self.head,
+            "behind": sum(1 for state in self._states.values() if state.block != self.head),
+            "bootstraps": self.bootstraps,
+            "refreshes": self.refreshes,
+            "underfunded": len(self._underfunded),
+            "reconciliations": self.reconciliations,
+            "drift": self.drift,
+            "rewinds": self.rewinds,
+        }
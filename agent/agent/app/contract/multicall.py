@@ -0,0 +1,52 @@
+from typing import Any, Dict, List, NamedTuple, Tuple
+from eth_utils import get_abi_output_types
+from web3._utils.abi import map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+
+# Output types per (ABI, function), so repeated aggregations skip the ABI scan
+_output_types: Dict[Tuple[int, str], List[str]] = {}
+
+
+class ViewCall(NamedTuple):
+    """A view function to run inside a Multicall3 aggregation."""
+    contract: Any
+    function_name: str
+    args: Tuple = ()
+
+
+def _get_output_types(call: ViewCall) -> List[str]:
+    key = (id(call.contract.abi), call.function_name)
+    if key not in _output_types:
+        abi = next(
+            entry for entry in call.contract.abi
+            if entry.get('type') == 'function' and entry.get('name') == call.function_name
+        )
+        _output_types[key] = get_abi_output_types(abi)
+    return _output_types[key]
+
+
+async def aggregate_view_calls(w3, multicall, calls: List[ViewCall], block_identifier: Any = 'latest') -> Dict[str, Any]:
+    """Runs view calls through Multicall3.tryBlockAndAggregate in a single eth_call.
+
+    Every call sees the same block. Results come back as (success, value) pairs in
+    call order, decoded the way ContractFunction.call() would decode them.
+    """
+    payload = [
+        (call.contract.address, call.contract.encode_abi(call.function_name, args=list(call.args)))
+        for call in calls
+    ]
+    block_number, block_hash, raw_results = await multicall.functions.tryBlockAndAggregate(False, payload).call(
+        block_identifier=block_identifier
+    )
+
+    results = []
+    for call, (success, data) in zip(calls, raw_results):
+        if not success or not data:
+            results.append((False, None))
+            continue
+        output_types = _get_output_types(call)
+        # Checksum addresses and turn arrays into lists, as call() does
+        values = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, w3.codec.decode(output_types, data))
+        results.append((True, values[0] if len(values) == 1 else list(values)))
+
+    return {"block_number": block_number, "block_hash": block_hash, "results": results}
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class NonceManager:
+    """Hands out nonces locally for the senders whose transactions we sign.
+
+    Each managed sender is seeded once from the node's pending transaction count and
+    then served from memory. Reservations are serialised per sender, while different
+    senders proceed in parallel. Reserved nonces are tracked until confirmed, released
+    or dropped. A gap left by a released or dropped nonce triggers a resync, and the
+    missing nonces are handed out again before new ones.
+    """
+
+    def __init__(self, w3, managed_senders: Iterable[Optional[str]] = ()):
+        self.w3 = w3
+        self.managed = {sender.lower() for sender in managed_senders if sender}
+        self._next: Dict[str, int] = {}
+        self._pending: Dict[str, Dict[int, Optional[str]]] = {}
+        self._needs_resync: Dict[str, bool] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._loop = None
+        self.confirmed = 0
+        self.dropped = 0
+
+    def is_managed(self, sender: str) -> bool:
+        return sender.lower() in self.managed
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        # Locks are bound to the loop that created them; Celery runs a fresh loop per task
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._locks = {}
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    async def _resync(self, sender: str) -> None:
+        key = sender.lower()
+        chain_nonce = await self.w3.eth.get_transaction_count(sender, 'pending')
+        pending = self._pending.setdefault(key, {})
+        # Anything below the node's count has been mined or replaced
+        for nonce in [n for n in pending if n < chain_nonce]:
+            del pending[nonce]
+            self.confirmed += 1
+        self._next[key] = chain_nonce
+        self._needs_resync[key] = False
+        logger.info(f"Resynced nonce for {sender} at {chain_nonce}")
+
+    async def reserve(self, sender: str) -> int:
+        """Returns the next nonce for sender and marks it pending."""
+        key = sender.lower()
+        async with self._lock(key):
+            if key not in self._next or self._needs_resync.get(key):
+                await self._resync(sender)
+            pending = self._pending.setdefault(key, {})
+            nonce = self._next[key]
+            while nonce in pending:
+                nonce += 1
+            pending[nonce] = None
+            self._next[key] = nonce + 1
+            return nonce
+
+    async def resync(self, sender: str) -> None:
+        """Reloads the sender's nonce from the node."""
+        key = sender.lower()
+        async with self._lock(key):
+            await self._resync(sender)
+
+    def track(self, sender: str, nonce: int, tx_hash: str) -> None:
+        """Records the hash broadcast for a reserved nonce."""
+        self._pending.setdefault(sender.lower(), {})[nonce] = tx_hash
+
+    def confirm(self, sender: str, nonce: int) -> None:
+        """Marks a nonce as mined."""
+        if self._pending.get(sender.lower(), {}).pop(nonce, False) is not False:
+            self.confirmed += 1
+
+    def release(self, sender: str, nonce: int) -> None:
+        """Returns a reserved nonce that was never broadcast."""
+        key = sender.lower()
+        pending = self._pending.get(key, {})
+        if pending.pop(nonce, False) is False:
+            return
+        if self._next.get(key) == nonce + 1:
+            self._next[key] = nonce
+        else:
+            self._needs_resync[key] = True
+
+    def drop(self, sender: str, nonce: int) -> None:
+        """Marks a broadcast transaction as dropped so its nonce is reissued."""
+        key = sender.lower()
+        if self._pending.get(key, {}).pop(nonce, False) is not False:
+            self.dropped += 1
+        self._needs_resync[key] = True
+
+    def status(self, sender: str) -> Dict[str, Any]:
+        key = sender.lower()
+        return {
+            "next_nonce": self._next.get(key),
+            "pending": dict(self._pending.get(key, {})),
+            "needs_resync": self._needs_resync.get(key, False)
+        }
@@ -0,0 +1,137 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from eth_utils import function_abi_to_4byte_selector, keccak
+from web3 import AsyncWeb3
+from app.contract.multicall import ViewCall, aggregate_view_calls
+from app.settings import PREFLIGHT_CONCURRENCY, PREFLIGHT_BATCH_SIZE
+
+
+AI_AGENT_ROLE = keccak(text="AI_AGENT_ROLE")
+
+# Skip reasons
+PAUSED = "paused"
+MISSING_AGENT_ROLE = "missing_agent_role"
+REVERTED = "reverted"
+NOTHING_DUE = "nothing_due"
+CHECK_FAILED = "check_failed"
+# processAllPayrolls pays the sender's own employees, so only the employer can pay theirs
+SENDER_NOT_EMPLOYER = "sender_not_employer"
+
+_error_selectors: Dict[int, Dict[str, str]] = {}
+
+
+def revert_reason(error: Exception, abi: List[Dict[str, Any]]) -> str:
+    """Names the custom error behind a revert, falling back to the node's message."""
+    key = id(abi)
+    if key not in _error_selectors:
+        _error_selectors[key] = {
+            AsyncWeb3.to_hex(function_abi_to_4byte_selector(entry)): entry['name']
+            for entry in abi if entry.get('type') == 'error'
+        }
+    data = getattr(error, 'data', None)
+    if isinstance(data, str) and len(data) >= 10:
+        name = _error_selectors[key].get(data[:10].lower())
+        if name:
+            return name
+    return str(error)
+
+
+async def check_contracts(w3, multicall, contracts: List[Any], agent_address: str,
+                          block_number: int) -> List[Tuple[Optional[bool], Optional[bool]]]:
+    """Returns (paused, agent has AI_AGENT_ROLE) per contract, with None where a check reverted."""
+    batches = [contracts[i:i + PREFLIGHT_BATCH_SIZE] for i in range(0, len(contracts), PREFLIGHT_BATCH_SIZE)]
+    aggregated = await asyncio.gather(*(
+        aggregate_view_calls(w3, multicall, [
+            call for contract in batch for call in (
+                ViewCall(contract, 'paused'),
+                ViewCall(contract, 'hasRole', (AI_AGENT_ROLE, agent_address)),
+            )
+        ], block_identifier=block_number)
+        for batch in batches
+    ))
+    checks = []
+    for batch, result in zip(batches, aggregated):
+        results = result["results"]
+        for index in range(len(batch)):
+            (paused_ok, paused), (role_ok, has_role) = results[2 * index], results[2 * index + 1]
+            checks.append((paused if paused_ok else None, has_role if role_ok else None))
+    return checks
+
+
+async def preflight_payrolls(w3, multicall, candidates: List[Tuple[str, Any]], agent_address: str,
+                             read_state, block: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Finds which payroll contracts a processAllPayrolls from the agent would actually pay out on.
+
+    candidates are (employer, contract) pairs, and read_state(contract, employer,
+    block_number) returns the pair's MirrorState. processAllPayrolls pays
+    employerEmployees[msg.sender], so a call from the agent wallet only ever pays
+    the agent's own employees: pairs whose employer is not the agent are skipped as
+    SENDER_NOT_EMPLOYER rather than simulated, since the simulation and the due
+    payout would describe different employers. The pause and AI_AGENT_ROLE
+    checks for every other contract share Multicall3 aggregations; the survivors
+    are simulated with eth_call from the agent, concurrently, and their due payout
+    is worked out from their schedules. Everything is read at one block.
+    """
+    block = block or await w3.eth.get_block('latest')
+    block_number, timestamp = block['number'], block['timestamp']
+    ready: List[Dict[str, Any]] = []
+    skipped: List[Dict[str, Any]] = []
+
+    def skip(employer: str, contract, reason: str, detail: Optional[str] = None) -> None:
+        skipped.append({
+            "employer_address": employer, "contract_address": contract.address,
+            "reason": reason, "detail": detail
+        })
+
+    payable = []
+    for employer, contract in candidates:
+        if employer.lower() != agent_address.lower():
+            skip(employer, contract, SENDER_NOT_EMPLOYER,
+                 f"processAllPayrolls from {agent_address} pays its own employees, not {employer}'s")
+        else:
+            payable.append((employer, contract))
+
+    checks = await check_contracts(w3, multicall, [contract for _, contract in payable], agent_address, block_number)
+    simulate = []
+    for (employer, contract), (paused, has_role) in zip(payable, checks):
+        if paused is None or has_role is None:
+            skip(employer, contract, CHECK_FAILED, "paused() or hasRole() reverted")
+        elif paused:
+            skip(employer, contract, PAUSED)
+        elif not has_role:
+            skip(employer, contract, MISSING_AGENT_ROLE)
+        else:
+            simulate.append((employer, contract))
+
+    semaphore = asyncio.Semaphore(PREFLIGHT_CONCURRENCY)
+
+    async def run(employer: str, contract) -> None:
+        async with semaphore:
+            try:
+                await contract.functions.processAllPayrolls().call({'from': agent_address}, block_identifier=block_number)
+            except Exception as e:
+                skip(employer, contract, REVERTED, revert_reason(e, contract.abi))
+                return
+            try:
+                state = await read_state(contract, employer, block_number)
+            except Exception as e:
+                skip(employer, contract, CHECK_FAILED, str(e))
+                return
+            payout = state.due_payout(timestamp)
+            if not payout:
+                skip(employer, contract, NOTHING_DUE)
+                return
+            ready.append({"employer_address": employer, "contract_address": contract.address, "payout": payout})
+
+    await asyncio.gather(*(run(employer, contract) for employer, contract in simulate))
+
+    reasons: Dict[str, int] = {}
+    for entry in skipped:
+        reasons[entry["reason"]] = reasons.get(entry["reason"], 0) + 1
+    return {
+        "block_number": block_number,
+        "ready": ready,
+        "skipped": skipped,
+        "skipped_by_reason": reasons,
+        "message": f"{len(ready)} of {len(candidates)} payroll contracts would pay out"
+    }
@@ -0,0 +1,178 @@
+import time
+import inspect
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set
+from web3 import AsyncWeb3
+from web3.exceptions import TransactionNotFound
+from app.settings import RECEIPT_POLL_INTERVAL, RECEIPT_TIMEOUT, RECEIPT_TABLE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+# Transaction states
+PENDING = "pending"
+MINED = "mined"
+REVERTED = "reverted"
+DROPPED = "dropped"
+TIMED_OUT = "timed_out"
+
+
+class ReceiptTracker:
+    """Waits for many transactions with one batched receipt poll per new block.
+
+    Tracked hashes go into a status table. While any is pending, a poller checks
+    the head every poll_interval seconds and, when it has moved, asks for every
+    pending receipt at once; the batching provider sends them as JSON-RPC batches.
+    A transaction tracked with its sender and nonce is dropped as soon as that
+    nonce is mined in another transaction; any other gives up after timeout
+    seconds. Finishing resolves the hash's waiters and runs its callbacks, which
+    receive the status entry and the receipt (None unless mined).
+    """
+
+    def __init__(self, w3, poll_interval: float = RECEIPT_POLL_INTERVAL,
+                 timeout: float = RECEIPT_TIMEOUT, max_entries: int = RECEIPT_TABLE_SIZE):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self._pending: Set[str] = set()
+        self._receipts: Dict[str, Any] = {}
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._callbacks: Dict[str, List[Callable]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._poller: Optional[asyncio.Task] = None
+        self._last_block: Optional[int] = None
+        self.polls = 0
+
+    @staticmethod
+    def _key(tx_hash) -> str:
+        return (tx_hash if isinstance(tx_hash, str) else AsyncWeb3.to_hex(tx_hash)).lower()
+
+    def track(self, tx_hash, sender: Optional[str] = None, nonce: Optional[int] = None,
+              callback: Optional[Callable] = None) -> Dict[str, Any]:
+        """Adds a hash to the status table and starts polling for it; returns its status entry."""
+        key = self._key(tx_hash)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {
+                "tx_hash": key, "status": PENDING, "sender": sender, "nonce": nonce,
+                "tracked_at": time.time(), "block_number": None, "gas_used": None, "error": None
+            }
+            self._entries[key] = entry
+            self._pending.add(key)
+            self._evict()
+        if callback is not None:
+            if entry["status"] == PENDING:
+                self._callbacks.setdefault(key, []).append(callback)
+            else:
+                self._run_callback(callback, entry, self._receipts.get(key))
+        if entry["status"] == PENDING:
+            self._ensure_polling()
+        return entry
+
+    async def wait(self, tx_hash, sender: Optional[str] = None, nonce: Optional[int] = None) -> Optional[Any]:
+        """Tracks a hash and returns its receipt once mined, or None if it was dropped or timed out."""
+        entry = self.track(tx_hash, sender, nonce)
+        if entry["status"] != PENDING:
+            return self._receipts.get(entry["tx_hash"])
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(entry["tx_hash"], []).append(future)
+        return await future
+
+    def status(self, tx_hash) -> Optional[Dict[str, Any]]:
+        return self._entries.get(self._key(tx_hash))
+
+    def _evict(self) -> None:
+        # Pending transactions stay in the table however old they are
+        while len(self._entries) > self.max_entries:
+            for key in self._entries:
+                if key not in self._pending:
+                    break
+            else:
+                return
+            del self._entries[key]
+            self._receipts.pop(key, None)
+
+    def _ensure_polling(self) -> None:
+        # The poller belongs to the loop that started it; Celery runs a fresh loop per task
+        loop = asyncio.get_running_loop()
+        if self._poller is None or self._poller.done() or self._poller.get_loop() is not loop:
+            self._poller = loop.create_task(self._poll_while_pending())
+
+    async def _poll_while_pending(self) -> None:
+        while self._pending:
+            try:
+                block_number = await self.w3.eth.block_number
+                if block_number != self._last_block:
+                    self._last_block = block_number
+                    await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error polling transaction receipts: {e}")
+            if self._pending:
+                await asyncio.sleep(self.poll_interval)
+
+    async def poll(self) -> None:
+        """Asks for every pending receipt, and the mined nonce of every known sender, in one round."""
+        keys = list(self._pending)
+        senders = list({
+            self._entries[key]["sender"] for key in keys
+            if self._entries[key]["sender"] and self._entries[key]["nonce"] is not None
+        })
+        # Mined counts are asked first, so a receipt missing after them really is missing
+        results = await asyncio.gather(
+            *(self.w3.eth.get_transaction_count(sender, 'latest') for sender in senders),
+            *(self.w3.eth.get_transaction_receipt(key) for key in keys),
+            return_exceptions=True
+        )
+        mined_counts = dict(zip(senders, results[:len(senders)]))
+        self.polls += 1
+
+        now = time.time()
+        for key, receipt in zip(keys, results[len(senders):]):
+            entry = self._entries[key]
+            if not isinstance(receipt, Exception):
+                self._finish(key, MINED if receipt['status'] == 1 else REVERTED, receipt)
+                continue
+            if not isinstance(receipt, TransactionNotFound):
+                logger.warning(f"Receipt poll failed for {key}: {receipt}")
+            mined_count = mined_counts.get(entry["sender"])
+            if isinstance(mined_count, int) and entry["nonce"] is not None and entry["nonce"] < mined_count:
+                self._finish(key, DROPPED, error="nonce used by another transaction")
+            elif now - entry["tracked_at"] > self.timeout:
+                self._finish(key, TIMED_OUT, error=f"not mined after {self.timeout:.0f}s")
+
+    def _finish(self, key: str, status: str, receipt: Optional[Any] = None, error: Optional[str] = None) -> None:
+        entry = self._entries[key]
+        entry.update(status=status, error=error)
+        if receipt is not None:
+            entry.update(block_number=receipt['blockNumber'], gas_used=receipt['gasUsed'])
+            self._receipts[key] = receipt
+        self._pending.discard(key)
+        for future in self._waiters.pop(key, []):
+            if not future.done() and not future.get_loop().is_closed():
+                future.set_result(receipt)
+        for callback in self._callbacks.pop(key, []):
+            self._run_callback(callback, entry, receipt)
+
+    def _run_callback(self, callback: Callable, entry: Dict[str, Any], receipt: Optional[Any]) -> None:
+        try:
+            result = callback(entry, receipt)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._callback_done)
+        except Exception as e:
+            logger.error(f"Receipt callback failed for {entry['tx_hash']}: {e}")
+
+    def _callback_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Receipt callback failed: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tracked": len(self._entries), "pending": len(self._pending), "polls": self.polls, "last_block": self._last_block}
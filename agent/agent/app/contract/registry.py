@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from web3 import AsyncWeb3
+from app.indexer.store import EventStore, FACTORY
+from app.settings import REGISTRY_SYNC_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class PayrollRegistry:
+    """Employer -> payroll contracts, read from the factory events in the event index.
+
+    The event indexer stores every PayrollContractCreated/Updated log, so enumerating
+    every clone costs one local query rather than a getAllPayrollContractsWithEmployers
+    call that walks the whole factory, and reorgs are handled once, by the indexer.
+    Contracts keep their creation order, which matches getEmployerPayrolls, so
+    contract_index means the same thing here as on-chain.
+
+    The index trails the head by INDEXER_CONFIRMATIONS blocks. The event watcher and
+    the receipt tracker report the factory logs they see at the head through note_change,
+    and an employer's contracts are only answered from the index once it has caught up
+    with the last of them.
+    """
+
+    def __init__(self, store: EventStore):
+        self.store = store
+        self.synced_block: Optional[int] = None
+        # First block the event watcher reports factory logs for
+        self.watched_from: Optional[int] = None
+        self._changes: Dict[str, int] = {}
+
+    async def sync(self) -> int:
+        """Reads how far the index has got; returns the last block it holds every factory log for.
+
+        Raises if the indexer has never indexed the factory, rather than returning no contracts.
+        """
+        block_number = await asyncio.to_thread(self.store.get_checkpoint, FACTORY)
+        if block_number is None:
+            raise Exception("The event indexer has not indexed RikaFactory yet")
+        self.synced_block = block_number
+        self._changes = {employer: block for employer, block in self._changes.items() if block > block_number}
+        return block_number
+
+    def get_employer_contracts(self, employer_address: str) -> List[str]:
+        """Returns the employer's payroll contracts in creation order."""
+        return [
+            AsyncWeb3.to_checksum_address(contract)
+            for _, contract in self.store.get_payroll_contracts(employer_address)
+        ]
+
+    def get_all_contracts(self) -> Dict[str, List[str]]:
+        """Returns employer -> payroll contracts for every employer, in creation order."""
+        registry: Dict[str, List[str]] = {}
+        for employer, contract in self.store.get_payroll_contracts():
+            registry.setdefault(AsyncWeb3.to_checksum_address(employer), []).append(
+                AsyncWeb3.to_checksum_address(contract)
+            )
+        return registry
+
+    def watch(self, from_block: int) -> None:
+        """Called by the event watcher with the first block it will report factory logs for."""
+        self.watched_from = from_block
+
+    def note_change(self, employer_address: str, block_number: int) -> None:
+        """Records a factory log for the employer seen at the head, ahead of the index."""
+        key = employer_address.lower()
+        self._changes[key] = max(block_number, self._changes.get(key, block_number))
+
+    def is_current(self, employer_address: str) -> bool:
+        """Whether the index holds every factory log for the employer up to the watched head.
+
+        The index has to reach the block the watcher started from, so no log fell between
+        the two, and must hold the latest log the watcher reported for the employer.
+        """
+        if self.synced_block is None or self.watched_from is None or self.synced_block < self.watched_from - 1:
+            return False
+        return self._changes.get(employer_address.lower(), -1) <= self.synced_block
+
+    async def run(self) -> None:
+        """Follows the event indexer."""
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error syncing payroll registry: {e}")
+            await asyncio.sleep(REGISTRY_SYNC_INTERVAL)
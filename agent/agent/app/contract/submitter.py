@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from web3 import AsyncWeb3
+
+logger = logging.getLogger(__name__)
+
+# Renews whatever guards the sender's nonces; raises once it can no longer be held
+KeepAlive = Callable[[], Awaitable[Any]]
+
+# Submission states
+BUILD_FAILED = "build_failed"
+SEND_FAILED = "send_failed"
+PENDING = "pending"
+MINED = "mined"
+REVERTED = "reverted"
+DROPPED = "dropped"
+
+
+class Submission:
+    """One transaction of a pipelined run; build returns a client result with a "transaction" on success."""
+
+    def __init__(self, key: Any, build: Callable[[], Awaitable[Dict[str, Any]]]):
+        self.key = key
+        self.build = build
+        self.tx: Optional[Dict[str, Any]] = None
+        self.tx_hash = None
+        self.receipt: Optional[Dict[str, Any]] = None
+        self.status: Optional[str] = None
+        self.error: Optional[str] = None
+
+    @property
+    def nonce(self) -> Optional[int]:
+        return self.tx['nonce'] if self.tx else None
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "tx_hash": AsyncWeb3.to_hex(self.tx_hash) if self.tx_hash is not None else None,
+            "nonce": self.nonce,
+            "block_number": self.receipt['blockNumber'] if self.receipt else None,
+            "gas_used": self.receipt['gasUsed'] if self.receipt else None,
+            "error": self.error
+        }
+
+
+class PipelinedSubmitter:
+    """Signs and broadcasts a run of transactions from one wallet back to back, then confirms them together.
+
+    Transactions are built one after another, so their nonces are consecutive, and
+    broadcast without waiting for any receipt. A broadcast that fails hands its nonce
+    and every later one back and the rest are renumbered, so no gap stalls the run.
+    All of them are then handed to the receipt tracker, which polls their receipts
+    together once per block. A transaction the tracker drops (its nonce was used
+    by another one) or gives up on is marked dropped and its nonce reissued.
+    """
+
+    def __init__(self, w3, nonce_manager, receipt_tracker, sender: str, private_key: str):
+        self.w3 = w3
+        self.nonce_manager = nonce_manager
+        self.receipt_tracker = receipt_tracker
+        self.sender = sender
+        self.private_key = private_key
+
+    async def build(self, submissions: List[Submission], keepalive: Optional[KeepAlive] = None) -> None:
+        """Builds each transaction in turn; a failed build releases its nonce before the next is reserved.
+
+        keepalive is awaited before every build; if it raises, that submission and the
+        rest are failed without being built.
+        """
+        for index, submission in enumerate(submissions):
+            if not await self._keep_alive(keepalive, submissions[index:], BUILD_FAILED):
+                return
+            try:
+                result = await submission.build()
+            except Exception as e:
+                result = {"error": str(e)}
+            if "transaction" not in result:
+                submission.status, submission.error = BUILD_FAILED, result.get("error")
+                continue
+            submission.tx = result["transaction"]
+
+    async def broadcast(self, submissions: List[Submission], keepalive: Optional[KeepAlive] = None) -> None:
+        """Signs and sends every built transaction in nonce order without waiting for receipts.
+
+        keepalive is awaited before every send; if it raises, the unsent transactions
+        hand their nonces back and are failed.
+        """
+        queue = sorted((s for s in submissions if s.tx is not None and s.status is None), key=lambda s: s.nonce)
+        for index, submission in enumerate(queue):
+            if not await self._keep_alive(keepalive, queue[index:], SEND_FAILED):
+                for later in reversed(queue[index:]):
+                    self.nonce_manager.release(self.sender, later.nonce)
+                return
+            signed_txn = self.w3.eth.account.sign_transaction(submission.tx, private_key=self.private_key)
+            try:
+                tx_hash = await self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+            except Exception as e:
+                submission.status, submission.error = SEND_FAILED, str(e)
+                logger.error(f"Failed to send transaction {submission.key}: {e}")
+                # Later nonces would wait behind the gap forever; hand them back, highest first, and renumber
+                for later in reversed(queue[index:]):
+                    self.nonce_manager.release(self.sender, later.nonce)
+                for later in queue[index + 1:]:
+                    later.tx['nonce'] = await self.nonce_manager.reserve(self.sender)
+                continue
+            submission.tx_hash, submission.status = tx_hash, PENDING
+            self.nonce_manager.track(self.sender, submission.nonce, AsyncWeb3.to_hex(tx_hash))
+
+    async def _keep_alive(self, keepalive: Optional[KeepAlive], remaining: List[Submission], status: str) -> bool:
+        if keepalive is None:
+            return True
+        try:
+            await keepalive()
+            return True
+        except Exception as e:
+            logger.error(f"Stopping before {len(remaining)} transactions: {e}")
+            for submission in remaining:
+                submission.status, submission.error = status, f"not sent: {e}"
+            return False
+
+    async def confirm(self, submissions: List[Submission]) -> None:
+        """Waits for every pending transaction through the receipt tracker, settling each nonce."""
+        pending = [s for s in submissions if s.status == PENDING]
+        receipts = await asyncio.gather(*(
+            self.receipt_tracker.wait(s.tx_hash, self.sender, s.nonce) for s in pending
+        ))
+        for submission, receipt in zip(pending, receipts):
+            if receipt is not None:
+                submission.receipt = receipt
+                submission.status = MINED if receipt['status'] == 1 else REVERTED
+                self.nonce_manager.confirm(self.sender, submission.nonce)
+                continue
+            submission.status = DROPPED
+            submission.error = self.receipt_tracker.status(submission.tx_hash)["error"]
+            self.nonce_manager.drop(self.sender, submission.nonce)
+            logger.error(f"Transaction {submission.key} dropped: {submission.error}")
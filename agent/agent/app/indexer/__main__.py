@@ -0,0 +1,4 @@
+import asyncio
+from app.indexer.indexer import main
+
+asyncio.run(main())
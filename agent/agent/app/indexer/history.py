@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from app.indexer.store import event_store, FACTORY
+
+# Page size bounds for history queries
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 500
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    return f"{row['block_timestamp']}:{row['id']}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not cursor:
+        return None
+    timestamp, row_id = cursor.split(":")
+    return int(timestamp), int(row_id)
+
+
+async def get_event_history(events: List[str], employer_address: Optional[str] = None,
+                            employee_address: Optional[str] = None, contract_address: Optional[str] = None,
+                            from_timestamp: Optional[int] = None, to_timestamp: Optional[int] = None,
+                            cursor: Optional[str] = None, limit: int = HISTORY_DEFAULT_LIMIT) -> Dict[str, Any]:
+    """Returns one page of indexed events, newest first, with a keyset cursor for the next page.
+
+    Raises when nothing has been indexed, rather than reporting no events; indexed_block
+    tells the caller how recent the answer is.
+    """
+    indexed_block = await asyncio.to_thread(event_store.get_checkpoint, FACTORY)
+    if indexed_block is None:
+        raise Exception("History is unavailable: the event indexer has not indexed any blocks yet")
+    try:
+        limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+        rows = await asyncio.to_thread(
+            event_store.query_events, events,
+            employer=employer_address, employee=employee_address, contract=contract_address,
+            from_timestamp=from_timestamp, to_timestamp=to_timestamp,
+            before=decode_cursor(cursor), limit=limit
+        )
+        return {
+            "items": rows,
+            "next_cursor": encode_cursor(rows[-1]) if len(rows) == limit else None,
+            "indexed_block": indexed_block,
+            "message": f"Successfully retrieved {len(rows)} events"
+        }
+    except ValueError:
+        return {"error": "Invalid cursor"}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+async def get_payment_history(**filters) -> Dict[str, Any]:
+    """Salary payments (SalaryPaid)."""
+    return await get_event_history(["SalaryPaid"], **filters)
+
+
+async def get_payroll_run_history(**filters) -> Dict[str, Any]:
+    """Payroll runs (PayrollProcessed)."""
+    return await get_event_history(["PayrollProcessed"], **filters)
@@ -0,0 +1,214 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Tuple
+from web3 import AsyncWeb3
+from app.contract.client import w3, rika_factory, management_contracts, connect, disconnect
+from app.contract.events import FACTORY_EVENT_TOPICS, MANAGEMENT_EVENT_TOPICS
+from app.indexer.store import EventStore, event_store, encode_args, FACTORY, MANAGEMENT
+from app.settings import (
+    RIKA_FACTORY_DEPLOY_BLOCK, INDEXER_POLL_INTERVAL, INDEXER_INITIAL_CHUNK, INDEXER_MIN_CHUNK, INDEXER_MAX_CHUNK,
+    INDEXER_TARGET_LOGS, INDEXER_MAX_ADDRESSES, INDEXER_CONFIRMATIONS
+)
+
+logger = logging.getLogger(__name__)
+
+
+def factory_deploy_block() -> int:
+    """Block RikaFactory was deployed in; raises if it is not configured rather than indexing from genesis."""
+    if not RIKA_FACTORY_DEPLOY_BLOCK:
+        raise RuntimeError("RIKA_FACTORY_DEPLOY_BLOCK is not set; set it to the block RikaFactory was deployed in")
+    return int(RIKA_FACTORY_DEPLOY_BLOCK)
+
+
+class EventIndexer:
+    """Indexes RikaFactory and RikaManagement logs into an EventStore.
+
+    Every contract has its own checkpoint. Each step scans the contracts that are
+    furthest behind, with one eth_getLogs over an adaptive block range, and writes
+    their logs and new checkpoint in one transaction, so a restart resumes where
+    it stopped. Clones announced by PayrollContractCreated are picked up from
+    their creation block.
+
+    Only blocks INDEXER_CONFIRMATIONS deep are indexed. The hashes of indexed
+    blocks are recorded, and a chunk whose first block does not build on the
+    recorded parent rolls the store back to the last common ancestor.
+    """
+
+    def __init__(self, store: EventStore = event_store):
+        self.store = store
+        self.chunk_size = INDEXER_INITIAL_CHUNK
+        self.logs_indexed = 0
+        self.busy_seconds = 0.0
+        self.reorgs = 0
+
+    async def bootstrap(self) -> None:
+        """Registers the factory from its deploy block.
+
+        Every clone is created after the factory, so its PayrollContractCreated log
+        registers it from its creation block as the factory is indexed, and the clone
+        list is never read from the factory contract.
+        """
+        start = factory_deploy_block() - 1
+        await asyncio.to_thread(self.store.add_contract, rika_factory.address, FACTORY, start)
+
+    async def target_block(self) -> int:
+        """Returns the highest block that may be indexed."""
+        return (await w3.eth.block_number) - INDEXER_CONFIRMATIONS
+
+    async def get_blocks(self, block_numbers) -> Dict[int, Any]:
+        numbers = sorted(block_numbers)
+        blocks = await asyncio.gather(*(w3.eth.get_block(number) for number in numbers))
+        return dict(zip(numbers, blocks))
+
+    async def find_common_ancestor(self, block_number: int) -> int:
+        """Returns the newest recorded block at or below block_number that is still canonical."""
+        recorded = await asyncio.to_thread(self.store.get_blocks, block_number)
+        if not recorded:
+            return block_number
+        canonical = await self.get_blocks(number for number, _ in recorded)
+        for number, block_hash in recorded:
+            if AsyncWeb3.to_hex(canonical[number]['hash']) == block_hash:
+                return number
+        # The reorg is deeper than the recorded window
+        return recorded[-1][0] - 1
+
+    async def handle_reorg(self, block_number: int) -> None:
+        """Rolls the store back to the last block before block_number that is still canonical."""
+        ancestor = await self.find_common_ancestor(block_number - 1)
+        removed = await asyncio.to_thread(self.store.rollback, ancestor)
+        self.reorgs += 1
+        logger.warning(f"Reorg detected at block {block_number}: rolled back to {ancestor}, removed {removed} logs")
+
+    def decode_log(self, log, kind: str):
+        """Returns (event name, args) for a log we index, or None."""
+        if not log['topics']:
+            return None
+        topic = bytes(log['topics'][0])
+        if kind == FACTORY:
+            name, contract = FACTORY_EVENT_TOPICS.get(topic), rika_factory
+        else:
+            name, contract = MANAGEMENT_EVENT_TOPICS.get(topic), management_contracts.get(log['address'])
+        if name is None:
+            return None
+        return name, dict(getattr(contract.events, name)().process_log(log)['args'])
+
+    def decode_logs(self, logs, kinds: Dict[str, str], blocks: Dict[int, Any]) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str, int]]]:
+        rows, new_contracts = [], []
+        for log in logs:
+            decoded = self.decode_log(log, kinds[log['address'].lower()])
+            if decoded is None:
+                continue
+            name, args = decoded
+            if name == "PayrollContractCreated":
+                new_contracts.append((args['payrollContract'], MANAGEMENT, log['blockNumber'] - 1))
+
+            amount = args.get('amount', args.get('totalPayout'))
+            rows.append({
+                "contract": log['address'].lower(),
+                "event": name,
+                "employer": args['employer'].lower() if 'employer' in args else None,
+                "employee": args['employeeAddress'].lower() if 'employeeAddress' in args else None,
+                "amount": str(amount) if amount is not None else None,
+                "block_number": log['blockNumber'],
+                "block_hash": AsyncWeb3.to_hex(log['blockHash']),
+                "block_timestamp": blocks[log['blockNumber']]['timestamp'],
+                "tx_hash": AsyncWeb3.to_hex(log['transactionHash']),
+                "log_index": log['logIndex'],
+                "args": encode_args(args),
+            })
+        return rows, new_contracts
+
+    async def index_once(self) -> bool:
+        """Indexes one chunk; returns False once every contract has caught up."""
+        checkpoints = await asyncio.to_thread(self.store.get_checkpoints)
+        target = await self.target_block()
+        lowest = min(block for _, block in checkpoints.values())
+        if lowest >= target:
+            return False
+
+        group = [contract for contract, (_, block) in checkpoints.items() if block == lowest][:INDEXER_MAX_ADDRESSES]
+        higher = [block for _, block in checkpoints.values() if block > lowest]
+        from_block = lowest + 1
+        # Stop where the next group begins so the two merge
+        to_block = min(from_block + self.chunk_size - 1, target, min(higher) if higher else target)
+
+        started = time.monotonic()
+        try:
+            logs = await w3.eth.get_logs({
+                'fromBlock': from_block,
+                'toBlock': to_block,
+                'address': [AsyncWeb3.to_checksum_address(contract) for contract in group]
+            })
+        except Exception as e:
+            if self.chunk_size <= INDEXER_MIN_CHUNK:
+                raise
+            # Most providers reject ranges with too many results; retry smaller
+            self.chunk_size = max(INDEXER_MIN_CHUNK, self.chunk_size // 2)
+            logger.warning(f"eth_getLogs {from_block}-{to_block} failed, chunk size now {self.chunk_size}: {e}")
+            return True
+
+        blocks = await self.get_blocks({from_block, to_block} | {log['blockNumber'] for log in logs})
+        parent_hash = await asyncio.to_thread(self.store.get_block_hash, lowest)
+        if parent_hash is not None and AsyncWeb3.to_hex(blocks[from_block]['parentHash']) != parent_hash:
+            await self.handle_reorg(from_block)
+            return True
+        if any(log['blockHash'] != blocks[log['blockNumber']]['hash'] for log in logs):
+            # The chain moved between eth_getLogs and eth_getBlockByNumber; read the range again
+            logger.warning(f"Block hashes changed while indexing blocks {from_block}-{to_block}, retrying")
+            return True
+
+        rows, new_contracts = self.decode_logs(logs, {contract: checkpoints[contract][0] for contract in group}, blocks)
+        recorded = [
+            (number, AsyncWeb3.to_hex(block['hash']), AsyncWeb3.to_hex(block['parentHash']))
+            for number, block in blocks.items()
+        ]
+        await asyncio.to_thread(self.store.write_chunk, rows, group, to_block, new_contracts, recorded)
+
+        if len(logs) > INDEXER_TARGET_LOGS:
+            self.chunk_size = max(INDEXER_MIN_CHUNK, self.chunk_size // 2)
+        elif len(logs) < INDEXER_TARGET_LOGS // 4:
+            self.chunk_size = min(INDEXER_MAX_CHUNK, self.chunk_size * 2)
+
+        elapsed = time.monotonic() - started
+        self.logs_indexed += len(rows)
+        self.busy_seconds += elapsed
+        if rows:
+            logger.info(
+                f"Indexed {len(rows)} logs from {len(group)} contracts in blocks {from_block}-{to_block} "
+                f"({len(rows) / elapsed if elapsed else 0:.0f} logs/s, {self.throughput():.0f} logs/s overall)"
+            )
+        return True
+
+    def throughput(self) -> float:
+        """Logs indexed per second of indexing work since start."""
+        return self.logs_indexed / self.busy_seconds if self.busy_seconds else 0.0
+
+    async def run(self) -> None:
+        """Indexes until caught up, then follows the chain head."""
+        # A missing deploy block is a configuration error, not something to retry
+        factory_deploy_block()
+        bootstrapped = False
+        while True:
+            try:
+                if not bootstrapped:
+                    await self.bootstrap()
+                    bootstrapped = True
+                while await self.index_once():
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error indexing events: {e}")
+            await asyncio.sleep(INDEXER_POLL_INTERVAL)
+
+
+event_indexer = EventIndexer()
+
+
+async def main() -> None:
+    await connect()
+    try:
+        await event_indexer.run()
+    finally:
+        await disconnect()
@@ -0,0 +1,232 @@
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.settings import INDEXER_DB_PATH, INDEXER_REORG_WINDOW
+
+# Kinds of indexed contract
+FACTORY = 'factory'
+MANAGEMENT = 'management'
+
+# Factory events that assign a payroll contract to an employer
+REGISTRY_EVENTS = ("PayrollContractCreated", "PayrollContractUpdated")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    contract TEXT NOT NULL,
+    event TEXT NOT NULL,
+    employer TEXT,
+    employee TEXT,
+    amount TEXT,
+    block_number INTEGER NOT NULL,
+    block_hash TEXT NOT NULL,
+    block_timestamp INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    args TEXT NOT NULL,
+    UNIQUE (block_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS idx_events_contract ON events (contract, block_number);
+CREATE INDEX IF NOT EXISTS idx_events_employer ON events (employer, event, block_timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_events_employee ON events (employee, event, block_timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_events_contract_time ON events (contract, event, block_timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (event, block_timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_events_block ON events (block_number);
+
+CREATE TABLE IF NOT EXISTS blocks (
+    number INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    parent_hash TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    contract TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    block_number INTEGER NOT NULL
+);
+"""
+
+
+class EventStore:
+    """SQLite store for decoded contract logs and per-contract indexing checkpoints.
+
+    One connection is shared behind a lock; callers on the event loop should go
+    through asyncio.to_thread.
+    """
+
+    def __init__(self, path: str = INDEXER_DB_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get_checkpoints(self) -> Dict[str, Tuple[str, int]]:
+        """Returns contract -> (kind, last indexed block)."""
+        with self._lock:
+            rows = self._connection().execute("SELECT contract, kind, block_number FROM checkpoints").fetchall()
+        return {row["contract"]: (row["kind"], row["block_number"]) for row in rows}
+
+    def get_checkpoint(self, kind: str) -> Optional[int]:
+        """Returns the last block indexed for every contract of kind, or None if none is tracked."""
+        with self._lock:
+            row = self._connection().execute("SELECT MIN(block_number) FROM checkpoints WHERE kind = ?", (kind,)).fetchone()
+        return row[0]
+
+    def add_contract(self, contract: str, kind: str, block_number: int) -> None:
+        """Starts tracking a contract from block_number + 1, unless it is already tracked."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR IGNORE INTO checkpoints (contract, kind, block_number) VALUES (?, ?, ?)",
+                (contract.lower(), kind, block_number)
+            )
+            conn.commit()
+
+    def write_chunk(self, rows: Iterable[Dict[str, Any]], contracts: List[str], block_number: int,
+                    new_contracts: Iterable[Tuple[str, str, int]] = (),
+                    blocks: Iterable[Tuple[int, str, str]] = ()) -> int:
+        """Inserts decoded logs, their block hashes and the contracts' new checkpoints in one transaction."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.executemany(
+                    "INSERT OR IGNORE INTO events (contract, event, employer, employee, amount, block_number, "
+                    "block_hash, block_timestamp, tx_hash, log_index, args) "
+                    "VALUES (:contract, :event, :employer, :employee, :amount, :block_number, "
+                    ":block_hash, :block_timestamp, :tx_hash, :log_index, :args)",
+                    list(rows)
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO checkpoints (contract, kind, block_number) VALUES (?, ?, ?)",
+                    [(contract.lower(), kind, block) for contract, kind, block in new_contracts]
+                )
+                conn.executemany(
+                    "UPDATE checkpoints SET block_number = ? WHERE contract = ?",
+                    [(block_number, contract.lower()) for contract in contracts]
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO blocks (number, hash, parent_hash) VALUES (?, ?, ?)",
+                    list(blocks)
+                )
+                conn.execute("DELETE FROM blocks WHERE number < ?", (block_number - INDEXER_REORG_WINDOW,))
+            return cursor.rowcount
+
+    def get_block_hash(self, block_number: int) -> Optional[str]:
+        """Returns the hash recorded for block_number, if it is still in the reorg window."""
+        with self._lock:
+            row = self._connection().execute("SELECT hash FROM blocks WHERE number = ?", (block_number,)).fetchone()
+        return row["hash"] if row else None
+
+    def get_blocks(self, up_to: int) -> List[Tuple[int, str]]:
+        """Returns recorded (number, hash) pairs at or below up_to, newest first."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT number, hash FROM blocks WHERE number <= ? ORDER BY number DESC", (up_to,)
+            ).fetchall()
+        return [(row["number"], row["hash"]) for row in rows]
+
+    def rollback(self, block_number: int) -> int:
+        """Drops everything indexed above block_number and rewinds checkpoints to it.
+
+        Clones announced by an orphaned PayrollContractCreated stop being tracked;
+        they come back if the canonical chain announces them again.
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                orphaned_clones = [
+                    json.loads(row["args"])["payrollContract"].lower()
+                    for row in conn.execute(
+                        "SELECT args FROM events WHERE event = 'PayrollContractCreated' AND block_number > ?",
+                        (block_number,)
+                    )
+                ]
+                conn.executemany("DELETE FROM checkpoints WHERE contract = ?", [(c,) for c in orphaned_clones])
+                cursor = conn.execute("DELETE FROM events WHERE block_number > ?", (block_number,))
+                conn.execute("DELETE FROM blocks WHERE number > ?", (block_number,))
+                conn.execute(
+                    "UPDATE checkpoints SET block_number = ? WHERE block_number > ?", (block_number, block_number)
+                )
+            return cursor.rowcount
+
+    def query_events(self, events: List[str], employer: Optional[str] = None, employee: Optional[str] = None,
+                     contract: Optional[str] = None, from_timestamp: Optional[int] = None,
+                     to_timestamp: Optional[int] = None, before: Optional[Tuple[int, int]] = None,
+                     limit: int = 50) -> List[Dict[str, Any]]:
+        """Returns events newest first, continuing after the (block_timestamp, id) keyset in before."""
+        clauses = [f"event IN ({', '.join('?' for _ in events)})"]
+        params: List[Any] = list(events)
+        for column, value in (("employer", employer), ("employee", employee), ("contract", contract)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value.lower())
+        if from_timestamp is not None:
+            clauses.append("block_timestamp >= ?")
+            params.append(from_timestamp)
+        if to_timestamp is not None:
+            clauses.append("block_timestamp <= ?")
+            params.append(to_timestamp)
+        if before is not None:
+            # The row-value form bounds the index range; the OR form only filters rows after the seek
+            clauses.append("(block_timestamp, id) < (?, ?)")
+            params.extend(before)
+        params.append(limit)
+
+        query = (
+            "SELECT id, contract, event, employer, employee, amount, block_number, block_timestamp, "
+            "tx_hash, log_index, args FROM events WHERE " + " AND ".join(clauses) +
+            " ORDER BY block_timestamp DESC, id DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+        return [{**dict(row), "args": json.loads(row["args"])} for row in rows]
+
+    def get_payroll_contracts(self, employer: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Returns (employer, payroll contract) pairs from the factory events, optionally for one employer.
+
+        Each contract appears once, under the employer of its latest event, ordered by that event.
+        """
+        query = (
+            "SELECT employer, payroll FROM ("
+            " SELECT employer, json_extract(args, '$.payrollContract') AS payroll, block_number, log_index,"
+            " ROW_NUMBER() OVER (PARTITION BY lower(json_extract(args, '$.payrollContract'))"
+            " ORDER BY block_number DESC, log_index DESC) AS newest"
+            f" FROM events WHERE event IN ({', '.join('?' for _ in REGISTRY_EVENTS)})"
+            ") WHERE newest = 1" + (" AND employer = ?" if employer else "") +
+            " ORDER BY block_number, log_index"
+        )
+        params = list(REGISTRY_EVENTS) + ([employer.lower()] if employer else [])
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+        return [(row["employer"], row["payroll"]) for row in rows]
+
+    def count_events(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+
+def encode_args(args: Dict[str, Any]) -> str:
+    """Serialises decoded event args, keeping uint256 values exact and bytes as hex."""
+    def default(value):
+        if isinstance(value, (bytes, bytearray)):
+            return "0x" + bytes(value).hex()
+        if isinstance(value, tuple):
+            return list(value)
+        return str(value)
+    return json.dumps(
+        {key: str(value) if isinstance(value, int) and not isinstance(value, bool) else value for key, value in args.items()},
+        default=default
+    )
+
+
+event_store = EventStore()
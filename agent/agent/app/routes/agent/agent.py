@@ -3,24 +3,16 @@ from app.routes.agent.model import AgentOutputSchema, AgentInteractRequest, Para
 from app.agent import RikaAgent
 import uuid
 import logging
-import httpx
-from dotenv import load_dotenv
-import os
+from app.settings import ANTHROPIC_API_KEY
 from fastapi.middleware.cors import CORSMiddleware
 
-# Load .env file
-load_dotenv()
-anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
-
 # Set up logging
 logger = logging.getLogger("rika_agent")
 logging.basicConfig(level=logging.INFO)
 
-# Base URL of your FastAPI application
-FASTAPI_BASE_URL = "http://localhost:8000"
 router = APIRouter()
 
-agent = RikaAgent(anthropic_api_key)
+agent = RikaAgent(ANTHROPIC_API_KEY)
 
 # Enable CORS for WebSocket
 app = FastAPI()
@@ -38,11 +30,26 @@ async def agent_interact(request: AgentInteractRequest):
     session_id = request.session_id or str(uuid.uuid4())
     return await agent.process_prompt(request.prompt_text, session_id, request.employer_address)
 
+@router.get("/agent/metrics")
+async def agent_metrics():
+    """Time to first token and completion latency of LLM calls, and time to first byte of streamed replies."""
+    return agent.metrics()
+
 @router.websocket("/ws/{employer_address}")
-async def websocket_endpoint(websocket: WebSocket, employer_address: str):
+async def websocket_endpoint(websocket: WebSocket, employer_address: str, stream: bool = False):
+    """Chat with Rika over a WebSocket.
+
+    By default each prompt is answered with one frame holding the structured response,
+    as before streaming existed. Clients that connect with stream=true opt in to typed
+    frames: "token" frames as the LLM produces them and "status" frames between
+    stages, then one "final" frame with the structured response.
+    """
     await websocket.accept()
     session_id = str(uuid.uuid4())
-    agent.conversation_store[session_id] = []
+    agent.conversation_store.create(session_id)
+
+    async def send_frame(frame):
+        await websocket.send_json(frame)
 
     try:
         while True:
@@ -50,7 +57,12 @@ async def websocket_endpoint(websocket: WebSocket, employer_address: str):
             logger.info(f"Received message: {user_prompt}")
             
             # Process prompt with employer_address
-            response = await agent.process_prompt(user_prompt, session_id, employer_address)
+            try:
+                response = await agent.process_prompt(user_prompt, session_id, employer_address, send_frame if stream else None)
+            except HTTPException as e:
+                error = {"error": e.detail, "session_id": session_id}
+                await websocket.send_json({"type": "error", **error} if stream else error)
+                continue
             
             json_response = {
                 "api_route": response.get("api_route"),
@@ -62,13 +74,12 @@ async def websocket_endpoint(websocket: WebSocket, employer_address: str):
                 "help_buttons": response.get("help_buttons", [])
             }
             
-            await websocket.send_json(json_response)
+            await websocket.send_json({"type": "final", **json_response} if stream else json_response)
             
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected: {session_id}")
     finally:
-        if session_id in agent.conversation_store:
-            del agent.conversation_store[session_id]
+        agent.conversation_store.delete(session_id)
 
 
 def get_router():
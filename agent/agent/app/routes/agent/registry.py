@@ -0,0 +1,40 @@
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Type
+from pydantic import BaseModel
+from app.routes.web3.model import (BaseResponse, CreatePayrollContractRequest, AddEmployeeRequest, AddFundsRequest, CreateScheduleRequest, EmployeeStatusRequest, UpdateSalaryRequest, PayrollProcessRequest, GetDetailsRequest)
+from app.routes.web3.client import (create_payroll_contract_endpoint, add_employee_endpoint, add_funds_endpoint, create_schedule_endpoint, deactivate_employee_endpoint, reactivate_employee_endpoint, update_salary, process_payrolls, get_employee_details_endpoint, get_all_employees, get_balance, get_liability, get_next_date)
+
+# Prefix the payroll router is mounted under; the agent may include it in a route
+PAYROLL_ROUTE_PREFIX = "/api/v1/payroll"
+
+
+class AgentRoute(NamedTuple):
+    """A payroll route the agent can select: its request model and the handler that calls the contract client."""
+    method: str
+    request_model: Type[BaseModel]
+    handler: Callable[[BaseModel], Awaitable[BaseResponse]]
+
+
+# The routes listed in the agent's system prompt
+AGENT_ROUTES: Dict[str, AgentRoute] = {
+    "/payroll-contracts": AgentRoute("POST", CreatePayrollContractRequest, create_payroll_contract_endpoint),
+    "/employees": AgentRoute("POST", AddEmployeeRequest, add_employee_endpoint),
+    "/funds": AgentRoute("POST", AddFundsRequest, add_funds_endpoint),
+    "/schedules": AgentRoute("POST", CreateScheduleRequest, create_schedule_endpoint),
+    "/employees/deactivate": AgentRoute("POST", EmployeeStatusRequest, deactivate_employee_endpoint),
+    "/employees/reactivate": AgentRoute("POST", EmployeeStatusRequest, reactivate_employee_endpoint),
+    "/salaries/update": AgentRoute("POST", UpdateSalaryRequest, update_salary),
+    "/payrolls/process": AgentRoute("POST", PayrollProcessRequest, process_payrolls),
+    "/employees/details": AgentRoute("GET", GetDetailsRequest, get_employee_details_endpoint),
+    "/employees/all": AgentRoute("GET", GetDetailsRequest, get_all_employees),
+    "/balance": AgentRoute("GET", GetDetailsRequest, get_balance),
+    "/liability": AgentRoute("GET", GetDetailsRequest, get_liability),
+    "/payrolls/next-date": AgentRoute("GET", GetDetailsRequest, get_next_date),
+}
+
+
+def resolve_route(api_route: str) -> Optional[AgentRoute]:
+    """Finds the agent route for a path, with or without the payroll router prefix."""
+    path = api_route.strip()
+    if path.startswith(PAYROLL_ROUTE_PREFIX):
+        path = path[len(PAYROLL_ROUTE_PREFIX):]
+    return AGENT_ROUTES.get("/" + path.strip("/"))
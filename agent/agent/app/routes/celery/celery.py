@@ -8,4 +8,11 @@ async def trigger_payroll_processing():
     """Trigger payroll processing for all employers."""
     from app.tasks.celery import process_payroll_for_all_employers
     task = process_payroll_for_all_employers.delay()
-    return {"task_id": task.id, "status": "Payroll processing started."}
\ No newline at end of file
+    return {"task_id": task.id, "status": "Payroll processing started."}
+
+@router.get("/payroll-runs/{task_id}")
+async def get_payroll_run(task_id: str):
+    """Get the state and result of a payroll task, such as a payroll run summary."""
+    from app.tasks.celery import celery_app
+    result = celery_app.AsyncResult(task_id)
+    return {"task_id": task_id, "status": result.status, "result": result.result if result.ready() else None}
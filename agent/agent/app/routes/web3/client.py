@@ -1,7 +1,9 @@
 from fastapi import FastAPI, HTTPException, APIRouter
 from typing import List, Optional, Dict, Any
-from app.routes.web3.model import  (BaseResponse, CreatePayrollContractRequest, AddEmployeeRequest, AddEmployeesBatchRequest, AddFundsRequest, CreateScheduleRequest, EmployeeStatusRequest, UpdateSalaryRequest, PayrollProcessRequest, GetDetailsRequest)
-from app.contract.client import (create_payroll_contract, add_employee, add_employees_batch, add_funds, create_schedule, deactivate_employee, reactivate_employee, update_employee_salary, process_all_payrolls, get_employee_details, get_all_employees_with_details, get_employer_balance, get_total_payroll_liability, get_next_payroll_date, get_employer_payroll_contract)
+from app.routes.web3.model import  (BaseResponse, CreatePayrollContractRequest, AddEmployeeRequest, AddEmployeesBatchRequest, AddFundsRequest, CreateScheduleRequest, EmployeeStatusRequest, UpdateSalaryRequest, PayrollProcessRequest, GetDetailsRequest, EmployerSummaryRequest, HistoryRequest, TransactionsRequest)
+from app.contract.cache import view_cache, payroll_contract_cache
+from app.indexer.history import get_payment_history, get_payroll_run_history
+from app.contract.client import (create_payroll_contract, add_employee, add_employees_batch, add_funds, create_schedule, deactivate_employee, reactivate_employee, update_employee_salary, process_all_payrolls, get_employee_details, get_all_employees_with_details, get_employer_balance, get_total_payroll_liability, get_next_payroll_date, get_employer_payroll_contract, get_payroll_views, get_employer_summary, get_underfunded_employers, track_transactions, get_transaction_statuses, payroll_mirror, receipt_tracker)
 
 
 router = APIRouter()
@@ -11,7 +13,7 @@ router = APIRouter()
 @router.post("/payroll-contracts", response_model=BaseResponse)
 async def create_payroll_contract_endpoint(request: CreatePayrollContractRequest):
     try:
-        result = create_payroll_contract(request.employer_address)
+        result = await create_payroll_contract(request.employer_address)
         return BaseResponse(
             success=True,
             message="Operation successful",
@@ -31,7 +33,7 @@ async def create_payroll_contract_endpoint(request: CreatePayrollContractRequest
 @router.post("/employees", response_model=BaseResponse)
 async def add_employee_endpoint(request: AddEmployeeRequest):
     try:
-        result = add_employee(
+        result = await add_employee(
             name=request.name,
             employee_address=request.employee_address,
             salary=request.salary,
@@ -55,7 +57,7 @@ async def add_employee_endpoint(request: AddEmployeeRequest):
 @router.post("/funds", response_model=BaseResponse)
 async def add_funds_endpoint(request: AddFundsRequest):
     try:
-        result = add_funds(
+        result = await add_funds(
             request.amount,
             request.employer_address,
             request.contract_index
@@ -75,9 +77,9 @@ async def add_funds_endpoint(request: AddFundsRequest):
         )
 
 @router.post("/schedules", response_model=BaseResponse)
-async def create_schedule(request: CreateScheduleRequest):
+async def create_schedule_endpoint(request: CreateScheduleRequest):
     try:
-        result = create_schedule(
+        result = await create_schedule(
             request.employee_address,
             request.start_date,
             request.end_date,
@@ -90,9 +92,9 @@ async def create_schedule(request: CreateScheduleRequest):
         return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
 
 @router.post("/employees/deactivate", response_model=BaseResponse)
-async def deactivate_employee(request: EmployeeStatusRequest):
+async def deactivate_employee_endpoint(request: EmployeeStatusRequest):
     try:
-        result = deactivate_employee(
+        result = await deactivate_employee(
             request.employee_address,
             request.employer_address,
             request.contract_index
@@ -102,9 +104,9 @@ async def deactivate_employee(request: EmployeeStatusRequest):
         return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
 
 @router.post("/employees/reactivate", response_model=BaseResponse)
-async def reactivate_employee(request: EmployeeStatusRequest):
+async def reactivate_employee_endpoint(request: EmployeeStatusRequest):
     try:
-        result = reactivate_employee(
+        result = await reactivate_employee(
             request.employee_address,
             request.employer_address,
             request.contract_index
@@ -116,7 +118,7 @@ async def reactivate_employee(request: EmployeeStatusRequest):
 @router.post("/salaries/update", response_model=BaseResponse)
 async def update_salary(request: UpdateSalaryRequest):
     try:
-        result = update_employee_salary(
+        result = await update_employee_salary(
             request.employee_address,
             request.new_salary,
             request.employer_address,
@@ -129,7 +131,7 @@ async def update_salary(request: UpdateSalaryRequest):
 @router.post("/payrolls/process", response_model=BaseResponse)
 async def process_payrolls(request: PayrollProcessRequest):
     try:
-        result = process_all_payrolls(
+        result = await process_all_payrolls(
             request.employer_address,
             request.contract_index
         )
@@ -138,14 +140,15 @@ async def process_payrolls(request: PayrollProcessRequest):
         return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
 
 @router.get("/employees/details", response_model=BaseResponse)
-async def get_employee_details(request: GetDetailsRequest):
+async def get_employee_details_endpoint(request: GetDetailsRequest):
     try:
         if not request.employee_address:
             raise ValueError("Employee address required")
-        result = get_employee_details(
+        result = await get_employee_details(
             request.employee_address,
             request.employer_address,
-            request.contract_index
+            request.contract_index,
+            request.consistency
         )
         return BaseResponse(success=True, message="Operation successful", data=result, error=None)
     except Exception as e:
@@ -154,9 +157,10 @@ async def get_employee_details(request: GetDetailsRequest):
 @router.get("/employees/all", response_model=BaseResponse)
 async def get_all_employees(request: GetDetailsRequest):
     try:
-        result = get_all_employees_with_details(
+        result = await get_all_employees_with_details(
             request.employer_address,
-            request.contract_index
+            request.contract_index,
+            request.consistency
         )
         return BaseResponse(success=True, message="Operation successful", data=result, error=None)
     except Exception as e:
@@ -165,9 +169,10 @@ async def get_all_employees(request: GetDetailsRequest):
 @router.get("/balance", response_model=BaseResponse)
 async def get_balance(request: GetDetailsRequest):
     try:
-        result = get_employer_balance(
+        result = await get_employer_balance(
             request.employer_address,
-            request.contract_index
+            request.contract_index,
+            request.consistency
         )
         return BaseResponse(success=True, message="Operation successful", data=result, error=None)
     except Exception as e:
@@ -176,9 +181,10 @@ async def get_balance(request: GetDetailsRequest):
 @router.get("/liability", response_model=BaseResponse)
 async def get_liability(request: GetDetailsRequest):
     try:
-        result = get_total_payroll_liability(
+        result = await get_total_payroll_liability(
             request.employer_address,
-            request.contract_index
+            request.contract_index,
+            request.consistency
         )
         return BaseResponse(success=True, message="Operation successful", data=result, error=None)
     except Exception as e:
@@ -189,21 +195,96 @@ async def get_next_date(request: GetDetailsRequest):
     try:
         if not request.employee_address:
             raise ValueError("Employee address required")
-        result = get_next_payroll_date(
+        result = await get_next_payroll_date(
             request.employee_address,
             request.employer_address,
-            request.contract_index
+            request.contract_index,
+            request.consistency
+        )
+        return BaseResponse(success=True, message="Operation successful", data=result, error=None)
+    except Exception as e:
+        return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
+
+@router.get("/payrolls/views", response_model=BaseResponse)
+async def get_views(request: GetDetailsRequest):
+    try:
+        result = await get_payroll_views(
+            request.employer_address,
+            request.contract_index,
+            request.employee_address
         )
         return BaseResponse(success=True, message="Operation successful", data=result, error=None)
     except Exception as e:
         return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
 
+@router.get("/employers/summary", response_model=BaseResponse)
+async def get_summary(request: EmployerSummaryRequest):
+    try:
+        result = await get_employer_summary(request.employer_address)
+        return BaseResponse(success=True, message="Operation successful", data=result, error=None)
+    except Exception as e:
+        return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
+
+@router.get("/employers/underfunded", response_model=BaseResponse)
+async def get_underfunded():
+    try:
+        result = await get_underfunded_employers()
+        return BaseResponse(success=True, message="Operation successful", data=result, error=None)
+    except Exception as e:
+        return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
+
+@router.get("/history/payments", response_model=BaseResponse)
+async def get_payments_history(request: HistoryRequest):
+    try:
+        if not (request.employer_address or request.employee_address or request.contract_address):
+            raise ValueError("Employer, employee or contract address required")
+        result = await get_payment_history(**request.dict())
+        return BaseResponse(success=True, message="Operation successful", data=result, error=None)
+    except Exception as e:
+        return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
+
+@router.get("/history/payrolls", response_model=BaseResponse)
+async def get_payrolls_history(request: HistoryRequest):
+    try:
+        if not (request.employer_address or request.contract_address):
+            raise ValueError("Employer or contract address required")
+        result = await get_payroll_run_history(**request.dict())
+        return BaseResponse(success=True, message="Operation successful", data=result, error=None)
+    except Exception as e:
+        return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
+
+@router.post("/transactions/track", response_model=BaseResponse)
+async def track_transactions_endpoint(request: TransactionsRequest):
+    try:
+        result = await track_transactions(request.tx_hashes)
+        return BaseResponse(success=True, message="Operation successful", data=result, error=None)
+    except Exception as e:
+        return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
+
+@router.get("/transactions/status", response_model=BaseResponse)
+async def get_transactions_status(request: TransactionsRequest):
+    try:
+        result = await get_transaction_statuses(request.tx_hashes)
+        return BaseResponse(success=True, message="Operation successful", data=result, error=None)
+    except Exception as e:
+        return BaseResponse(success=False, message="Operation failed", data=None, error=str(e))
+
 
 @router.get("/health")
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
 
+@router.get("/cache/stats")
+async def cache_stats():
+    return {
+        "view_cache": view_cache.stats(),
+        "payroll_contract_cache": {"hits": payroll_contract_cache.hits, "misses": payroll_contract_cache.misses},
+        "payroll_mirror": payroll_mirror.stats(),
+        "receipt_tracker": receipt_tracker.stats()
+    }
+
+
 
 
 def get_router():
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 
 # --- Schema Definitions ---
 class BaseResponse(BaseModel):
@@ -57,3 +57,19 @@ class GetDetailsRequest(BaseModel):
     employer_address: str
     contract_index: int = 0
     employee_address: Optional[str] = None
+    consistency: Literal["mirror", "live"] = "mirror"
+
+class EmployerSummaryRequest(BaseModel):
+    employer_address: str
+
+class HistoryRequest(BaseModel):
+    employer_address: Optional[str] = None
+    employee_address: Optional[str] = None
+    contract_address: Optional[str] = None
+    from_timestamp: Optional[int] = None
+    to_timestamp: Optional[int] = None
+    cursor: Optional[str] = None
+    limit: int = 50
+
+class TransactionsRequest(BaseModel):
+    tx_hashes: List[str]
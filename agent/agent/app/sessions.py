@@ -0,0 +1,164 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from app.settings import (
+    SESSION_TTL, SESSION_MAX_SESSIONS, SESSION_MAX_BYTES, SESSION_TOKEN_BUDGET, SESSION_KEEP_TURNS, SESSION_SUMMARY_TOKENS
+)
+
+logger = logging.getLogger("rika_agent")
+
+
+Turn = Dict[str, str]
+# Folds turns into the previous summary and returns the new one
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token for English text."""
+    return len(text) // 4 + 1
+
+
+def turn_text(turn: Turn) -> str:
+    return f"{turn['role']}: {turn['content']}"
+
+
+def truncate_summary(summary: str, max_tokens: int = SESSION_SUMMARY_TOKENS) -> str:
+    # Keep the end, which covers the most recent of the compacted turns
+    max_chars = max_tokens * 4
+    return summary if len(summary) <= max_chars else "..." + summary[-max_chars:]
+
+
+class Session:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.summary = ""
+        self.turns: List[Turn] = []
+        self.last_used = time.monotonic()
+        self.compacting = False
+
+    def size(self) -> int:
+        return len(self.summary.encode()) + sum(len(turn['content'].encode()) for turn in self.turns)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(turn_text(turn)) for turn in self.turns)
+
+
+class SessionStore:
+    """Conversation histories bounded in time, count, memory and prompt size.
+
+    Sessions are kept in LRU order; idle ones expire after ttl seconds, and the least
+    recently used are evicted while there are more than max_sessions or their text
+    exceeds max_bytes. When a session's history passes token_budget, every turn but
+    the last keep_turns is folded into a rolling summary by summarize (or, without
+    one or when it fails, by keeping the tail of the text), so the context put into
+    each prompt stays about the same size however long the conversation runs.
+    """
+
+    def __init__(self, summarize: Optional[Summarizer] = None, ttl: float = SESSION_TTL,
+                 max_sessions: int = SESSION_MAX_SESSIONS, max_bytes: int = SESSION_MAX_BYTES,
+                 token_budget: int = SESSION_TOKEN_BUDGET, keep_turns: int = SESSION_KEEP_TURNS):
+        self.summarize = summarize
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self._tasks: Set[asyncio.Task] = set()
+        self.evictions = 0
+        self.compactions = 0
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if time.monotonic() - session.last_used > self.ttl:
+            self.delete(session_id)
+            return None
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def create(self, session_id: str) -> Session:
+        session = self.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Session(session_id)
+            self._evict()
+        return session
+
+    def delete(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.size()
+
+    def context(self, session_id: str) -> str:
+        """The session's summary and recent turns, as put into the prompt."""
+        session = self.get(session_id)
+        if session is None or not (session.summary or session.turns):
+            return "No previous conversation."
+        lines = [f"Summary of earlier conversation: {session.summary}"] if session.summary else []
+        lines.extend(turn_text(turn) for turn in session.turns)
+        return "\n".join(lines)
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        """Adds a turn, compacting the session in the background once it is over its token budget."""
+        session = self.create(session_id)
+        session.turns.append({"role": role, "content": content})
+        self._bytes += len(content.encode())
+        if not session.compacting and session.tokens() > self.token_budget and len(session.turns) > self.keep_turns:
+            session.compacting = True
+            task = asyncio.get_running_loop().create_task(self._compact(session))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._evict()
+
+    async def _compact(self, session: Session) -> None:
+        try:
+            old_turns = session.turns[:len(session.turns) - self.keep_turns]
+            previous = session.summary
+            summary = None
+            if self.summarize is not None:
+                try:
+                    summary = await self.summarize(previous, old_turns)
+                except Exception as e:
+                    logger.warning(f"Summarising conversation failed, truncating instead: {e}")
+            if not summary:
+                summary = " ".join(filter(None, [previous] + [turn_text(turn) for turn in old_turns]))
+            summary = truncate_summary(summary)
+
+            size = session.size()
+            # Turns added while summarising stay; only the summarised ones are replaced
+            session.turns = session.turns[len(old_turns):]
+            session.summary = summary
+            self.compactions += 1
+            if self._sessions.get(session.session_id) is session:
+                self._bytes += session.size() - size
+        finally:
+            session.compacting = False
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            expired = now - session.last_used > self.ttl
+            if not (expired or len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+                return
+            self.delete(session_id)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "evictions": self.evictions,
+            "compactions": self.compactions
+        }
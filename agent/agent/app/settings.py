@@ -0,0 +1,145 @@
+import os
+from dotenv import load_dotenv
+
+# Every setting the app reads from the environment, with its built-in default.
+# Only the deployment settings at the top have no usable default; see .env.example.
+load_dotenv()
+
+# Deployment
+ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
+WEB3_PROVIDER_URI = os.getenv('WEB3_PROVIDER_URI')
+# Agent wallet, the only sender whose transactions we sign ourselves
+AGENT_WALLET_ADDRESS = os.getenv('AGENT_WALLET_ADDRESS')
+AGENT_PRIVATE_KEY = os.getenv('AGENT_PRIVATE_KEY')
+RIKA_FACTORY_CONTRACT_ADDRESS = os.getenv('RIKA_FACTORY_CONTRACT_ADDRESS')
+RIKA_MANAGEMENT_CONTRACT_ADDRESS = os.getenv('RIKA_MANAGEMENT_CONTRACT_ADDRESS')
+# Block RikaFactory was deployed in, where event indexing starts; required, there is no default
+RIKA_FACTORY_DEPLOY_BLOCK = os.getenv('RIKA_FACTORY_DEPLOY_BLOCK')
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+
+# Background workers started with the API
+# The payroll registry reads the event index; set to false only when `python -m app.indexer`
+# runs on its own against the same INDEXER_DB_PATH
+INDEXER_ENABLED = os.getenv('INDEXER_ENABLED', 'true').lower() == 'true'
+# Dispatches per-contract payroll tasks as schedules fall due, instead of a daily sweep
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'false').lower() == 'true'
+
+# Agent
+# Must support prompt caching, or every call pays for the full system prompt
+ANTHROPIC_MODEL = os.getenv('ANTHROPIC_MODEL', 'claude-sonnet-4-5-20250929')
+
+# Session store
+# Seconds a session may sit idle before it is dropped
+SESSION_TTL = float(os.getenv('SESSION_TTL', '1800'))
+SESSION_MAX_SESSIONS = int(os.getenv('SESSION_MAX_SESSIONS', '10000'))
+# Bytes of conversation text held across all sessions
+SESSION_MAX_BYTES = int(os.getenv('SESSION_MAX_BYTES', str(64 * 1024 * 1024)))
+# Estimated tokens of history per session before old turns are folded into the summary
+SESSION_TOKEN_BUDGET = int(os.getenv('SESSION_TOKEN_BUDGET', '2000'))
+# Most recent turns always kept verbatim
+SESSION_KEEP_TURNS = int(os.getenv('SESSION_KEEP_TURNS', '4'))
+# Estimated tokens a rolling summary is cut down to
+SESSION_SUMMARY_TOKENS = int(os.getenv('SESSION_SUMMARY_TOKENS', '400'))
+
+# HTTP connection pool shared by every RPC call
+RPC_POOL_SIZE = int(os.getenv('RPC_POOL_SIZE', '100'))
+RPC_TIMEOUT = int(os.getenv('RPC_TIMEOUT', '30'))
+# JSON-RPC batching
+RPC_BATCH_WINDOW = float(os.getenv('RPC_BATCH_WINDOW', '0.002'))
+RPC_MAX_BATCH_SIZE = int(os.getenv('RPC_MAX_BATCH_SIZE', '100'))
+
+# Canonical Multicall3 deployment, present on most EVM chains
+MULTICALL3_ADDRESS = os.getenv('MULTICALL3_ADDRESS', '0xcA11bde05977b3631167028862bE2a173976CA11')
+
+# Resolution cache
+PAYROLL_CACHE_SIZE = int(os.getenv('PAYROLL_CACHE_SIZE', '10000'))
+PAYROLL_CACHE_TTL = float(os.getenv('PAYROLL_CACHE_TTL', '600'))
+PAYROLL_CREATION_PENDING_TTL = float(os.getenv('PAYROLL_CREATION_PENDING_TTL', '300'))
+# Contract object registry
+CONTRACT_REGISTRY_SIZE = int(os.getenv('CONTRACT_REGISTRY_SIZE', '1024'))
+# View cache
+VIEW_CACHE_SIZE = int(os.getenv('VIEW_CACHE_SIZE', '50000'))
+VIEW_CACHE_MAX_AGE = float(os.getenv('VIEW_CACHE_MAX_AGE', '10'))
+
+# Fee oracle
+FEE_REFRESH_INTERVAL = float(os.getenv('FEE_REFRESH_INTERVAL', '5'))
+FEE_MAX_AGE = float(os.getenv('FEE_MAX_AGE', '30'))
+FEE_HISTORY_BLOCKS = int(os.getenv('FEE_HISTORY_BLOCKS', '10'))
+FEE_REWARD_PERCENTILE = float(os.getenv('FEE_REWARD_PERCENTILE', '50'))
+# Headroom on the base fee so a type-2 transaction survives a few full blocks
+FEE_BASE_FEE_MULTIPLIER = float(os.getenv('FEE_BASE_FEE_MULTIPLIER', '2'))
+
+# Gas model
+GAS_MODEL_MIN_SAMPLES = int(os.getenv('GAS_MODEL_MIN_SAMPLES', '5'))
+GAS_MODEL_WINDOW = int(os.getenv('GAS_MODEL_WINDOW', '50'))
+GAS_MODEL_HEADROOM = float(os.getenv('GAS_MODEL_HEADROOM', '1.2'))
+# Largest relative spread between samples the model still trusts
+GAS_MODEL_MAX_SPREAD = float(os.getenv('GAS_MODEL_MAX_SPREAD', '0.25'))
+
+# Receipt tracker
+# Seconds between checks for a new block while transactions are pending
+RECEIPT_POLL_INTERVAL = float(os.getenv('RECEIPT_POLL_INTERVAL', '2'))
+# Seconds a transaction may stay unmined before it is given up on
+RECEIPT_TIMEOUT = float(os.getenv('RECEIPT_TIMEOUT', '300'))
+# Finished transactions kept in the status table
+RECEIPT_TABLE_SIZE = int(os.getenv('RECEIPT_TABLE_SIZE', '10000'))
+
+# Payroll pre-flight
+# Contracts simulated at once
+PREFLIGHT_CONCURRENCY = int(os.getenv('PREFLIGHT_CONCURRENCY', '50'))
+# Contracts per Multicall3 aggregation of the role and pause checks
+PREFLIGHT_BATCH_SIZE = int(os.getenv('PREFLIGHT_BATCH_SIZE', '200'))
+
+# Payroll mirror
+MIRROR_MAX_CONTRACTS = int(os.getenv('MIRROR_MAX_CONTRACTS', '1000'))
+# Employees refreshed per Multicall3 aggregation
+MIRROR_BATCH_SIZE = int(os.getenv('MIRROR_BATCH_SIZE', '200'))
+# Pairs bootstrapped at once by track()
+MIRROR_TRACK_CONCURRENCY = int(os.getenv('MIRROR_TRACK_CONCURRENCY', '10'))
+# Blocks behind the head a reorg is looked for; pairs are re-read when a deeper one is found
+MIRROR_REORG_DEPTH = int(os.getenv('MIRROR_REORG_DEPTH', '64'))
+# Mirror every registered payroll contract, not only the ones read so far
+MIRROR_TRACK_ALL = os.getenv('MIRROR_TRACK_ALL', 'false').lower() == 'true'
+MIRROR_RECONCILE_INTERVAL = float(os.getenv('MIRROR_RECONCILE_INTERVAL', '300'))
+
+# Event watcher
+# Seconds between eth_getLogs polls
+EVENT_POLL_INTERVAL = float(os.getenv('EVENT_POLL_INTERVAL', '2'))
+# Payroll contract addresses per eth_getLogs filter
+EVENT_MAX_ADDRESSES = int(os.getenv('EVENT_MAX_ADDRESSES', '500'))
+
+# Payroll registry
+# Seconds between reads of the event indexer's factory checkpoint
+REGISTRY_SYNC_INTERVAL = float(os.getenv('REGISTRY_SYNC_INTERVAL', '2'))
+
+# Event indexer
+# Location of the local event index
+INDEXER_DB_PATH = os.getenv('INDEXER_DB_PATH', 'rika_events.db')
+INDEXER_POLL_INTERVAL = float(os.getenv('INDEXER_POLL_INTERVAL', '2'))
+INDEXER_INITIAL_CHUNK = int(os.getenv('INDEXER_INITIAL_CHUNK', '1000'))
+INDEXER_MIN_CHUNK = int(os.getenv('INDEXER_MIN_CHUNK', '1'))
+INDEXER_MAX_CHUNK = int(os.getenv('INDEXER_MAX_CHUNK', '10000'))
+# Shrink the range when a chunk returns more logs than this
+INDEXER_TARGET_LOGS = int(os.getenv('INDEXER_TARGET_LOGS', '2000'))
+INDEXER_MAX_ADDRESSES = int(os.getenv('INDEXER_MAX_ADDRESSES', '500'))
+# Blocks a log must be buried under before it is indexed
+INDEXER_CONFIRMATIONS = int(os.getenv('INDEXER_CONFIRMATIONS', '3'))
+# Blocks below the newest indexed block whose hashes are kept for reorg detection
+INDEXER_REORG_WINDOW = int(os.getenv('INDEXER_REORG_WINDOW', '256'))
+
+# Payroll runs
+# Batches of one payroll run processed at the same time across workers
+PAYROLL_MAX_PARALLEL = int(os.getenv('PAYROLL_MAX_PARALLEL', '8'))
+# Seconds the agent wallet lock outlives its last renewal; it is renewed before every build and send
+WALLET_LOCK_TIMEOUT = float(os.getenv('WALLET_LOCK_TIMEOUT', '60'))
+
+# Due-date scheduler
+# Seconds before a dispatched contract is dispatched again if its due time has not moved
+SCHEDULER_RETRY_DELAY = float(os.getenv('SCHEDULER_RETRY_DELAY', '600'))
+# Upper bound on a single sleep, so clock drift and missed wakeups self-correct
+SCHEDULER_MAX_SLEEP = float(os.getenv('SCHEDULER_MAX_SLEEP', '60'))
+# Seconds between reads of the payroll contracts the mirror does not hold
+SCHEDULER_TRACK_INTERVAL = float(os.getenv('SCHEDULER_TRACK_INTERVAL', '300'))
+# Seconds the leader lock outlives its last renewal, so a dead leader is replaced
+SCHEDULER_LEADER_TTL = float(os.getenv('SCHEDULER_LEADER_TTL', '30'))
@@ -1,26 +1,34 @@
-from celery import Celery
+from celery import Celery, chord
 from celery.schedules import crontab
-from app.contract.client import get_all_payroll_contracts_with_employers, process_all_payrolls
-from web3 import Web3
+from web3 import AsyncWeb3
+from app.contract.submitter import PipelinedSubmitter, Submission, MINED
+from app.contract.preflight import SENDER_NOT_EMPLOYER
+from app.contract.client import (
+    w3, nonce_manager, receipt_tracker, connect, disconnect, get_all_payroll_contracts_with_employers,
+    get_employer_payrolls, preflight_payroll_contracts, process_all_payrolls, record_transaction_gas
+)
+import asyncio
 import logging
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import redis.asyncio as redis
+from redis.exceptions import LockError
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Tuple
+from app.settings import (
+    AGENT_WALLET_ADDRESS, AGENT_PRIVATE_KEY, PAYROLL_MAX_PARALLEL, WALLET_LOCK_TIMEOUT, CELERY_BROKER_URL,
+    CELERY_RESULT_BACKEND
+)
 
 logger = logging.getLogger(__name__)
 
-# Web3 and wallet setup
-w3 = Web3(Web3.HTTPProvider(os.getenv('WEB3_PROVIDER_URI')))
-AGENT_WALLET_ADDRESS = os.getenv("AGENT_WALLET_ADDRESS")
-AGENT_PRIVATE_KEY = os.getenv("AGENT_PRIVATE_KEY")
-
 celery_app = Celery(
     "rika_worker",
-    broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
-    backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+    broker=CELERY_BROKER_URL,
+    backend=CELERY_RESULT_BACKEND
 )
 
+# Sends the agent wallet's payroll transactions without waiting between them
+submitter = PipelinedSubmitter(w3, nonce_manager, receipt_tracker, AGENT_WALLET_ADDRESS, AGENT_PRIVATE_KEY)
+
 celery_app.conf.update(
     result_expires=3600,
     task_serializer='json',
@@ -30,39 +38,174 @@ celery_app.conf.update(
     enable_utc=True,
 )
 
+@asynccontextmanager
+async def _wallet_lock():
+    """Serialises agent wallet sends across worker processes, resyncing the local nonce under the lock.
+
+    Yields a keepalive coroutine that renews the lock; it raises LockError once the
+    lock has been lost, after which nothing more may be sent.
+    """
+    client = redis.from_url(CELERY_BROKER_URL)
+    lock = client.lock("rika:agent-wallet", timeout=WALLET_LOCK_TIMEOUT, blocking_timeout=WALLET_LOCK_TIMEOUT)
+    try:
+        if not await lock.acquire():
+            raise LockError("Timed out waiting for the agent wallet lock")
+        try:
+            # Another worker may have used the next nonce; its transaction is in the pending count
+            await nonce_manager.resync(AGENT_WALLET_ADDRESS)
+            yield lambda: lock.extend(WALLET_LOCK_TIMEOUT, replace_ttl=True)
+        finally:
+            try:
+                await lock.release()
+            except LockError as e:
+                # What was sent is on the wire already and is still confirmed and reported
+                logger.error(f"Agent wallet lock was lost before release: {e}")
+    finally:
+        await client.aclose()
+
+async def _contract_index(employer_address: str, contract_address: str) -> int:
+    contracts = [contract.lower() for contract in await get_employer_payrolls(employer_address)]
+    if contract_address.lower() not in contracts:
+        raise Exception(f"{contract_address} is not a payroll contract of {employer_address}")
+    return contracts.index(contract_address.lower())
+
+async def _submit_payrolls(pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Sends processAllPayrolls for every (employer, contract) pair back to back, then confirms them together."""
+    async def build(employer: str, contract: str) -> Dict[str, Any]:
+        index = await _contract_index(employer, contract)
+        return await process_all_payrolls(employer, index, sender_address=AGENT_WALLET_ADDRESS)
+
+    submissions = [Submission((employer, contract), lambda e=employer, c=contract: build(e, c)) for employer, contract in pairs]
+    async with _wallet_lock() as keepalive:
+        await submitter.build(submissions, keepalive)
+        await submitter.broadcast(submissions, keepalive)
+    await submitter.confirm(submissions)
+
+    results = []
+    for submission in submissions:
+        employer, contract = submission.key
+        if submission.receipt is not None:
+            record_transaction_gas(submission.tx, submission.receipt)
+        if submission.status == MINED:
+            logger.info(f"Processed payroll for {contract}: TX Hash {AsyncWeb3.to_hex(submission.tx_hash)}")
+            message = f"Payroll processed for {contract}."
+        else:
+            logger.error(f"Payroll for {contract} was not processed: {submission.status} {submission.error or ''}")
+            message = f"Payroll for {contract} was not processed."
+        results.append({
+            "employer_address": employer,
+            "contract_address": contract,
+            "status": "success" if submission.status == MINED else "error",
+            "message": message,
+            "transaction": submission.result()
+        })
+    return results
+
+async def _plan_payroll_run() -> Dict[str, Any]:
+    """Pre-flights every employer-contract pair in the payroll registry."""
+    result = await get_all_payroll_contracts_with_employers()
+    if "error" in result:
+        raise Exception(result["error"])
+
+    report = await preflight_payroll_contracts(list(zip(result["employers"], result["contracts"])))
+    if "error" in report:
+        raise Exception(report["error"])
+    for entry in report["skipped"]:
+        # The agent wallet cannot pay this employer's employees at all; say so rather than skip quietly
+        log = logger.error if entry["reason"] == SENDER_NOT_EMPLOYER else logger.info
+        log(f"Skipping payroll for {entry['contract_address']}: {entry['reason']} {entry['detail'] or ''}")
+    return report
+
+async def _process_payroll_for_contract(employer_address: str, contract_address: str) -> Dict[str, Any]:
+    """Processes payroll for one of the employer's payroll contracts, if the pre-flight simulation passes."""
+    await _contract_index(employer_address, contract_address)
+
+    report = await preflight_payroll_contracts([(employer_address, contract_address)])
+    if "error" in report:
+        raise Exception(report["error"])
+    if report["skipped"]:
+        skipped = report["skipped"][0]
+        if skipped["reason"] == SENDER_NOT_EMPLOYER:
+            raise Exception(skipped["detail"])
+        return {"status": "skipped", "message": f"{skipped['reason']} {skipped['detail'] or ''}".strip()}
+
+    (result,) = await _submit_payrolls([(employer_address, contract_address)])
+    return {"status": result["status"], "message": result["message"], "transaction": result["transaction"]}
+
+async def _run(coro):
+    """Runs a coroutine inside a pooled RPC session for the lifetime of one task."""
+    await connect()
+    try:
+        return await coro
+    finally:
+        await disconnect()
+
 @celery_app.task
 def process_payroll_for_all_employers():
-    """Celery task to process payroll for all employers and their contracts."""
+    """Celery task coordinating payroll for all employers and their contracts.
+
+    Every contract is pre-flighted here; the ones that would pay out are split into
+    at most PAYROLL_MAX_PARALLEL batches, each sent and confirmed as one pipelined
+    run by a worker, and a chord collects the batches into one summary.
+    """
     try:
-        result = get_all_payroll_contracts_with_employers()
-        if "error" in result:
-            raise Exception(result["error"])
-            
-        employers = result["employers"]
-        contracts = result["contracts"]
-        
-        for employer, contract in zip(employers, contracts):
-            # Get the transaction data
-            process_result = process_all_payrolls(employer)
-            
-            if "transaction" in process_result:
-                # Sign and send transaction
-                signed_txn = w3.eth.account.sign_transaction(
-                    process_result["transaction"],
-                    private_key=AGENT_PRIVATE_KEY
-                )
-                
-                # Send the signed transaction
-                tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-                
-                # Wait for transaction receipt
-                tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-                
-                logger.info(f"Processed payroll for employer {employer}: TX Hash {tx_hash.hex()}")
-            else:
-                logger.error(f"No transaction data for employer {employer}")
-        
-        return {"status": "success", "message": "Payroll processing completed for all employers."}
+        report = asyncio.run(_run(_plan_payroll_run()))
+        ready = [(entry["employer_address"], entry["contract_address"]) for entry in report["ready"]]
+        if not ready:
+            unpayable = report["skipped_by_reason"].get(SENDER_NOT_EMPLOYER, 0)
+            if unpayable:
+                return {
+                    "status": "error",
+                    "message": f"The agent wallet cannot process payroll for {unpayable} contracts of other employers.",
+                    "skipped": report["skipped"]
+                }
+            return {"status": "success", "message": "No payroll contracts are due.", "skipped": report["skipped"]}
+
+        batches = [ready[i::PAYROLL_MAX_PARALLEL] for i in range(min(PAYROLL_MAX_PARALLEL, len(ready)))]
+        summary = chord(
+            process_payroll_batch.s(batch) for batch in batches
+        )(summarise_payroll_run.s(report["skipped"]))
+        return {
+            "status": "dispatched",
+            "message": f"Payroll dispatched for {len(ready)} contracts in {len(batches)} batches.",
+            "summary_task_id": summary.id,
+            "skipped": report["skipped"]
+        }
     except Exception as e:
         logger.error(f"Error processing payroll: {e}")
         return {"status": "error", "message": str(e)}
+
+@celery_app.task
+def process_payroll_batch(pairs: List[List[str]]):
+    """Processes a batch of pre-flighted payroll contracts as one pipelined run."""
+    try:
+        return asyncio.run(_run(_submit_payrolls([tuple(pair) for pair in pairs])))
+    except Exception as e:
+        logger.error(f"Error processing payroll batch: {e}")
+        return [
+            {"employer_address": employer, "contract_address": contract, "status": "error", "message": str(e)}
+            for employer, contract in pairs
+        ]
+
+@celery_app.task
+def summarise_payroll_run(batch_results: List[List[Dict[str, Any]]], skipped: List[Dict[str, Any]]):
+    """Aggregates the per-contract results of a payroll run."""
+    results = [result for batch in batch_results for result in batch]
+    processed = [result for result in results if result["status"] == "success"]
+    failed = [result for result in results if result["status"] != "success"]
+    return {
+        "status": "success",
+        "message": f"Processed payroll for {len(processed)} of {len(results)} contracts.",
+        "processed": processed,
+        "failed": failed,
+        "skipped": skipped
+    }
+
+@celery_app.task
+def process_payroll_for_contract(employer_address: str, contract_address: str):
+    """Celery task to process payroll for a single payroll contract once it is due."""
+    try:
+        return asyncio.run(_run(_process_payroll_for_contract(employer_address, contract_address)))
+    except Exception as e:
+        logger.error(f"Error processing payroll for {contract_address}: {e}")
+        return {"status": "error", "message": str(e)}
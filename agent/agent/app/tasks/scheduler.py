@@ -0,0 +1,184 @@
+import time
+import heapq
+import asyncio
+import logging
+import redis.asyncio as redis
+from redis.exceptions import LockError
+from typing import Callable, Dict, List, Optional, Tuple
+from web3 import AsyncWeb3
+from app.contract.cache import view_cache
+from app.contract.client import payroll_mirror, read_unmirrored_payrolls
+from app.contract.mirror import MirrorState
+from app.tasks.celery import process_payroll_for_contract
+from app.settings import (
+    CELERY_BROKER_URL, SCHEDULER_RETRY_DELAY, SCHEDULER_MAX_SLEEP, SCHEDULER_TRACK_INTERVAL, SCHEDULER_LEADER_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PayrollScheduler:
+    """Dispatches payroll for each contract when its earliest schedule falls due.
+
+    Due times come from the payroll mirror (lastProcessedDate plus the interval, as
+    getIntervalDuration computes it) and sit in a min-heap keyed by time. The mirror
+    reports every change to a pair's employees or schedules and the pair's entry
+    is replaced; superseded heap entries are skipped when they surface. Pairs the
+    mirror does not hold keep their entry and are re-read by track_payrolls. A dispatched
+    pair is dispatched again after SCHEDULER_RETRY_DELAY unless the run's SalaryPaid
+    events move its due time first.
+    """
+
+    def __init__(self, dispatch: Callable[[str, str], None]):
+        self.dispatch = dispatch
+        self._heap: List[Tuple[float, str, str]] = []
+        self._due: Dict[Tuple[str, str], float] = {}
+        # Due time of the schedules a dispatched run is expected to pay
+        self._dispatched: Dict[Tuple[str, str], float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self.dispatches = 0
+
+    def update(self, key: Tuple[str, str], state: MirrorState) -> None:
+        """Mirror listener: reschedules the pair from its current schedules."""
+        due = state.next_due()
+        if key in self._dispatched:
+            if due is not None and due <= self._dispatched[key]:
+                # Not paid yet; the dispatched run or its retry is still pending
+                return
+            del self._dispatched[key]
+        self.schedule(key, due)
+
+    def schedule(self, key: Tuple[str, str], due: Optional[float]) -> None:
+        if due is None:
+            if self._due.pop(key, None) is None:
+                return
+        elif self._due.get(key) == due:
+            return
+        else:
+            self._due[key] = due
+            heapq.heappush(self._heap, (due, key[0], key[1]))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._due.clear()
+        self._dispatched.clear()
+
+    def _is_current(self, entry: Tuple[float, str, str]) -> bool:
+        return self._due.get((entry[1], entry[2])) == entry[0]
+
+    def pop_due(self, now: float) -> List[Tuple[str, str]]:
+        """Removes and returns every pair due at or before now."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._is_current(entry):
+                key = (entry[1], entry[2])
+                self._dispatched.setdefault(key, self._due.pop(key))
+                due.append(key)
+        return due
+
+    def seconds_until_next(self, now: float) -> float:
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return SCHEDULER_MAX_SLEEP
+        return min(max(0.0, self._heap[0][0] - now), SCHEDULER_MAX_SLEEP)
+
+    async def run(self) -> None:
+        """Sleeps until the earliest due time or a reschedule, and dispatches whatever is due."""
+        self._wakeup = asyncio.Event()
+        while True:
+            now = time.time()
+            for contract, employer in self.pop_due(now):
+                try:
+                    await asyncio.to_thread(
+                        self.dispatch,
+                        AsyncWeb3.to_checksum_address(employer), AsyncWeb3.to_checksum_address(contract)
+                    )
+                    self.dispatches += 1
+                    logger.info(f"Dispatched payroll for {contract}")
+                except Exception as e:
+                    logger.error(f"Error dispatching payroll for {contract}: {e}")
+                self.schedule((contract, employer), now + SCHEDULER_RETRY_DELAY)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.seconds_until_next(time.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {"scheduled": len(self._due), "awaiting_payment": len(self._dispatched), "dispatches": self.dispatches}
+
+
+payroll_scheduler = PayrollScheduler(lambda employer, contract: process_payroll_for_contract.delay(employer, contract))
+
+
+async def track_payrolls() -> None:
+    """Schedules the registered payroll contracts the mirror does not hold from periodic reads.
+
+    The mirror holds at most MIRROR_MAX_CONTRACTS pairs, so the scheduler covers the
+    rest, new and evicted pairs alike, without bootstrapping them into the mirror.
+    """
+    while True:
+        interval = SCHEDULER_MAX_SLEEP / 10
+        try:
+            if payroll_mirror.is_live(view_cache.head()):
+                for key, state in await read_unmirrored_payrolls():
+                    payroll_scheduler.update(key, state)
+                interval = SCHEDULER_TRACK_INTERVAL
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error loading payroll schedules: {e}")
+        await asyncio.sleep(interval)
+
+
+async def hold_leadership(lock) -> None:
+    """Renews the leader lock until it is lost, then raises."""
+    while True:
+        await asyncio.sleep(SCHEDULER_LEADER_TTL / 3)
+        await lock.extend(SCHEDULER_LEADER_TTL, replace_ttl=True)
+
+
+async def run_payroll_scheduler() -> None:
+    """Dispatches each payroll contract's payroll as it falls due, from one API process at a time.
+
+    Every process runs this, but only the holder of a Redis leader lock schedules and
+    dispatches; the others wait to take over if the leader stops renewing it.
+    """
+    client = redis.from_url(CELERY_BROKER_URL)
+    try:
+        while True:
+            lock = client.lock("rika:payroll-scheduler", timeout=SCHEDULER_LEADER_TTL)
+            if not await lock.acquire(blocking=False):
+                await asyncio.sleep(SCHEDULER_LEADER_TTL / 3)
+                continue
+
+            logger.info("Leading the payroll scheduler")
+            payroll_mirror.listeners.append(payroll_scheduler.update)
+            # Pairs mirrored before this process became leader
+            for key, state in payroll_mirror.states():
+                payroll_scheduler.update(key, state)
+            tasks = [
+                asyncio.create_task(payroll_scheduler.run()),
+                asyncio.create_task(track_payrolls()),
+                asyncio.create_task(hold_leadership(lock)),
+            ]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    logger.error(f"Payroll scheduler stopped leading: {task.exception()}")
+            finally:
+                for task in tasks:
+                    task.cancel()
+                payroll_mirror.listeners.remove(payroll_scheduler.update)
+                payroll_scheduler.clear()
+                try:
+                    await lock.release()
+                except LockError:
+                    pass
+    finally:
+        await client.aclose()
@@ -1,13 +1,43 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.web3 import client
 from app.routes.agent import agent
 from app.routes.celery import celery
+from app.contract.client import connect, disconnect, fee_oracle, payroll_registry, reconcile_payroll_mirror
+from app.contract.events import watch_contract_events
+from app.indexer.indexer import event_indexer, factory_deploy_block
+from app.tasks.scheduler import run_payroll_scheduler
+from app.settings import INDEXER_ENABLED, SCHEDULER_ENABLED
 
 
-import os
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if INDEXER_ENABLED:
+        # Refuse to start rather than index from genesis
+        factory_deploy_block()
+    # Share one pooled RPC session across all requests
+    await connect()
+    # Background workers: contract event watcher, fee refresh, payroll registry sync and mirror reconciliation
+    background = [
+        asyncio.create_task(watch_contract_events()),
+        asyncio.create_task(fee_oracle.run()),
+        asyncio.create_task(payroll_registry.run()),
+        asyncio.create_task(reconcile_payroll_mirror()),
+    ]
+    # The payroll registry reads the event index, which `python -m app.indexer` can also maintain on its own
+    if INDEXER_ENABLED:
+        background.append(asyncio.create_task(event_indexer.run()))
+    # Dispatches per-contract payroll tasks as schedules fall due, instead of a daily sweep
+    if SCHEDULER_ENABLED:
+        background.append(asyncio.create_task(run_payroll_scheduler()))
+    yield
+    for task in background:
+        task.cancel()
+    await disconnect()
 
-app = FastAPI(title="RikaPayroll API", version="1.0.0")
+app = FastAPI(title="RikaPayroll API", version="1.0.0", lifespan=lifespan)
 
 # CORS Configuration
 app.add_middleware(
@@ -0,0 +1,108 @@
+import json
+import time
+import shutil
+import socket
+import subprocess
+from pathlib import Path
+
+import pytest
+
+FIXTURES = Path(__file__).parent / "fixtures"
+# Foundry build output of the Rika contracts
+ARTIFACTS = Path(__file__).resolve().parents[2] / "contract" / "out"
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+
+def artifact(name: str):
+    """Returns (abi, bytecode) from the Foundry artifact of contract name."""
+    path = ARTIFACTS / f"{name}.sol" / f"{name}.json"
+    if not path.exists():
+        pytest.skip(f"{path} not built")
+    data = json.loads(path.read_text())
+    return data["abi"], data["bytecode"]["object"]
+
+
+def deploy_code(runtime: str) -> str:
+    """Creation code that returns runtime unchanged."""
+    code = bytes.fromhex(runtime.removeprefix("0x"))
+    # PUSH2 len, DUP1, PUSH1 12, PUSH1 0, CODECOPY, PUSH1 0, RETURN
+    prefix = bytes([0x61]) + len(code).to_bytes(2, "big") + bytes.fromhex("80600c6000396000f3")
+    return "0x" + (prefix + code).hex()
+
+
+class LocalChain:
+    """A development chain with unlocked accounts and a Multicall3 deployment, for one asyncio.run."""
+
+    def __init__(self, make_provider, set_code: bool):
+        self.make_provider = make_provider
+        self.set_code = set_code
+        self.w3 = None
+        self.multicall = None
+
+    async def start(self):
+        from web3 import AsyncWeb3
+        from app.contract.abi import MULTICALL3_ABI
+
+        self.w3 = AsyncWeb3(self.make_provider())
+        runtime = (FIXTURES / "multicall3.hex").read_text().strip()
+        if self.set_code:
+            await self.w3.provider.make_request("anvil_setCode", [MULTICALL3_ADDRESS, runtime])
+            address = MULTICALL3_ADDRESS
+        else:
+            tx_hash = await self.w3.eth.send_transaction({"from": (await self.accounts())[0], "data": deploy_code(runtime)})
+            address = (await self.w3.eth.wait_for_transaction_receipt(tx_hash))["contractAddress"]
+        self.multicall = self.w3.eth.contract(address=address, abi=MULTICALL3_ABI)
+        return self
+
+    async def accounts(self):
+        return await self.w3.eth.accounts
+
+    async def deploy(self, name: str, *args, sender=None):
+        abi, bytecode = artifact(name)
+        sender = sender or (await self.accounts())[0]
+        tx_hash = await self.w3.eth.contract(abi=abi, bytecode=bytecode).constructor(*args).transact({"from": sender})
+        receipt = await self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        return self.w3.eth.contract(address=receipt["contractAddress"], abi=abi)
+
+    async def transact(self, function, sender):
+        tx_hash = await function.transact({"from": sender})
+        return await self.w3.eth.wait_for_transaction_receipt(tx_hash)
+
+    async def snapshot(self):
+        return (await self.w3.provider.make_request("evm_snapshot", []))["result"]
+
+    async def revert(self, snapshot_id) -> None:
+        await self.w3.provider.make_request("evm_revert", [snapshot_id])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def local_chain():
+    """anvil when it is installed, otherwise eth-tester's in-process chain; skipped without either."""
+    pytest.importorskip("web3")
+    anvil = shutil.which("anvil")
+    if anvil is None:
+        pytest.importorskip("eth_tester")
+        from web3.providers.eth_tester import AsyncEthereumTesterProvider
+        yield LocalChain(AsyncEthereumTesterProvider, set_code=False)
+        return
+
+    from web3 import AsyncHTTPProvider
+    port = free_port()
+    process = subprocess.Popen([anvil, "--port", str(port), "--silent"])
+    try:
+        for _ in range(50):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        yield LocalChain(lambda: AsyncHTTPProvider(f"http://127.0.0.1:{port}"), set_code=True)
+    finally:
+        process.terminate()
+        process.wait()
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("web3")
+
+from web3 import AsyncHTTPProvider
+
+from app.contract.batch import BatchingAsyncHTTPProvider
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    async def make_request(self, method, params):
+        return {"jsonrpc": "2.0", "id": 1, "result": method}
+
+    async def make_batch_request(self, requests):
+        return [{"jsonrpc": "2.0", "id": index, "result": method} for index, (method, _) in enumerate(requests)]
+
+    monkeypatch.setattr(AsyncHTTPProvider, "make_request", make_request)
+    monkeypatch.setattr(BatchingAsyncHTTPProvider, "make_batch_request", make_batch_request)
+    return BatchingAsyncHTTPProvider("http://localhost:8545", batch_window=0.01)
+
+
+def test_concurrent_requests_share_one_batch(provider):
+    async def main():
+        return await asyncio.gather(provider.make_request("eth_chainId", []), provider.make_request("eth_blockNumber", []))
+
+    assert [response["result"] for response in asyncio.run(main())] == ["eth_chainId", "eth_blockNumber"]
+    assert (provider.batches_sent, provider.requests_batched) == (1, 2)
+
+
+def test_queue_left_by_a_closed_loop_does_not_stall_the_next(provider):
+    async def abandon():
+        # The loop closes before the flush timer fires, leaving the request queued
+        task = asyncio.get_running_loop().create_task(provider.make_request("eth_chainId", []))
+        await asyncio.sleep(0)
+        task.cancel()
+
+    async def request():
+        return await asyncio.wait_for(provider.make_request("eth_blockNumber", []), timeout=1)
+
+    asyncio.run(abandon())
+    assert asyncio.run(request())["result"] == "eth_blockNumber"
+
+
+def test_flush_tasks_are_held_until_they_finish(provider, monkeypatch):
+    async def main():
+        released = asyncio.Event()
+
+        async def make_request(self, method, params):
+            await released.wait()
+            return {"jsonrpc": "2.0", "id": 1, "result": method}
+
+        monkeypatch.setattr(AsyncHTTPProvider, "make_request", make_request)
+        request = asyncio.get_running_loop().create_task(provider.make_request("eth_chainId", []))
+        await asyncio.sleep(0.05)
+        # The flush is waiting on the node, and only the provider references its task
+        held = len(provider._tasks)
+        released.set()
+        await request
+        await asyncio.sleep(0)
+        return held
+
+    assert asyncio.run(main()) == 1
+    assert provider._tasks == set()
@@ -0,0 +1,179 @@
+import pytest
+
+from app.contract import cache
+from app.contract.cache import PayrollContractCache, ContractRegistry, ViewCache
+
+EMPLOYER = "0x00000000000000000000000000000000000000E1"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_payroll_cache_hit_until_ttl(clock):
+    payrolls = PayrollContractCache(ttl=60)
+    payrolls.set(EMPLOYER, ["0xC1"], payrolls.version(EMPLOYER))
+    assert payrolls.get(EMPLOYER.lower()) == ["0xC1"]
+    clock.now += 60
+    assert payrolls.get(EMPLOYER) is None
+    assert (payrolls.hits, payrolls.misses) == (1, 1)
+
+
+def test_payroll_cache_keeps_empty_lists(clock):
+    payrolls = PayrollContractCache()
+    payrolls.set(EMPLOYER, [], payrolls.version(EMPLOYER))
+    assert payrolls.get(EMPLOYER) == []
+
+
+def test_payroll_cache_invalidate_drops_entry(clock):
+    payrolls = PayrollContractCache()
+    payrolls.set(EMPLOYER, ["0xC1"], payrolls.version(EMPLOYER))
+    payrolls.invalidate(EMPLOYER)
+    assert payrolls.get(EMPLOYER) is None
+
+
+def test_payroll_cache_ignores_fetch_raced_by_invalidation(clock):
+    payrolls = PayrollContractCache()
+    version = payrolls.version(EMPLOYER)
+    # A factory log arrives while the list is being fetched
+    payrolls.invalidate(EMPLOYER)
+    payrolls.set(EMPLOYER, ["0xC1"], version)
+    assert payrolls.get(EMPLOYER) is None
+
+
+def test_payroll_cache_bypassed_while_creation_pending(clock):
+    payrolls = PayrollContractCache(pending_ttl=30)
+    payrolls.mark_pending(EMPLOYER)
+    payrolls.set(EMPLOYER, ["0xC1"], payrolls.version(EMPLOYER))
+    assert payrolls.is_pending(EMPLOYER)
+    assert payrolls.get(EMPLOYER) is None
+
+    clock.now += 30
+    assert not payrolls.is_pending(EMPLOYER)
+    assert payrolls.get(EMPLOYER) is None
+    payrolls.set(EMPLOYER, ["0xC1"], payrolls.version(EMPLOYER))
+    assert payrolls.get(EMPLOYER) == ["0xC1"]
+
+
+def test_payroll_cache_invalidate_ends_pending_creation(clock):
+    payrolls = PayrollContractCache()
+    payrolls.mark_pending(EMPLOYER)
+    payrolls.invalidate(EMPLOYER)
+    payrolls.set(EMPLOYER, ["0xC1", "0xC2"], payrolls.version(EMPLOYER))
+    assert payrolls.get(EMPLOYER) == ["0xC1", "0xC2"]
+
+
+def test_payroll_cache_evicts_least_recently_used(clock):
+    payrolls = PayrollContractCache(max_size=2)
+    for employer in ("0xA", "0xB"):
+        payrolls.set(employer, [employer], payrolls.version(employer))
+    payrolls.get("0xA")
+    payrolls.set("0xC", ["0xC"], payrolls.version("0xC"))
+    assert payrolls.get("0xB") is None
+    assert payrolls.get("0xA") == ["0xA"]
+
+
+def test_contract_registry_builds_each_contract_once():
+    built = []
+    registry = ContractRegistry(lambda address: built.append(address) or object())
+    first = registry.get("0xAbC")
+    assert registry.get("0xabc") is first
+    assert built == ["0xAbC"]
+    assert (registry.hits, registry.misses) == (1, 1)
+
+
+def test_contract_registry_evicts_least_recently_used():
+    registry = ContractRegistry(lambda address: object(), max_size=2)
+    first = registry.get("0xA")
+    registry.get("0xB")
+    registry.get("0xA")
+    registry.get("0xC")
+    assert len(registry) == 2
+    assert registry.get("0xA") is first
+    assert registry.misses == 3
+    registry.get("0xB")
+    assert registry.misses == 4
+
+
+def cached_view(views, key, value, employer=EMPLOYER):
+    views.set(key, value, employer, views.head(), views.version(employer))
+
+
+def test_view_cache_misses_without_a_head(clock):
+    views = ViewCache()
+    cached_view(views, "balance", 5)
+    assert views.get("balance") == (False, None)
+
+
+def test_view_cache_entries_survive_new_heads(clock):
+    views = ViewCache()
+    views.on_new_head(100)
+    cached_view(views, "balance", 5)
+    views.on_new_head(101)
+    assert views.get("balance") == (True, 5)
+
+
+def test_view_cache_head_never_moves_back(clock):
+    views = ViewCache()
+    views.on_new_head(100)
+    views.on_new_head(99)
+    assert views.head() == 100
+
+
+def test_view_cache_steps_aside_when_head_is_stale(clock):
+    views = ViewCache(max_age=10)
+    views.on_new_head(100)
+    cached_view(views, "balance", 5)
+    clock.now += 11
+    assert views.head() is None
+    assert views.get("balance") == (False, None)
+
+
+def test_view_cache_invalidates_only_the_employer(clock):
+    other = "0x00000000000000000000000000000000000000E2"
+    views = ViewCache()
+    views.on_new_head(100)
+    cached_view(views, "balance", 5)
+    cached_view(views, "other-balance", 7, other)
+    views.invalidate_employer(EMPLOYER.lower())
+    assert views.get("balance") == (False, None)
+    assert views.get("other-balance") == (True, 7)
+
+
+def test_view_cache_ignores_reads_raced_by_invalidation(clock):
+    views = ViewCache()
+    views.on_new_head(100)
+    version = views.version(EMPLOYER)
+    views.invalidate_employer(EMPLOYER)
+    views.set("balance", 5, EMPLOYER, 100, version)
+    assert views.get("balance") == (False, None)
+
+
+def test_view_cache_ignores_reads_from_an_old_head(clock):
+    views = ViewCache()
+    views.on_new_head(101)
+    views.set("balance", 5, EMPLOYER, 100, views.version(EMPLOYER))
+    assert views.get("balance") == (False, None)
+
+
+def test_view_cache_evicts_least_recently_used(clock):
+    views = ViewCache(max_size=2)
+    views.on_new_head(100)
+    for key in ("a", "b"):
+        cached_view(views, key, key)
+    views.get("a")
+    cached_view(views, "c", "c")
+    assert views.get("b") == (False, None)
+    assert views.get("a") == (True, "a")
+    assert views.stats()["size"] == 2
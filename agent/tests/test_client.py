@@ -0,0 +1,190 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("web3")
+
+from hexbytes import HexBytes
+from web3 import AsyncWeb3
+
+from app.contract import client
+from app.contract.abi import RIKA_FACTORY_ABI, RIKA_MANAGEMENT_ABI
+from app.contract.cache import ContractRegistry
+from app.contract.gas import GasModel
+
+FACTORY = AsyncWeb3.to_checksum_address("0x00000000000000000000000000000000000000fa")
+CLONE = AsyncWeb3.to_checksum_address("0x00000000000000000000000000000000000000c1")
+EMPLOYER = AsyncWeb3.to_checksum_address("0x00000000000000000000000000000000000000e1")
+EMPLOYEE = AsyncWeb3.to_checksum_address("0x00000000000000000000000000000000000000f1")
+
+
+class FakeFunction:
+    def __init__(self, tx):
+        self.tx = tx
+
+    async def build_transaction(self, params):
+        return {**self.tx, **params}
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    """Client wired to a fake node; transactions put in chain.transactions are served by hash."""
+    transactions = {}
+
+    async def get_transaction(tx_hash):
+        return transactions[tx_hash]
+
+    monkeypatch.setattr(client, "w3", SimpleNamespace(eth=SimpleNamespace(get_transaction=get_transaction)))
+    monkeypatch.setattr(client, "rika_factory", AsyncWeb3().eth.contract(FACTORY, abi=RIKA_FACTORY_ABI))
+    monkeypatch.setattr(client, "management_contracts", ContractRegistry(
+        lambda address: AsyncWeb3().eth.contract(address, abi=RIKA_MANAGEMENT_ABI)
+    ))
+    monkeypatch.setattr(client, "gas_model", GasModel(min_samples=1))
+    monkeypatch.setattr(client, "built_transactions", type(client.built_transactions)())
+    return SimpleNamespace(transactions=transactions)
+
+
+def batch_data(count: int) -> str:
+    contract = AsyncWeb3().eth.contract(CLONE, abi=RIKA_MANAGEMENT_ABI)
+    return contract.encode_abi("addEmployeesBatch", args=[["a"] * count, [EMPLOYEE] * count, [1] * count])
+
+
+def mined(data: str, nonce: int = 5):
+    return {"from": EMPLOYER, "to": CLONE, "nonce": nonce, "input": HexBytes(data)}
+
+
+def test_tracked_transactions_built_here_train_the_gas_model(chain):
+    data = batch_data(3)
+    asyncio.run(client.build_transaction(FakeFunction({"to": CLONE, "data": data}), {"from": EMPLOYER, "nonce": 5}))
+    chain.transactions["0x01"] = mined(data)
+    asyncio.run(client.on_tracked_transaction({"tx_hash": "0x01"}, {"status": 1, "gasUsed": 90_000}))
+    assert client.gas_model.predict("addEmployeesBatch", 3) is not None
+
+
+def test_tracked_transactions_built_elsewhere_are_ignored(chain):
+    built = batch_data(3)
+    asyncio.run(client.build_transaction(FakeFunction({"to": CLONE, "data": built}), {"from": EMPLOYER, "nonce": 5}))
+    # A look-alike call with a different nonce, and one with different arguments under the built nonce
+    chain.transactions["0x01"] = mined(built, nonce=6)
+    chain.transactions["0x02"] = mined(batch_data(1))
+    for tx_hash in ("0x01", "0x02"):
+        asyncio.run(client.on_tracked_transaction({"tx_hash": tx_hash}, {"status": 1, "gasUsed": 21_000}))
+    assert client.gas_model.predict("addEmployeesBatch", 3) is None
+    assert client.gas_model.predict("addEmployeesBatch", 1) is None
+
+
+class EstimatedFunction:
+    fn_name = "addEmployeesBatch"
+    address = CLONE
+
+    def __init__(self, estimate, count: int = 3):
+        self.estimate = estimate
+        self.args = (["a"] * count, [EMPLOYEE] * count, [1] * count)
+
+    async def estimate_gas(self, params):
+        if isinstance(self.estimate, Exception):
+            raise self.estimate
+        return self.estimate
+
+
+def trained(gas_used: int, count: int = 3) -> GasModel:
+    model = GasModel(min_samples=1)
+    model.record("addEmployeesBatch", count, gas_used)
+    return model
+
+
+def test_gas_limit_still_estimates_so_reverts_fail_before_signing(monkeypatch):
+    from web3.exceptions import ContractLogicError
+
+    monkeypatch.setattr(client, "gas_model", trained(90_000))
+    with pytest.raises(ContractLogicError):
+        asyncio.run(client.estimate_gas_limit(EstimatedFunction(ContractLogicError("EmployeeAlreadyExists")), {}))
+
+
+def test_prediction_caps_the_headroom_but_not_the_estimate(monkeypatch):
+    monkeypatch.setattr(client, "gas_model", trained(90_000))
+    predicted = client.gas_model.predict("addEmployeesBatch", 3)
+    assert asyncio.run(client.estimate_gas_limit(EstimatedFunction(100_000), {})) == predicted
+    # A prediction below the node's estimate is ignored
+    assert asyncio.run(client.estimate_gas_limit(EstimatedFunction(200_000), {})) == 200_000
+
+
+def test_failed_fee_lookup_hands_the_reserved_nonce_back(monkeypatch):
+    from app.contract.nonce import NonceManager
+
+    async def get_transaction_count(sender, block_identifier):
+        return 7
+
+    async def get_fee_params():
+        raise RuntimeError("eth_feeHistory failed")
+
+    w3 = SimpleNamespace(eth=SimpleNamespace(get_transaction_count=get_transaction_count))
+    manager = NonceManager(w3, managed_senders=[EMPLOYER])
+    monkeypatch.setattr(client, "nonce_manager", manager)
+    monkeypatch.setattr(client, "fee_oracle", SimpleNamespace(get_fee_params=get_fee_params))
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await client.build_transaction_params(EMPLOYER)
+        return await manager.reserve(EMPLOYER)
+
+    assert asyncio.run(run()) == 7
+
+
+def test_contract_registry_request_cost(monkeypatch):
+    """Benchmark: CPU per /balance and /employees/all request answered from warm caches,
+    with the contract object taken from the registry versus rebuilt from the ABI each time."""
+    import time
+    from app.contract.cache import PayrollContractCache, ViewCache
+
+    payrolls = PayrollContractCache()
+    payrolls.set(EMPLOYER, [CLONE], payrolls.version(EMPLOYER))
+    views = ViewCache()
+    views.on_new_head(100)
+    for function_name, value in (("getEmployerBalance", 10**6), ("getAllEmployeesWithDetails", [])):
+        views.set((CLONE.lower(), function_name, (EMPLOYER.lower(),)), value, EMPLOYER, 100, 0)
+    monkeypatch.setattr(client, "payroll_contract_cache", payrolls)
+    monkeypatch.setattr(client, "view_cache", views)
+
+    w3 = AsyncWeb3()
+    rebuilt = SimpleNamespace(get=lambda address: w3.eth.contract(address=address, abi=RIKA_MANAGEMENT_ABI))
+    RikaManagementContract = w3.eth.contract(abi=RIKA_MANAGEMENT_ABI)
+    cached = ContractRegistry(lambda address: RikaManagementContract(address=address))
+
+    async def serve(requests: int):
+        for _ in range(requests):
+            await client.get_employer_balance(EMPLOYER, consistency=client.LIVE)
+            await client.get_all_employees_with_details(EMPLOYER, consistency=client.LIVE)
+
+    def cpu_per_request(contracts, requests: int = 200) -> float:
+        monkeypatch.setattr(client, "management_contracts", contracts)
+        assert "balance" in asyncio.run(client.get_employer_balance(EMPLOYER, consistency=client.LIVE))
+        started = time.process_time()
+        asyncio.run(serve(requests))
+        return (time.process_time() - started) / (2 * requests)
+
+    before, after = cpu_per_request(rebuilt), cpu_per_request(cached)
+    assert after < before
+    print(f"\nCPU per request: {before * 1e6:.0f}us rebuilding the contract, {after * 1e6:.0f}us from the registry")
+
+
+def test_summary_next_date_is_the_earliest_over_active_employees(monkeypatch):
+    from app.contract.mirror import INTERVAL_DURATIONS, MirrorState
+
+    def schedule(due: int, active: bool = True):
+        # Weekly: (scheduleId, startDate, endDate, interval, lastProcessedDate, isProcessed, isActive)
+        return (0, 0, 2 ** 32, 0, due - INTERVAL_DURATIONS[0], False, active)
+
+    async def read_state(contract, employer_address, block_number):
+        state = MirrorState(10)
+        state.set_employee("0xa1", ("0xa1", "left", 100, 0, False), [schedule(1_000)])
+        state.set_employee("0xa2", ("0xa2", "staff", 100, 0, True), [schedule(3_000), schedule(2_000), schedule(1_500, False)])
+        return state
+
+    monkeypatch.setattr(client, "management_contracts", ContractRegistry(
+        lambda address: AsyncWeb3().eth.contract(address, abi=RIKA_MANAGEMENT_ABI)
+    ))
+    monkeypatch.setattr(client, "payroll_mirror", SimpleNamespace(read_state=read_state))
+    summary = asyncio.run(client.get_contract_summary(CLONE, EMPLOYER, [2, 200, 500]))
+    assert summary["next_payroll_date"] == 2_000
@@ -0,0 +1,65 @@
+from app.contract.gas import GasModel
+
+
+def make_model(**kwargs):
+    return GasModel(**{"min_samples": 3, "window": 10, "headroom": 1.5, "max_spread": 0.1, **kwargs})
+
+
+def test_no_prediction_below_min_samples():
+    model = make_model()
+    model.record("addEmployee", 0, 100_000)
+    model.record("addEmployee", 0, 100_000)
+    assert model.predict("addEmployee") is None
+    assert model.fallbacks == 1
+
+
+def test_bucket_predicts_the_highest_sample_with_headroom():
+    model = make_model()
+    for used in (95_000, 100_000, 98_000):
+        model.record("addEmployee", 0, used)
+    assert model.predict("addEmployee") == 150_000
+    assert model.predictions == 1
+
+
+def test_bucket_with_too_much_spread_is_not_trusted():
+    model = make_model()
+    for used in (50_000, 100_000, 100_000):
+        model.record("addEmployee", 0, used)
+    assert model.predict("addEmployee") is None
+
+
+def test_window_drops_old_samples():
+    model = make_model(window=3)
+    model.record("addEmployee", 0, 10_000)
+    for _ in range(3):
+        model.record("addEmployee", 0, 100_000)
+    assert model.predict("addEmployee") == 150_000
+
+
+def test_linear_fit_predicts_unseen_batch_lengths():
+    model = make_model()
+    for length in (1, 2, 4, 8):
+        model.record("addEmployeesBatch", length, 50_000 + 30_000 * length)
+    assert model.predict("addEmployeesBatch", 10) == int((50_000 + 30_000 * 10) * 1.5)
+
+
+def test_linear_fit_needs_two_shapes():
+    model = make_model()
+    for _ in range(5):
+        model.record("addEmployeesBatch", 4, 170_000)
+    assert model.predict("addEmployeesBatch", 10) is None
+
+
+def test_linear_fit_rejects_scattered_points():
+    model = make_model()
+    for length, used in ((1, 80_000), (2, 200_000), (4, 90_000), (8, 400_000)):
+        model.record("addEmployeesBatch", length, used)
+    assert model.predict("addEmployeesBatch", 10) is None
+
+
+def test_best_effort_uses_untrusted_samples():
+    model = make_model()
+    model.record("createPayrollContract", 0, 1_000_000)
+    assert model.predict("createPayrollContract") is None
+    assert model.best_effort("createPayrollContract") == 1_500_000
+    assert model.best_effort("addEmployee") is None
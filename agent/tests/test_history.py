@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from app.indexer import history
+from app.indexer.store import EventStore, FACTORY
+from tests.test_store import row
+
+FACTORY_ADDRESS = "0x00000000000000000000000000000000000000FA"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = EventStore(str(tmp_path / "events.db"))
+    store.add_contract(FACTORY_ADDRESS, FACTORY, 0)
+    monkeypatch.setattr(history, "event_store", store)
+    return store
+
+
+def test_history_cursor_walks_every_page(store):
+    store.write_chunk([row(number) for number in range(1, 6)], [], 5)
+
+    async def walk():
+        pages, cursor = [], None
+        while True:
+            page = await history.get_payment_history(cursor=cursor, limit=2)
+            pages.append([event["block_number"] for event in page["items"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+
+    assert asyncio.run(walk()) == [[5, 4], [3, 2], [1]]
+
+
+def test_history_rejects_a_bad_cursor(store):
+    assert asyncio.run(history.get_payment_history(cursor="not-a-cursor")) == {"error": "Invalid cursor"}
+
+
+def test_history_reports_how_far_the_index_has_got(store):
+    store.write_chunk([row(3)], [FACTORY_ADDRESS], 7)
+    assert asyncio.run(history.get_payment_history())["indexed_block"] == 7
+
+
+def test_history_route_fails_before_anything_is_indexed(tmp_path, monkeypatch):
+    pytest.importorskip("web3")
+    from app.routes.web3 import client
+    from app.routes.web3.model import HistoryRequest
+
+    monkeypatch.setattr(history, "event_store", EventStore(str(tmp_path / "events.db")))
+    response = asyncio.run(client.get_payments_history(HistoryRequest(employer_address=FACTORY_ADDRESS)))
+    assert (response.success, response.message, response.data) == (False, "Operation failed", None)
+    assert "not indexed" in response.error
@@ -0,0 +1,199 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("web3")
+
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+from hexbytes import HexBytes
+
+from app.contract.abi import RIKA_MANAGEMENT_ABI
+from app.indexer import indexer as indexer_module
+from app.indexer.indexer import EventIndexer, MANAGEMENT
+from app.indexer.store import EventStore
+
+EMPLOYER = to_checksum_address("0x00000000000000000000000000000000000000e1")
+CLONES = [to_checksum_address(f"0x{index:040x}") for index in range(0xc100, 0xc110)]
+
+SALARY_PAID = next(entry for entry in RIKA_MANAGEMENT_ABI if entry['type'] == 'event' and entry['name'] == 'SalaryPaid')
+SALARY_PAID_TOPIC = HexBytes(event_abi_to_log_topic(SALARY_PAID))
+
+
+def address_topic(address: str) -> HexBytes:
+    return HexBytes(bytes(12) + bytes.fromhex(address[2:]))
+
+
+class FakeChain:
+    """A chain of blocks each holding a SalaryPaid log from every clone."""
+
+    def __init__(self, height: int, clones=CLONES):
+        self.height = height
+        self.clones = clones
+        self.get_logs_calls = 0
+
+    def block_hash(self, number: int) -> HexBytes:
+        return HexBytes(number.to_bytes(32, 'big'))
+
+    def amount(self, number: int) -> int:
+        return 1000 + number
+
+    def logs(self, number: int):
+        for index, clone in enumerate(self.clones):
+            yield {
+                'address': clone,
+                'topics': [SALARY_PAID_TOPIC, address_topic(EMPLOYER), address_topic(EMPLOYER)],
+                'data': HexBytes(encode(['uint256'], [self.amount(number)])),
+                'blockNumber': number,
+                'blockHash': self.block_hash(number),
+                'transactionHash': HexBytes(number.to_bytes(16, 'big') + index.to_bytes(16, 'big')),
+                'transactionIndex': index,
+                'logIndex': index,
+                'removed': False,
+            }
+
+    @property
+    def block_number(self):
+        async def block_number():
+            return self.height
+        return block_number()
+
+    async def get_block(self, number: int):
+        return {
+            'number': number,
+            'hash': self.block_hash(number),
+            'parentHash': self.block_hash(number - 1),
+            'timestamp': 1_700_000_000 + number * 12,
+        }
+
+    async def get_logs(self, params):
+        self.get_logs_calls += 1
+        addresses = {address.lower() for address in params['address']}
+        return [
+            log for number in range(params['fromBlock'], params['toBlock'] + 1)
+            for log in self.logs(number) if log['address'].lower() in addresses
+        ]
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    chain = FakeChain(height=0)
+    monkeypatch.setattr(indexer_module, "w3", SimpleNamespace(eth=chain))
+    return chain
+
+
+@pytest.fixture
+def indexer(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"))
+    for clone in CLONES:
+        store.add_contract(clone, MANAGEMENT, 0)
+    return EventIndexer(store)
+
+
+async def catch_up(indexer: EventIndexer) -> None:
+    while await indexer.index_once():
+        pass
+
+
+def test_indexer_catches_up_and_resumes(chain, indexer):
+    chain.height = 50 + indexer_module.INDEXER_CONFIRMATIONS
+    asyncio.run(catch_up(indexer))
+    assert indexer.store.count_events() == 50 * len(CLONES)
+    assert set(block for _, block in indexer.store.get_checkpoints().values()) == {50}
+
+    chain.height += 10
+    asyncio.run(catch_up(indexer))
+    assert indexer.store.count_events() == 60 * len(CLONES)
+
+
+def test_indexer_stays_confirmations_behind_the_head(chain, indexer):
+    chain.height = 20
+    asyncio.run(catch_up(indexer))
+    assert indexer.store.get_block_hash(20 - indexer_module.INDEXER_CONFIRMATIONS) is not None
+    assert indexer.store.get_block_hash(20 - indexer_module.INDEXER_CONFIRMATIONS + 1) is None
+
+
+def test_indexer_throughput(local_chain, monkeypatch, tmp_path):
+    """Benchmark: indexes the EmployeeAdded logs of 10 batches of 20 employees from a deployed
+    RikaManagement, through the local chain's eth_getLogs, and reports logs per second."""
+    from tests.test_multicall import SALARY
+
+    batches, size = 10, 20
+    monkeypatch.setattr(indexer_module, "INDEXER_CONFIRMATIONS", 0)
+
+    async def run():
+        chain = await local_chain.start()
+        monkeypatch.setattr(indexer_module, "w3", chain.w3)
+        employer = (await chain.accounts())[0]
+        usdc = await chain.deploy("RUSDC", sender=employer)
+        management = await chain.deploy("RikaManagement", sender=employer)
+        await chain.transact(management.functions.initialize(usdc.address, employer), employer)
+        for batch in range(batches):
+            employees = [to_checksum_address(f"0x{0x1000 + batch * size + index:040x}") for index in range(size)]
+            await chain.transact(
+                management.functions.addEmployeesBatch(["employee"] * size, employees, [SALARY] * size), employer
+            )
+
+        indexer = EventIndexer(EventStore(str(tmp_path / "events.db")))
+        indexer.store.add_contract(management.address, MANAGEMENT, 0)
+        get_logs = chain.w3.eth.get_logs
+        calls = []
+
+        async def counted_get_logs(params):
+            calls.append(params)
+            return await get_logs(params)
+
+        monkeypatch.setattr(chain.w3.eth, "get_logs", counted_get_logs)
+        started = time.monotonic()
+        await catch_up(indexer)
+        return indexer, time.monotonic() - started, len(calls)
+
+    indexer, elapsed, get_logs_calls = asyncio.run(run())
+    assert len(indexer.store.query_events(["EmployeeAdded"], limit=batches * size)) == batches * size
+    print(
+        f"\nindexed {indexer.logs_indexed} logs in {elapsed:.2f}s "
+        f"({indexer.logs_indexed / elapsed:.0f} logs/s, {indexer.throughput():.0f} logs/s indexing), "
+        f"{get_logs_calls} eth_getLogs calls"
+    )
+
+
+def test_indexer_rolls_back_a_reverted_chain(local_chain, monkeypatch, tmp_path):
+    """Forks the chain with evm_snapshot/evm_revert and checks the orphaned FundsAdded is replaced."""
+    from tests.test_multicall import SALARY, payroll
+
+    monkeypatch.setattr(indexer_module, "INDEXER_CONFIRMATIONS", 0)
+
+    async def add_funds(chain, usdc, management, employer, amount):
+        await chain.transact(usdc.functions.approve(management.address, amount), employer)
+        await chain.transact(management.functions.addFunds(amount), employer)
+
+    async def funds_added(indexer):
+        return [
+            int(event["amount"]) for event in await asyncio.to_thread(indexer.store.query_events, ["FundsAdded"])
+        ]
+
+    async def run():
+        chain = await local_chain.start()
+        monkeypatch.setattr(indexer_module, "w3", chain.w3)
+        management, usdc, employer, _ = await payroll(chain)
+        indexer = EventIndexer(EventStore(str(tmp_path / "events.db")))
+        indexer.store.add_contract(management.address, MANAGEMENT, 0)
+
+        await catch_up(indexer)
+        snapshot = await chain.snapshot()
+        await add_funds(chain, usdc, management, employer, SALARY)
+        await catch_up(indexer)
+        assert await funds_added(indexer) == [SALARY, 5 * SALARY]
+
+        await chain.revert(snapshot)
+        await add_funds(chain, usdc, management, employer, 2 * SALARY)
+        # Make the new branch longer than the orphaned one
+        await chain.transact(usdc.functions.approve(management.address, 0), employer)
+        await catch_up(indexer)
+        return indexer, await funds_added(indexer)
+
+    indexer, amounts = asyncio.run(run())
+    assert indexer.reorgs == 1
+    assert amounts == [2 * SALARY, 5 * SALARY]
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("web3")
+
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3 import AsyncWeb3
+
+from app.contract.abi import RIKA_MANAGEMENT_ABI
+from app.contract.cache import ContractRegistry
+from app.contract.mirror import INTERVAL_DURATIONS, MirrorState, PayrollMirror
+
+CLONE = "0x00000000000000000000000000000000000000C1"
+EMPLOYER = "0x00000000000000000000000000000000000000E1"
+KEY = (CLONE.lower(), EMPLOYER.lower())
+WEEK = INTERVAL_DURATIONS[0]
+
+
+def employee(address: str, salary: int, active: bool = True):
+    return (address, "name", salary, 1, active)
+
+
+def schedule(last_processed: int, active: bool = True):
+    # (scheduleId, startDate, endDate, interval, lastProcessedDate, isProcessed, isActive)
+    return (0, 0, 2 ** 32, 0, last_processed, False, active)
+
+
+def event_topic(name: str) -> HexBytes:
+    abi = next(entry for entry in RIKA_MANAGEMENT_ABI if entry['type'] == 'event' and entry['name'] == name)
+    return HexBytes(event_abi_to_log_topic(abi))
+
+
+def funds_log(name: str, amount: int, block_number: int, employer: str = EMPLOYER):
+    return {
+        'address': CLONE,
+        'topics': [event_topic(name), HexBytes(bytes(12) + bytes.fromhex(employer[2:]))],
+        'data': HexBytes(encode(['uint256'], [amount])),
+        'blockNumber': block_number,
+        'blockHash': HexBytes(block_number.to_bytes(32, 'big')),
+        'transactionHash': HexBytes(bytes(32)),
+        'transactionIndex': 0,
+        'logIndex': 0,
+        'removed': False,
+    }
+
+
+def make_mirror():
+    w3 = AsyncWeb3()
+    contracts = ContractRegistry(lambda address: w3.eth.contract(address=address, abi=RIKA_MANAGEMENT_ABI))
+    return PayrollMirror(w3, None, contracts)
+
+
+def mirrored(mirror: PayrollMirror, state: MirrorState, key=KEY) -> MirrorState:
+    mirror._states[key] = state
+    return state
+
+
+def test_liability_follows_employee_changes():
+    state = MirrorState(block=1)
+    state.set_employee("0xA", employee("0xA", 100), [])
+    state.set_employee("0xB", employee("0xB", 250), [])
+    assert state.total_liability() == 350
+
+    state.set_employee("0xa", employee("0xA", 150), [])
+    state.set_employee("0xB", employee("0xB", 250, active=False), [])
+    assert state.total_liability() == 150
+
+    state.liability = 0
+    state.recount_liability()
+    assert state.total_liability() == 150
+
+
+def test_underfunded_compares_balance_with_liability():
+    state = MirrorState(block=1, balance=100)
+    state.set_employee("0xA", employee("0xA", 100), [])
+    assert not state.is_underfunded()
+    state.set_employee("0xB", employee("0xB", 1), [])
+    assert state.is_underfunded()
+
+
+def test_due_dates_skip_inactive_employees_and_schedules():
+    state = MirrorState(block=1)
+    state.set_employee("0xA", employee("0xA", 100), [schedule(1000), schedule(0, active=False)])
+    state.set_employee("0xB", employee("0xB", 200), [schedule(5000)])
+    state.set_employee("0xC", employee("0xC", 400, active=False), [schedule(0)])
+
+    assert state.next_due() == 1000 + WEEK
+    assert state.due_payout(1000 + WEEK) == 100
+    assert state.due_payout(5000 + WEEK) == 300
+    assert state.next_payroll_date("0xa") == 1000 + WEEK
+    assert state.employee("0xD")[2] == 0
+
+
+def test_balance_events_move_the_balance():
+    mirror = make_mirror()
+    state = mirrored(mirror, MirrorState(block=10, balance=1000))
+
+    asyncio.run(mirror.apply_logs([
+        funds_log("FundsAdded", 500, 11),
+        funds_log("FundsWithdrawn", 200, 12),
+    ], 12))
+
+    assert state.balance == 1300
+    assert state.block == 12
+    assert state.log_blocks == {11, 12}
+
+
+def test_logs_already_in_the_state_are_not_applied_again():
+    mirror = make_mirror()
+    state = mirrored(mirror, MirrorState(block=10, balance=1000))
+    asyncio.run(mirror.apply_logs([funds_log("FundsAdded", 500, 10)], 11))
+    assert state.balance == 1000
+
+
+def test_logs_of_other_employers_are_ignored():
+    mirror = make_mirror()
+    state = mirrored(mirror, MirrorState(block=10, balance=1000))
+    other = "0x00000000000000000000000000000000000000E2"
+    asyncio.run(mirror.apply_logs([funds_log("FundsAdded", 500, 11, employer=other)], 11))
+    assert state.balance == 1000
+
+
+def test_underfunded_set_follows_balance_events():
+    mirror = make_mirror()
+    state = MirrorState(block=10, balance=100)
+    state.set_employee("0xA", employee("0xA", 100), [])
+    mirrored(mirror, state)
+    asyncio.run(mirror.apply_logs([funds_log("FundsWithdrawn", 1, 11)], 11))
+    assert mirror.is_underfunded(CLONE, EMPLOYER)
+    asyncio.run(mirror.apply_logs([funds_log("FundsAdded", 1, 12)], 12))
+    assert not mirror.is_underfunded(CLONE, EMPLOYER)
+
+
+def test_rewind_rereads_pairs_with_orphaned_logs(monkeypatch):
+    mirror = make_mirror()
+    untouched_key = ("0x00000000000000000000000000000000000000c2", EMPLOYER.lower())
+    touched = mirrored(mirror, MirrorState(block=10, balance=1000))
+    untouched = mirrored(mirror, MirrorState(block=10, balance=50), untouched_key)
+    asyncio.run(mirror.apply_logs([funds_log("FundsAdded", 500, 12)], 13))
+    assert touched.balance == 1500
+
+    reread = []
+
+    async def read_state(contract, employer_address, block_number):
+        reread.append((contract.address.lower(), employer_address.lower(), block_number))
+        return MirrorState(block_number, balance=1000)
+
+    monkeypatch.setattr(mirror, "read_state", read_state)
+    # Blocks above 11 were replaced; the new head is 14
+    assert asyncio.run(mirror.rewind(11, 14)) == [KEY]
+    assert reread == [(*KEY, 14)]
+    assert mirror._states[KEY].balance == 1000
+    assert mirror._states[untouched_key] is untouched
+    assert untouched.block == 11
+
+    # The replacement blocks' logs now apply to the pair that had nothing orphaned
+    replacement = funds_log("FundsAdded", 7, 12)
+    replacement['address'] = AsyncWeb3.to_checksum_address(untouched_key[0])
+    asyncio.run(mirror.apply_logs([replacement], 14))
+    assert untouched.balance == 57
+
+
+def test_rewind_drops_pairs_it_cannot_reread(monkeypatch):
+    mirror = make_mirror()
+    mirrored(mirror, MirrorState(block=10, balance=1000))
+    evicted = []
+    mirror.eviction_listeners.append(evicted.append)
+
+    async def read_state(contract, employer_address, block_number):
+        raise Exception("node unavailable")
+
+    monkeypatch.setattr(mirror, "read_state", read_state)
+    # An unknown fork point re-reads every pair
+    asyncio.run(mirror.rewind(None, 14))
+    assert mirror.states() == []
+    assert evicted == [KEY]
@@ -0,0 +1,71 @@
+import asyncio
+
+from app.contract.multicall import ViewCall, aggregate_view_calls
+
+SALARY = 1_000 * 10 ** 6
+# RikaManagement.Interval.Weekly
+WEEKLY = 0
+
+
+async def payroll(chain):
+    """A RikaManagement contract whose employer has funded three employees, one deactivated, two on schedules."""
+    accounts = await chain.accounts()
+    employer, employees = accounts[0], accounts[1:4]
+    usdc = await chain.deploy("RUSDC", sender=employer)
+    management = await chain.deploy("RikaManagement", sender=employer)
+    await chain.transact(management.functions.initialize(usdc.address, employer), employer)
+    for index, employee in enumerate(employees):
+        await chain.transact(management.functions.addEmployee(f"employee {index}", employee, SALARY * (index + 1)), employer)
+    start = (await chain.w3.eth.get_block("latest"))["timestamp"] + 3600
+    for employee in employees[:2]:
+        await chain.transact(management.functions.createSchedule(employee, start, start + 365 * 86400, WEEKLY), employer)
+    await chain.transact(management.functions.deactivateEmployee(employees[2]), employer)
+    await chain.transact(usdc.functions.approve(management.address, 5 * SALARY), employer)
+    await chain.transact(management.functions.addFunds(5 * SALARY), employer)
+    return management, usdc, employer, employees
+
+
+def test_aggregated_views_match_direct_calls(local_chain):
+    async def run():
+        chain = await local_chain.start()
+        management, _, employer, employees = await payroll(chain)
+        calls = [
+            ViewCall(management, "getEmployeeList", (employer,)),
+            ViewCall(management, "getEmployerBalance", (employer,)),
+            ViewCall(management, "getTotalPayrollLiability", (employer,)),
+            ViewCall(management, "hasSufficientBalanceForPayroll", (employer,)),
+            ViewCall(management, "getAllEmployeesWithDetails", (employer,)),
+        ] + [
+            call for employee in employees for call in (
+                ViewCall(management, "getEmployee", (employer, employee)),
+                ViewCall(management, "getSchedules", (employer, employee)),
+                ViewCall(management, "getNextPayrollDate", (employer, employee)),
+            )
+        ]
+        block = await chain.w3.eth.block_number
+        aggregated = await aggregate_view_calls(chain.w3, chain.multicall, calls, block_identifier=block)
+        direct = [
+            await getattr(call.contract.functions, call.function_name)(*call.args).call(block_identifier=block)
+            for call in calls
+        ]
+        return block, aggregated, direct
+
+    block, aggregated, direct = asyncio.run(run())
+    assert aggregated["block_number"] == block
+    assert [ok for ok, _ in aggregated["results"]] == [True] * len(direct)
+    assert [value for _, value in aggregated["results"]] == direct
+    # The deactivated employee is not part of the liability
+    assert direct[2] == 3 * SALARY
+
+
+def test_aggregated_call_to_an_empty_address_fails_alone(local_chain):
+    async def run():
+        chain = await local_chain.start()
+        management, _, employer, _ = await payroll(chain)
+        missing = chain.w3.eth.contract(address="0x000000000000000000000000000000000000dEaD", abi=management.abi)
+        return await aggregate_view_calls(chain.w3, chain.multicall, [
+            ViewCall(missing, "getEmployerBalance", (employer,)),
+            ViewCall(management, "getEmployerBalance", (employer,)),
+        ])
+
+    assert asyncio.run(run())["results"] == [(False, None), (True, 5 * SALARY)]
@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.contract.nonce import NonceManager
+
+SENDER = "0x00000000000000000000000000000000000000A1"
+
+
+class FakeEth:
+    def __init__(self, count: int):
+        self.count = count
+        self.calls = 0
+
+    async def get_transaction_count(self, sender, block_identifier):
+        self.calls += 1
+        return self.count
+
+
+def make_manager(count: int = 7):
+    eth = FakeEth(count)
+    return NonceManager(SimpleNamespace(eth=eth), managed_senders=[SENDER, None]), eth
+
+
+def test_reserve_seeds_once_and_counts_up():
+    manager, eth = make_manager()
+
+    async def run():
+        return [await manager.reserve(SENDER) for _ in range(3)]
+
+    assert asyncio.run(run()) == [7, 8, 9]
+    assert eth.calls == 1
+    assert manager.is_managed(SENDER.lower())
+    assert not manager.is_managed("0x00000000000000000000000000000000000000B2")
+
+
+def test_concurrent_reservations_are_distinct():
+    manager, _ = make_manager()
+
+    async def run():
+        return await asyncio.gather(*(manager.reserve(SENDER) for _ in range(20)))
+
+    assert sorted(asyncio.run(run())) == list(range(7, 27))
+
+
+def test_release_of_highest_nonce_reuses_it():
+    manager, eth = make_manager()
+
+    async def run():
+        first = await manager.reserve(SENDER)
+        second = await manager.reserve(SENDER)
+        manager.release(SENDER, second)
+        return first, await manager.reserve(SENDER)
+
+    assert asyncio.run(run()) == (7, 8)
+    assert eth.calls == 1
+
+
+def test_release_of_a_gap_resyncs_and_fills_it():
+    manager, eth = make_manager()
+
+    async def run():
+        nonces = [await manager.reserve(SENDER) for _ in range(3)]
+        manager.release(SENDER, nonces[1])
+        assert manager.status(SENDER)["needs_resync"]
+        return await manager.reserve(SENDER)
+
+    # The node still reports 7 pending, so 7 and 9 stay reserved and 8 is handed out again
+    assert asyncio.run(run()) == 8
+    assert eth.calls == 2
+
+
+def test_drop_reissues_the_nonce():
+    manager, _ = make_manager()
+
+    async def run():
+        nonce = await manager.reserve(SENDER)
+        manager.track(SENDER, nonce, "0xabc")
+        manager.drop(SENDER, nonce)
+        return nonce, await manager.reserve(SENDER)
+
+    assert asyncio.run(run()) == (7, 7)
+    assert manager.dropped == 1
+
+
+def test_resync_confirms_mined_nonces():
+    manager, eth = make_manager()
+
+    async def run():
+        for _ in range(3):
+            manager.track(SENDER, await manager.reserve(SENDER), "0xabc")
+        eth.count = 9
+        await manager.resync(SENDER)
+
+    asyncio.run(run())
+    status = manager.status(SENDER)
+    assert status["pending"] == {9: "0xabc"}
+    assert status["next_nonce"] == 9
+    assert manager.confirmed == 2
+
+
+def test_confirm_only_counts_pending_nonces():
+    manager, _ = make_manager()
+
+    async def run():
+        nonce = await manager.reserve(SENDER)
+        manager.confirm(SENDER, nonce)
+        manager.confirm(SENDER, nonce)
+
+    asyncio.run(run())
+    assert manager.confirmed == 1
+    assert manager.status(SENDER)["pending"] == {}
+
+
+def test_locks_follow_the_running_loop():
+    manager, _ = make_manager()
+
+    # Celery runs each task in a fresh event loop
+    assert asyncio.run(manager.reserve(SENDER)) == 7
+    assert asyncio.run(manager.reserve(SENDER)) == 8
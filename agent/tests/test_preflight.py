@@ -0,0 +1,33 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("web3")
+
+from app.contract.mirror import MirrorState
+from app.contract.preflight import SENDER_NOT_EMPLOYER, preflight_payrolls
+
+AGENT = "0x00000000000000000000000000000000000000A1"
+EMPLOYER = "0x00000000000000000000000000000000000000E1"
+BLOCK = {"number": 10, "timestamp": 1000}
+
+
+def test_employers_other_than_the_sender_are_not_reported_as_nothing_due():
+    simulated = []
+
+    async def process_all_payrolls_call(params, block_identifier):
+        simulated.append(params["from"])
+
+    contract = SimpleNamespace(
+        address="0x00000000000000000000000000000000000000C1",
+        functions=SimpleNamespace(processAllPayrolls=lambda: SimpleNamespace(call=process_all_payrolls_call)),
+    )
+
+    async def read_state(contract, employer_address, block_number):
+        return MirrorState(block_number)
+
+    report = asyncio.run(preflight_payrolls(None, None, [(EMPLOYER, contract)], AGENT, read_state, BLOCK))
+    assert report["ready"] == []
+    assert report["skipped_by_reason"] == {SENDER_NOT_EMPLOYER: 1}
+    assert simulated == []
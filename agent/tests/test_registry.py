@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("web3")
+
+from web3 import AsyncWeb3
+
+from app.contract.registry import PayrollRegistry
+from app.indexer.store import EventStore, FACTORY, encode_args
+
+FACTORY_ADDRESS = AsyncWeb3.to_checksum_address("0x00000000000000000000000000000000000000fa")
+ALICE = AsyncWeb3.to_checksum_address("0x00000000000000000000000000000000000000a1")
+BOB = AsyncWeb3.to_checksum_address("0x00000000000000000000000000000000000000b1")
+FIRST = AsyncWeb3.to_checksum_address("0x00000000000000000000000000000000000000c1")
+SECOND = AsyncWeb3.to_checksum_address("0x00000000000000000000000000000000000000c2")
+THIRD = AsyncWeb3.to_checksum_address("0x00000000000000000000000000000000000000c3")
+
+
+def block_hash(number: int) -> str:
+    return f"0x{number:064x}"
+
+
+def factory_row(number: int, employer: str, contract: str, event: str = "PayrollContractCreated", log_index: int = 0):
+    return {
+        "contract": FACTORY_ADDRESS.lower(),
+        "event": event,
+        "employer": employer.lower(),
+        "employee": None,
+        "amount": None,
+        "block_number": number,
+        "block_hash": block_hash(number),
+        "block_timestamp": 1_700_000_000 + number * 12,
+        "tx_hash": f"0x{number:060x}{log_index:04x}",
+        "log_index": log_index,
+        "args": encode_args({"employer": employer, "payrollContract": contract}),
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"))
+    store.add_contract(FACTORY_ADDRESS, FACTORY, 9)
+    return store
+
+
+def test_contracts_come_from_factory_events_in_creation_order(store):
+    store.write_chunk(
+        [factory_row(10, ALICE, SECOND), factory_row(11, BOB, FIRST), factory_row(12, ALICE, THIRD, log_index=1)],
+        [FACTORY_ADDRESS], 20
+    )
+    registry = PayrollRegistry(store)
+    assert registry.get_employer_contracts(ALICE) == [SECOND, THIRD]
+    assert registry.get_all_contracts() == {ALICE: [SECOND, THIRD], BOB: [FIRST]}
+
+
+def test_updated_contract_moves_to_its_new_employer(store):
+    store.write_chunk(
+        [factory_row(10, ALICE, FIRST), factory_row(12, BOB, FIRST, event="PayrollContractUpdated")],
+        [FACTORY_ADDRESS], 20
+    )
+    registry = PayrollRegistry(store)
+    assert registry.get_employer_contracts(ALICE) == []
+    assert registry.get_employer_contracts(BOB) == [FIRST]
+
+
+def test_rolled_back_events_leave_the_registry(store):
+    store.write_chunk(
+        [factory_row(10, ALICE, FIRST), factory_row(15, ALICE, SECOND)],
+        [FACTORY_ADDRESS], 20,
+        blocks=[(number, block_hash(number), block_hash(number - 1)) for number in range(10, 21)]
+    )
+    store.rollback(12)
+    registry = PayrollRegistry(store)
+    assert registry.get_employer_contracts(ALICE) == [FIRST]
+    assert asyncio.run(registry.sync()) == 12
+
+
+def test_sync_fails_before_the_factory_is_indexed(tmp_path):
+    registry = PayrollRegistry(EventStore(str(tmp_path / "events.db")))
+    with pytest.raises(Exception, match="not indexed"):
+        asyncio.run(registry.sync())
+
+
+def test_is_current_waits_for_the_index_to_reach_the_watcher(store):
+    registry = PayrollRegistry(store)
+    store.write_chunk([], [FACTORY_ADDRESS], 20)
+    asyncio.run(registry.sync())
+    assert not registry.is_current(ALICE)
+    registry.watch(30)
+    assert not registry.is_current(ALICE)
+    store.write_chunk([], [FACTORY_ADDRESS], 29)
+    asyncio.run(registry.sync())
+    assert registry.is_current(ALICE)
+
+
+def test_is_current_waits_for_factory_logs_seen_at_the_head(store):
+    registry = PayrollRegistry(store)
+    registry.watch(10)
+    store.write_chunk([], [FACTORY_ADDRESS], 20)
+    asyncio.run(registry.sync())
+    registry.note_change(ALICE, 23)
+    assert not registry.is_current(ALICE)
+    assert registry.is_current(BOB)
+    store.write_chunk([factory_row(23, ALICE, FIRST)], [FACTORY_ADDRESS], 23)
+    asyncio.run(registry.sync())
+    assert registry.is_current(ALICE)
+    assert registry.get_employer_contracts(ALICE) == [FIRST]
+
+
+def test_event_watcher_seeds_its_clones_from_the_index(store, monkeypatch):
+    from types import SimpleNamespace
+    from hexbytes import HexBytes
+    from app.contract import events
+
+    store.write_chunk([factory_row(10, ALICE, FIRST)], [FACTORY_ADDRESS], 20)
+    # SECOND was created above the indexed block
+    created = {'topics': [HexBytes(bytes(32)), HexBytes(bytes(12) + bytes.fromhex(BOB[2:])),
+                          HexBytes(bytes(12) + bytes.fromhex(SECOND[2:]))]}
+    ranges = []
+
+    async def block_number():
+        return 22
+
+    async def get_logs(params):
+        ranges.append((params['fromBlock'], params['toBlock']))
+        return [created]
+
+    monkeypatch.setattr(events, "w3", SimpleNamespace(eth=SimpleNamespace(block_number=block_number(), get_logs=get_logs)))
+    monkeypatch.setattr(events, "rika_factory", SimpleNamespace(address=FACTORY_ADDRESS))
+    monkeypatch.setattr(events, "payroll_registry", PayrollRegistry(store))
+    assert asyncio.run(events.load_clones()) == ({FIRST, SECOND}, 22)
+    assert ranges == [(21, 22)]
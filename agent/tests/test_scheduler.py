@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("celery")
+
+from app.tasks.scheduler import PayrollScheduler, SCHEDULER_MAX_SLEEP
+
+
+class State:
+    def __init__(self, due):
+        self.due = due
+
+    def next_due(self):
+        return self.due
+
+
+def make_scheduler():
+    return PayrollScheduler(lambda employer, contract: None)
+
+
+def test_pairs_come_out_in_due_order():
+    scheduler = make_scheduler()
+    for contract, due in (("0xc3", 300), ("0xc1", 100), ("0xc2", 200)):
+        scheduler.update((contract, "0xe1"), State(due))
+    assert scheduler.pop_due(150) == [("0xc1", "0xe1")]
+    assert scheduler.pop_due(1000) == [("0xc2", "0xe1"), ("0xc3", "0xe1")]
+    assert scheduler.pop_due(1000) == []
+
+
+def test_rescheduling_supersedes_the_old_entry():
+    scheduler = make_scheduler()
+    scheduler.update(("0xc1", "0xe1"), State(100))
+    scheduler.update(("0xc1", "0xe1"), State(500))
+    assert scheduler.pop_due(200) == []
+    assert scheduler.seconds_until_next(200) == min(300, SCHEDULER_MAX_SLEEP)
+    assert scheduler.pop_due(500) == [("0xc1", "0xe1")]
+
+
+def test_pair_with_nothing_due_is_unscheduled():
+    scheduler = make_scheduler()
+    scheduler.update(("0xc1", "0xe1"), State(100))
+    scheduler.update(("0xc1", "0xe1"), State(None))
+    assert scheduler.pop_due(1000) == []
+    assert scheduler.stats()["scheduled"] == 0
+
+
+def test_dispatched_pair_waits_for_its_payment():
+    scheduler = make_scheduler()
+    key = ("0xc1", "0xe1")
+    scheduler.update(key, State(100))
+    assert scheduler.pop_due(100) == [key]
+    # Other changes before the run pays leave the pair to its retry
+    scheduler.update(key, State(100))
+    assert scheduler.stats() == {"scheduled": 0, "awaiting_payment": 1, "dispatches": 0}
+    # SalaryPaid moved the due date on
+    scheduler.update(key, State(100 + 604800))
+    assert scheduler.stats()["awaiting_payment"] == 0
+    assert scheduler.pop_due(100 + 604800) == [key]
+
+
+def test_pairs_beyond_the_mirror_stay_scheduled(monkeypatch):
+    from types import SimpleNamespace
+    from app.contract.mirror import INTERVAL_DURATIONS, MirrorState, PayrollMirror
+
+    mirror = PayrollMirror(None, None, None, max_contracts=2)
+    mirror.head = 10
+    scheduler = make_scheduler()
+    mirror.listeners.append(scheduler.update)
+    pairs = [(SimpleNamespace(address=f"0xc{index}"), "0xe1") for index in range(1, 5)]
+
+    async def read_state(contract, employer_address, block_number):
+        # One weekly schedule, due at 100 times the contract's number
+        state = MirrorState(block_number)
+        last_processed = int(contract.address[-1]) * 100 - INTERVAL_DURATIONS[0]
+        state.set_employee("0xa1", ("0xa1", "name", 1, 0, True), [(0, 0, 0, 0, last_processed, False, True)])
+        return state
+
+    monkeypatch.setattr(mirror, "read_state", read_state)
+
+    async def run():
+        # Three pairs used through a mirror that holds two: 0xc1 is evicted, 0xc4 was never mirrored
+        for contract, employer in pairs[:3]:
+            await mirror.get(contract, employer)
+        for key, state in await mirror.read_untracked(pairs):
+            scheduler.update(key, state)
+
+    asyncio.run(run())
+    assert [key for key, _ in mirror.states()] == [("0xc2", "0xe1"), ("0xc3", "0xe1")]
+    assert scheduler.pop_due(1000) == [("0xc1", "0xe1"), ("0xc2", "0xe1"), ("0xc3", "0xe1"), ("0xc4", "0xe1")]
+
+
+def test_sleep_is_capped():
+    scheduler = make_scheduler()
+    assert scheduler.seconds_until_next(0) == SCHEDULER_MAX_SLEEP
+    scheduler.update(("0xc1", "0xe1"), State(10 ** 9))
+    assert scheduler.seconds_until_next(0) == SCHEDULER_MAX_SLEEP
+    scheduler.update(("0xc1", "0xe1"), State(5))
+    assert scheduler.seconds_until_next(10) == 0
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app import sessions
+from app.sessions import SessionStore, estimate_tokens
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions.time, "monotonic", clock)
+    return clock
+
+
+def test_idle_sessions_expire(clock):
+    store = SessionStore(ttl=60)
+    store.create("a")
+    clock.now += 59
+    assert "a" in store
+    clock.now += 61
+    assert "a" not in store
+    assert len(store) == 0
+
+
+def test_least_recently_used_session_is_evicted(clock):
+    store = SessionStore(max_sessions=2)
+    store.create("a")
+    store.create("b")
+    store.get("a")
+    store.create("c")
+    assert "b" not in store
+    assert "a" in store and "c" in store
+    assert store.evictions == 1
+
+
+def test_sessions_are_evicted_to_stay_within_max_bytes(clock):
+    store = SessionStore(max_bytes=100, token_budget=10 ** 6)
+
+    async def run():
+        store.append("a", "user", "x" * 60)
+        store.append("b", "user", "y" * 60)
+
+    asyncio.run(run())
+    assert "a" not in store
+    assert store.stats()["bytes"] == 60
+
+
+def test_context_lists_summary_and_turns(clock):
+    store = SessionStore(token_budget=10 ** 6)
+    assert store.context("a") == "No previous conversation."
+
+    async def run():
+        store.append("a", "user", "hello")
+        store.append("a", "assistant", "hi")
+
+    asyncio.run(run())
+    store.get("a").summary = "earlier"
+    assert store.context("a") == "Summary of earlier conversation: earlier\nuser: hello\nassistant: hi"
+
+
+def test_history_over_budget_is_summarised(clock):
+    folded = []
+
+    async def summarize(previous, turns):
+        folded.append((previous, [turn["content"] for turn in turns]))
+        return "summary"
+
+    store = SessionStore(summarize=summarize, token_budget=20, keep_turns=2)
+
+    async def run():
+        for index in range(4):
+            store.append("a", "user", f"message {index} " + "x" * 40)
+        await asyncio.gather(*store._tasks)
+
+    asyncio.run(run())
+    session = store.get("a")
+    # Compaction starts on the third turn and runs once the fourth is in, keeping the last two
+    assert folded == [("", ["message 0 " + "x" * 40, "message 1 " + "x" * 40])]
+    assert session.summary == "summary"
+    assert [turn["content"][:9] for turn in session.turns] == ["message 2", "message 3"]
+    assert store.compactions == 1
+    assert store.stats()["bytes"] == session.size()
+
+
+def test_failed_summary_falls_back_to_truncation(clock):
+    async def summarize(previous, turns):
+        raise Exception("model unavailable")
+
+    store = SessionStore(summarize=summarize, token_budget=10, keep_turns=1)
+
+    async def run():
+        store.append("a", "user", "first question")
+        store.append("a", "assistant", "first answer")
+        await asyncio.gather(*store._tasks)
+
+    asyncio.run(run())
+    session = store.get("a")
+    assert session.summary == "user: first question"
+    assert [turn["content"] for turn in session.turns] == ["first answer"]
+
+
+def test_estimate_tokens_is_about_four_characters_each():
+    assert estimate_tokens("x" * 400) == 101
@@ -0,0 +1,152 @@
+import pytest
+
+from app.indexer.store import EventStore, encode_args
+
+CLONE = "0x00000000000000000000000000000000000000C1"
+EMPLOYER = "0x00000000000000000000000000000000000000E1"
+EMPLOYEE = "0x00000000000000000000000000000000000000F1"
+
+
+def block_hash(number: int, fork: str = "a") -> str:
+    return f"0x{fork}{number:063x}"
+
+
+def row(number: int, log_index: int = 0, event: str = "SalaryPaid", contract: str = CLONE,
+        employer: str = EMPLOYER, employee: str = EMPLOYEE, args=None, fork: str = "a"):
+    return {
+        "contract": contract.lower(),
+        "event": event,
+        "employer": employer.lower(),
+        "employee": employee.lower() if employee else None,
+        "amount": "100",
+        "block_number": number,
+        "block_hash": block_hash(number, fork),
+        "block_timestamp": 1_700_000_000 + number * 12,
+        "tx_hash": f"0x{number:060x}{log_index:04x}",
+        "log_index": log_index,
+        "args": encode_args(args or {"employer": employer, "amount": 100}),
+    }
+
+
+def blocks(numbers, fork: str = "a"):
+    return [(number, block_hash(number, fork), block_hash(number - 1, fork)) for number in numbers]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore(str(tmp_path / "events.db"))
+
+
+def test_write_chunk_advances_checkpoints(store):
+    store.add_contract(CLONE, "management", 9)
+    written = store.write_chunk([row(10), row(11)], [CLONE], 20, blocks=blocks([10, 11, 20]))
+    assert written == 2
+    assert store.get_checkpoints() == {CLONE.lower(): ("management", 20)}
+    assert store.get_block_hash(20) == block_hash(20)
+
+
+def test_write_chunk_skips_logs_already_indexed(store):
+    store.add_contract(CLONE, "management", 9)
+    store.write_chunk([row(10)], [CLONE], 10)
+    store.write_chunk([row(10), row(11)], [CLONE], 11)
+    assert store.count_events() == 2
+
+
+def test_add_contract_keeps_existing_checkpoint(store):
+    store.add_contract(CLONE, "management", 9)
+    store.write_chunk([], [CLONE], 50)
+    store.add_contract(CLONE, "management", 0)
+    assert store.get_checkpoints()[CLONE.lower()] == ("management", 50)
+
+
+def test_write_chunk_registers_new_clones(store):
+    factory = "0x00000000000000000000000000000000000000FA"
+    store.add_contract(factory, "factory", 0)
+    store.write_chunk([], [factory], 30, new_contracts=[(CLONE, "management", 24)])
+    assert store.get_checkpoints()[CLONE.lower()] == ("management", 24)
+
+
+def test_encode_args_keeps_large_integers_exact():
+    assert encode_args({"amount": 2 ** 255, "ok": True, "data": b"\x01"}) == \
+        f'{{"amount": "{2 ** 255}", "ok": true, "data": "0x01"}}'
+
+
+def test_query_events_pages_by_keyset(store):
+    # Two logs per block, so pages split rows that share a timestamp
+    store.write_chunk([row(number, index) for number in range(1, 6) for index in range(2)], [], 5)
+    seen, before = [], None
+    while True:
+        page = store.query_events(["SalaryPaid"], employer=EMPLOYER, before=before, limit=3)
+        seen.extend(page)
+        if len(page) < 3:
+            break
+        before = (page[-1]["block_timestamp"], page[-1]["id"])
+    assert len(seen) == 10
+    assert len({event["id"] for event in seen}) == 10
+    assert seen == sorted(seen, key=lambda event: (event["block_timestamp"], event["id"]), reverse=True)
+    assert seen[0]["args"] == {"employer": EMPLOYER, "amount": "100"}
+
+
+def test_deep_pages_cost_the_same_as_the_first(store):
+    store.write_chunk([row(number) for number in range(1, 5001)], [], 5000)
+    steps = []
+    store._connection().set_progress_handler(lambda: steps.append(1), 1)
+
+    def cost(before):
+        steps.clear()
+        store.query_events(["SalaryPaid"], employer=EMPLOYER, before=before, limit=50)
+        return len(steps)
+
+    deepest = store.query_events(["SalaryPaid"], employer=EMPLOYER, limit=4950)[-1]
+    # A range-bounded seek skips the 4950 newer rows instead of stepping over them
+    assert cost((deepest["block_timestamp"], deepest["id"])) < 2 * cost(None)
+
+
+def test_query_events_filters(store):
+    other = "0x00000000000000000000000000000000000000F2"
+    store.write_chunk([
+        row(1), row(2, employee=other), row(3, event="FundsAdded", employee=None), row(4),
+    ], [], 4)
+    assert [e["block_number"] for e in store.query_events(["SalaryPaid"], employee=EMPLOYEE)] == [4, 1]
+    assert [e["block_number"] for e in store.query_events(["SalaryPaid", "FundsAdded"], contract=CLONE)] == [4, 3, 2, 1]
+    start = row(2)["block_timestamp"]
+    assert [e["block_number"] for e in store.query_events(
+        ["SalaryPaid"], from_timestamp=start, to_timestamp=start + 12
+    )] == [2]
+
+
+def test_rollback_drops_orphaned_blocks(store):
+    factory = "0x00000000000000000000000000000000000000FA"
+    store.add_contract(factory, "factory", 0)
+    store.add_contract(CLONE, "management", 0)
+    created = row(8, 1, event="PayrollContractCreated", contract=factory, employee=None,
+                  args={"employer": EMPLOYER, "payrollContract": "0x00000000000000000000000000000000000000C2"})
+    store.write_chunk(
+        [row(number) for number in range(1, 11)] + [created], [factory, CLONE], 10,
+        new_contracts=[("0x00000000000000000000000000000000000000C2", "management", 7)],
+        blocks=blocks(range(1, 11))
+    )
+
+    assert store.rollback(6) == 5
+    assert store.count_events() == 6
+    assert store.get_checkpoints() == {factory.lower(): ("factory", 6), CLONE.lower(): ("management", 6)}
+    assert [number for number, _ in store.get_blocks(10)] == [6, 5, 4, 3, 2, 1]
+
+
+def test_rollback_keeps_checkpoints_below_the_fork(store):
+    other = "0x00000000000000000000000000000000000000C3"
+    store.add_contract(CLONE, "management", 0)
+    store.add_contract(other, "management", 0)
+    store.write_chunk([], [CLONE], 10)
+    store.write_chunk([], [other], 4)
+    store.rollback(6)
+    assert store.get_checkpoints()[CLONE.lower()] == ("management", 6)
+    assert store.get_checkpoints()[other.lower()] == ("management", 4)
+
+
+def test_reindexing_a_replaced_block_keeps_both_forks_apart(store):
+    store.write_chunk([row(5)], [], 5, blocks=blocks([5]))
+    store.rollback(4)
+    store.write_chunk([row(5, fork="b")], [], 5, blocks=blocks([5], fork="b"))
+    assert store.count_events() == 1
+    assert store.get_block_hash(5) == block_hash(5, "b")
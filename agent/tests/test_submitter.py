@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("web3")
+
+from hexbytes import HexBytes
+
+from app.contract.nonce import NonceManager
+from app.contract.submitter import PipelinedSubmitter, Submission, PENDING
+
+SENDER = "0x00000000000000000000000000000000000000A1"
+TX_HASH = HexBytes(b"\xab" * 32)
+
+
+class FakeEth:
+    def __init__(self):
+        self.account = SimpleNamespace(sign_transaction=lambda tx, private_key: SimpleNamespace(raw_transaction=b""))
+
+    async def get_transaction_count(self, sender, block_identifier):
+        return 0
+
+    async def send_raw_transaction(self, raw_transaction):
+        return TX_HASH
+
+
+def test_broadcast_reports_0x_prefixed_hashes():
+    w3 = SimpleNamespace(eth=FakeEth())
+    nonce_manager = NonceManager(w3, managed_senders=[SENDER])
+    submitter = PipelinedSubmitter(w3, nonce_manager, None, SENDER, "key")
+
+    async def run():
+        nonce = await nonce_manager.reserve(SENDER)
+        submission = Submission("payroll", None)
+        submission.tx = {"nonce": nonce}
+        await submitter.broadcast([submission])
+        return submission
+
+    submission = asyncio.run(run())
+    assert submission.status == PENDING
+    assert submission.result()["tx_hash"] == "0x" + "ab" * 32
+    assert nonce_manager._pending[SENDER.lower()][0] == "0x" + "ab" * 32